@@ -3,22 +3,47 @@ from werkzeug.utils import secure_filename
 import os
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import base64
-import io
-from PIL import Image
 from datetime import datetime
 import json
-from collections import defaultdict, deque
 import time
+import uuid
+import shutil
 from yolo_seg_handler import YOLOSegmentationHandler
+from services.video_pipeline import VideoPipeline
+from services.detection_results import build_detections, result_to_detections
+from services.letterbox import letterbox_for_model, normalize_imgsz
+from services.track_matching import associate
+from services.track_store import TrackStore
+from services.tracker_registry import TrackerRegistry
+from services.model_registry import model_registry
+from services.model_switcher import ModelHandle, ModelSwitcher
+from services.inference_backends import available_backends
+from services.model_export import ARTIFACTS_SUFFIX, export_model, find_artifact, list_artifacts, normalize_export_params
+from services.model_quantization import list_images, quantize_model
+from services.tiled_inference import compare_timing, single_shot_predict, tiled_predict, to_segmentation_result
 
 # 导入新的模块
-from models.database import db, User, DetectionResult, AlertRecord, RTSPStream, ModelPollingConfig
+from models.database import db, migrate_schema, User, DetectionResult, AlertRecord, RTSPStream, ModelPollingConfig
 from routes.rtsp_routes import rtsp_bp
-from services.rtsp_handler import rtsp_manager
+from routes.job_routes import job_bp
+from services.rtsp_handler import rtsp_manager, parse_stream_options
+from services.job_queue import job_manager, JobQueueFullError
+from services.alert_writer import alert_writer
+from services.alert_filter import alert_filter
+
+try:
+    from flask_sock import Sock
+except ImportError:  # 未安装 flask-sock 时不提供 WebSocket 接口
+    Sock = None
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时 WebSocket 结果以JSON文本返回
+    msgpack = None
 
 app = Flask(__name__)
+sock = Sock(app) if Sock is not None else None
 
 # 简单的CORS处理
 @app.after_request
@@ -34,12 +59,82 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 app.config['SECRET_KEY'] = 'yolo-detection-secret-key-2024'
+app.config['VIDEO_BATCH_SIZE'] = 8  # 视频检测批量推理大小
+app.config['VIDEO_MAX_BATCH_SIZE'] = 64  # 批量推理大小上限
+app.config['VIDEO_PIPELINE_QUEUE_SIZE'] = 4  # 流水线阶段间队列长度（批次数）
+app.config['JOB_MAX_WORKERS'] = 2  # 后台视频任务并发数
+app.config['JOB_MAX_PENDING'] = 20  # 最多排队的后台任务数
+app.config['JOB_MAX_ATTEMPTS'] = 3  # 任务因进程崩溃中断后的最大重试次数
+app.config['TRACKER_MATCH_METHOD'] = 'hungarian'  # 轨迹匹配方式: hungarian / greedy
+app.config['TRACKER_MATCH_METRIC'] = 'centroid'  # 轨迹匹配度量: centroid / iou
+app.config['TRACKER_MAX_SESSIONS'] = 256  # 同时保留的跟踪会话数上限
+app.config['TRACKER_SESSION_TTL'] = 600  # 跟踪会话闲置超时（秒）
+app.config['TRACKER_MAX_MEMORY_MB'] = 256  # 所有会话跟踪器的内存上限（MB）
+app.config['RTSP_SHARED_INFERENCE'] = True  # RTSP流使用共享推理服务跨流合批
+app.config['RTSP_INFERENCE_MAX_BATCH'] = 8  # 共享推理每批最多帧数
+app.config['RTSP_INFERENCE_MAX_LATENCY_MS'] = 20  # 共享推理最大凑批等待时间（毫秒）
+app.config['RTSP_CAPTURE_MODE'] = 'thread'  # RTSP采集方式: thread / process（独立进程+共享内存环）
+app.config['RTSP_CAPTURE_MAX_WIDTH'] = 1920  # 采集进程共享内存槽位最大宽度（超出时等比缩小，按摄像头分辨率设置）
+app.config['RTSP_CAPTURE_MAX_HEIGHT'] = 1080  # 采集进程共享内存槽位最大高度
+app.config['RTSP_MJPEG_FPS'] = 15  # MJPEG预览推送帧率
+app.config['RTSP_MJPEG_QUALITY'] = 70  # MJPEG预览JPEG质量
+app.config['RTSP_PREVIEW_MAX_WIDTH'] = 1280  # 预览帧标注和JPEG编码前缩小到的最大宽度（0 表示按采集分辨率）
+app.config['RTSP_DEFAULT_IMGSZ'] = 640  # RTSP流默认推理输入尺寸（可按流单独设置 imgsz）
+app.config['RTSP_TARGET_LATENCY_MS'] = 500  # 目标检测延迟（检测间隔 + 处理耗时），据此自适应选择检测间隔
+app.config['RTSP_MAX_DETECTION_STRIDE'] = 30  # 自适应检测间隔上限（帧）
+app.config['RTSP_MOTION_GATE'] = True  # 推理前运动预过滤：画面无变化时跳过推理（可按流设置 motion_gate）
+app.config['RTSP_MOTION_METHOD'] = 'diff'  # 运动检测方法：diff（与上次推理帧做帧差）/ mog2（背景减除）
+app.config['RTSP_MOTION_PIXEL_THRESHOLD'] = 25  # 帧差中视为变化的灰度差
+app.config['RTSP_MOTION_MIN_AREA'] = 0.002  # 变化像素占比超过该值视为有运动
+app.config['RTSP_MOTION_REFRESH_SECONDS'] = 5.0  # 无运动时最长多久强制推理一次
+app.config['INFERENCE_IMGSZ'] = 640  # 摄像头帧/视频检测默认推理输入尺寸（可按请求传入 imgsz）
+app.config['MODEL_CACHE_MAX_MEMORY_MB'] = 2048  # 模型注册表常驻内存预算（MB），超出时淘汰空闲模型
+app.config['MODEL_WARMUP_SIZES'] = [640]  # 模型加载后预热的输入尺寸（空列表表示不预热）
+app.config['MODEL_WARMUP_RUNS'] = 2  # 每个预热尺寸的推理次数
+app.config['INFERENCE_BACKEND'] = 'torch'  # 默认推理后端: torch / onnxruntime / openvino / auto（按文件类型选择）
+app.config['ORT_INTRA_OP_THREADS'] = 0  # ONNX Runtime 算子内线程数（0 为自动）
+app.config['ORT_INTER_OP_THREADS'] = 0  # ONNX Runtime 算子间线程数（0 为自动，>1 时启用并行执行模式）
+app.config['OPENVINO_NUM_THREADS'] = 0  # OpenVINO 推理线程数（0 为自动）
+app.config['QUANT_VALIDATION_DIR'] = 'calibration_images'  # INT8量化对比使用的本地图像目录
+app.config['QUANT_MAX_IMAGES'] = 100  # INT8量化对比最多使用的图像数量（0 为全部）
+app.config['TILE_SIZE'] = 640  # 图像切片推理的默认切片边长（可按请求传入 tile_size）
+app.config['TILE_OVERLAP'] = 0.2  # 相邻切片的默认重叠比例（可按请求传入 tile_overlap）
+app.config['TILE_INCLUDE_FULL'] = True  # 切片推理时是否把缩放后的整图加入同一批次（检出跨切片的大目标）
+app.config['TILE_MERGE_THRESHOLD'] = 0.5  # 跨切片合并的重叠度阈值（交集 / 较小框面积）
+app.config['TILE_MAX_TILES'] = 64  # 单张图像的切片数量上限
+app.config['ALERT_QUEUE_SIZE'] = 256  # 预警帧写入队列长度（按帧计），队列满时丢弃新预警并计数
+app.config['ALERT_WRITER_WORKERS'] = 2  # 预警帧绘制/JPEG编码/写文件的后台线程数
+app.config['ALERT_BATCH_SIZE'] = 50  # 每个事务最多插入的预警记录数
+app.config['ALERT_FLUSH_INTERVAL'] = 1.0  # 预警记录最长攒批时间（秒）
+app.config['ALERT_JPEG_QUALITY'] = 90  # 预警帧JPEG质量
+app.config['ALERT_DEDUP_WINDOW'] = 10.0  # 预警去重时间窗口（秒），窗口内同一目标重新出现不再预警
+app.config['ALERT_DEDUP_IOU'] = 0.3  # 与窗口内同类别目标的IoU达到该值视为位置接近
+app.config['ALERT_DEDUP_DISTANCE'] = 0.05  # 中心点距离不超过画面对角线的该比例也视为位置接近
+app.config['ALERT_DEDUP_APPEARANCE'] = 0.7  # 颜色直方图相关系数达到该值视为外观相似
+app.config['ALERT_CLASS_RATE'] = 0.5  # 每个流每个类别的预警速率（条/秒）
+app.config['ALERT_CLASS_BURST'] = 10  # 每个流每个类别的突发预警上限
+app.config['ALERT_STREAM_RATE'] = 1.0  # 每个流的预警速率（条/秒）
+app.config['ALERT_STREAM_BURST'] = 20  # 每个流的突发预警上限
 
 # 初始化数据库
 db.init_app(app)
 
+# 初始化后台任务管理器
+job_manager.init_app(app)
+
+# 初始化预警帧异步写入服务和预警去重/限流
+alert_writer.init_app(app)
+alert_filter.init_app(app)
+
+# 初始化模型注册表
+model_registry.init_app(app)
+
+# 初始化RTSP共享推理服务
+rtsp_manager.init_app(app)
+
 # 注册蓝图
 app.register_blueprint(rtsp_bp)
+app.register_blueprint(job_bp)
 
 # RTSP连接测试API
 @app.route('/api/rtsp/test-connection', methods=['POST'])
@@ -139,52 +234,61 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('static', exist_ok=True)
 
 # 初始化YOLO模型
-model = None
-seg_handler = None
-current_model_path = 'yolov8n.pt'  # 当前加载的模型路径
-current_model_type = 'detection'  # 'detection' 或 'segmentation'
-
-def load_yolo_model(model_path='yolov8n.pt'):
-    global model, seg_handler, current_model_path, current_model_type
+def build_model_handle(model_path, version, backend=None):
+    """加载模型并构造不可变句柄（在后台切换线程中执行）"""
+    # 通过模型注册表获取模型（与RTSP流、模型轮询共享同一实例）
+    backend = model_registry.resolve_backend(model_path, backend)
+    new_model = model_registry.acquire(model_path, owner='global', backend=backend)
     try:
         # 判断是否为分割模型
         if 'seg' in model_path.lower():
-            # 加载分割模型
-            seg_handler = YOLOSegmentationHandler(model_path)
-            if seg_handler.model:
-                current_model_type = 'segmentation'
-                model = seg_handler.model  # 保持兼容性
-                current_model_path = model_path
-                print(f"✅ YOLO分割模型加载成功: {model_path}")
-                return True
-            else:
-                return False
+            handler = YOLOSegmentationHandler(model_path, model=new_model)
+            model_type = 'segmentation'
+            print(f"✅ YOLO分割模型加载成功: {model_path}")
         else:
-            # 加载普通检测模型
-            model = YOLO(model_path)
-            seg_handler = None
-            current_model_type = 'detection'
-            current_model_path = model_path
+            handler = None
+            model_type = 'detection'
             print(f"✅ YOLO检测模型加载成功: {model_path}")
-            return True
+        return ModelHandle(model_path, model_type, new_model, handler, version, time.time(), backend)
+    except Exception:
+        model_registry.release(model_path, owner='global', backend=backend)
+        raise
+
+def release_model_handle(handle):
+    """旧句柄被替换后释放其注册表引用（进行中的请求仍持有模型对象，结束后由GC回收）"""
+    model_registry.release(handle.path, owner='global', backend=handle.backend)
+
+# 全局模型切换器：请求通过 get_model_handle() 取得当前句柄
+model_switcher = ModelSwitcher(build_model_handle, release_model_handle)
+
+def get_model_handle():
+    """获取当前模型句柄（请求开始时取一次，全程使用同一句柄）"""
+    return model_switcher.current
+
+def get_current_model_path():
+    handle = model_switcher.current
+    return handle.path if handle else None
+
+def load_yolo_model(model_path='yolov8n.pt', wait=True, backend=None):
+    """切换全局模型；wait 为 False 时在后台加载并立即返回，backend 为空时使用默认推理后端"""
+    try:
+        return model_switcher.switch(model_path, wait=wait, backend=backend)
     except Exception as e:
         print(f"❌ YOLO模型加载失败: {e}")
         return False
 
 # 跟踪器和计数器类
 class ObjectTracker:
-    def __init__(self):
-        self.tracks = {}
-        self.next_id = 1
+    def __init__(self, match_method='hungarian', match_metric='centroid'):
+        self.store = TrackStore(history_size=10)  # 列式轨迹存储（不再限制同时跟踪的目标数）
         self.max_disappeared = 3  # 全帧检测模式下，减少消失帧数但保持稳定
         self.max_distance = 80  # 适中的距离阈值，平衡准确性和稳定性
+        self.min_iou = 0.3  # IoU匹配模式下的最小交并比
+        self.match_method = match_method  # 'hungarian'（最优匹配）或 'greedy'（贪心匹配）
+        self.match_metric = match_metric  # 'centroid'（中心点距离）或 'iou'
         self.counting_class = None
         self.detection_history = []  # 添加检测历史记录
         
-        # 新增累积计数功能
-        self.cumulative_ids = set()  # 记录所有出现过的ID
-        self.cumulative_counts_by_class = defaultdict(set)  # 按类别记录出现过的ID
-        
         # 新增预警功能
         self.alert_enabled = False  # 是否启用预警
         self.new_targets_this_frame = []  # 当前帧新出现的目标
@@ -204,6 +308,10 @@ class ObjectTracker:
     def clear_new_targets(self):
         """清空新目标记录"""
         self.new_targets_this_frame = []
+    
+    def get_live_track_ids(self):
+        """获取仍在跟踪中的轨迹ID（预警去重只与已丢失的轨迹比较）"""
+        return self.store.live_ids().tolist()
         
     def calculate_centroid(self, bbox):
         """计算边界框的中心点"""
@@ -248,264 +356,142 @@ class ObjectTracker:
         
         if not stable_detections:
             # 如果没有稳定的检测结果，增加所有轨迹的消失计数
-            for track_id in self.tracks:
-                self.tracks[track_id]['disappeared'] += 1
+            self.store.age()
             return self.get_current_tracks()
         
-        # 为每个检测结果计算中心点
-        detection_centroids = []
-        for detection in stable_detections:
-            centroid = self.calculate_centroid(detection['bbox'])
-            detection_centroids.append({
-                'centroid': centroid,
-                'detection': detection
-            })
+        detection_boxes = np.array([detection['bbox'] for detection in stable_detections], dtype=np.float64)
         
         # 如果没有现有轨迹，创建新轨迹
-        if not self.tracks:
-            for detection_info in detection_centroids:
-                self._create_new_track(detection_info)
+        if len(self.store) == 0:
+            self._create_new_tracks(stable_detections, detection_boxes)
         else:
             # 匹配检测结果到现有轨迹
-            self._match_detections_to_tracks(detection_centroids, frame_height)
+            self._match_detections_to_tracks(stable_detections, detection_boxes, frame_height)
         
         return self.get_current_tracks()
     
+    def mark_missed(self):
+        """非检测帧：增加所有轨迹的消失计数并清理消失太久的轨迹"""
+        self.store.age()
+        self._cleanup_disappeared_tracks()
+    
     def _cleanup_disappeared_tracks(self):
         """清理消失太久的轨迹"""
-        disappeared_ids = []
-        for track_id in self.tracks:
-            if self.tracks[track_id]['disappeared'] > self.max_disappeared:
-                disappeared_ids.append(track_id)
-        
-        for track_id in disappeared_ids:
-            del self.tracks[track_id]
+        self.store.remove_stale(self.max_disappeared)
     
-    def _create_new_track(self, detection_info):
-        """创建新轨迹"""
-        detection = detection_info['detection']
-        centroid = detection_info['centroid']
-        
-        # 限制最大轨迹数量，防止轨迹爆炸
-        if len(self.tracks) >= 50:  # 最多同时跟踪50个目标
-            return
-        
-        track_id = self.next_id
-        self.tracks[track_id] = {
-            'centroid': centroid,
-            'disappeared': 0,
-            'bbox': detection['bbox'],
-            'class': detection['class'],
-            'confidence': detection['confidence'],
-            'history': deque([centroid], maxlen=10)
-        }
-        
-        # 记录累积计数
-        self.cumulative_ids.add(track_id)
-        self.cumulative_counts_by_class[detection['class']].add(track_id)
+    def _create_new_tracks(self, detections, detection_boxes):
+        """批量创建新轨迹"""
+        rows = self.store.add(
+            detection_boxes,
+            [detection['class'] for detection in detections],
+            np.array([detection['confidence'] for detection in detections], dtype=np.float64)
+        )
         
         # 如果启用预警，记录新目标
         if self.alert_enabled:
-            new_target = {
-                'id': track_id,
-                'class': detection['class'],
-                'confidence': detection['confidence'],
-                'bbox': detection['bbox'],
-                'centroid': centroid
-            }
-            self.new_targets_this_frame.append(new_target)
-        
-        self.next_id += 1
+            for track_id, detection, centroid in zip(
+                self.store.ids[rows].tolist(), detections, self.store.centroids[rows].tolist()
+            ):
+                new_target = {
+                    'id': track_id,
+                    'class': detection['class'],
+                    'confidence': detection['confidence'],
+                    'bbox': detection['bbox'],
+                    'centroid': tuple(centroid)
+                }
+                self.new_targets_this_frame.append(new_target)
     
-    def _match_detections_to_tracks(self, detection_centroids, frame_height):
+    def _match_detections_to_tracks(self, detections, detection_boxes, frame_height):
         """匹配检测结果到现有轨迹"""
-        if not detection_centroids:
+        if not detections:
             return
         
-        # 获取当前轨迹信息
-        track_centroids = []
-        track_ids = []
-        
-        for track_id, track in self.tracks.items():
-            track_centroids.append(track['centroid'])
-            track_ids.append(track_id)
-        
-        # 计算距离矩阵
-        distance_matrix = np.zeros((len(track_centroids), len(detection_centroids)))
-        
-        for i, track_centroid in enumerate(track_centroids):
-            for j, detection_info in enumerate(detection_centroids):
-                distance = self.calculate_distance(track_centroid, detection_info['centroid'])
-                distance_matrix[i][j] = distance
-        
-        # 使用匈牙利算法或简单的贪心匹配
-        used_detection_indices = set()
-        used_track_indices = set()
-        
-        # 按距离排序进行匹配
-        matches = []
-        for i in range(len(track_centroids)):
-            for j in range(len(detection_centroids)):
-                if distance_matrix[i][j] < self.max_distance:
-                    matches.append((i, j, distance_matrix[i][j]))
-        
-        # 按距离排序，优先匹配最近的
-        matches.sort(key=lambda x: x[2])
-        
-        # 应用匹配
-        for track_idx, detection_idx, distance in matches:
-            if track_idx not in used_track_indices and detection_idx not in used_detection_indices:
-                track_id = track_ids[track_idx]
-                detection_info = detection_centroids[detection_idx]
-                detection = detection_info['detection']
-                centroid = detection_info['centroid']
-                
-                # 更新轨迹
-                self.tracks[track_id]['centroid'] = centroid
-                self.tracks[track_id]['disappeared'] = 0
-                self.tracks[track_id]['bbox'] = detection['bbox']
-                self.tracks[track_id]['class'] = detection['class']
-                self.tracks[track_id]['confidence'] = detection['confidence']
-                self.tracks[track_id]['history'].append(centroid)
-                
-                # 更新累积计数（如果类别发生变化）
-                self.cumulative_ids.add(track_id)
-                self.cumulative_counts_by_class[detection['class']].add(track_id)
-                
-                used_track_indices.add(track_idx)
-                used_detection_indices.add(detection_idx)
+        # 向量化计算代价矩阵并求解匹配（匈牙利算法或贪心匹配），轨迹索引即存储行号
+        matches, unmatched_tracks, unmatched_detections = associate(
+            self.store.live_bboxes(), detection_boxes,
+            metric=self.match_metric,
+            method=self.match_method,
+            max_distance=self.max_distance,
+            min_iou=self.min_iou
+        )
         
-        # 为未匹配的检测结果创建新轨迹
-        for j, detection_info in enumerate(detection_centroids):
-            if j not in used_detection_indices:
-                self._create_new_track(detection_info)
+        # 应用匹配（批量更新轨迹和累积计数）
+        if matches:
+            track_rows, detection_indices = map(np.array, zip(*matches))
+            self.store.update(
+                track_rows,
+                detection_boxes[detection_indices],
+                [detections[j]['class'] for j in detection_indices.tolist()],
+                np.array([detections[j]['confidence'] for j in detection_indices.tolist()], dtype=np.float64)
+            )
         
         # 增加未匹配轨迹的消失计数
-        for i, track_id in enumerate(track_ids):
-            if i not in used_track_indices:
-                self.tracks[track_id]['disappeared'] += 1
+        self.store.age(np.array(unmatched_tracks, dtype=np.int64))
+        
+        # 为未匹配的检测结果创建新轨迹
+        if unmatched_detections:
+            self._create_new_tracks(
+                [detections[j] for j in unmatched_detections],
+                detection_boxes[unmatched_detections]
+            )
+    
+    def get_track_history(self, track_id):
+        """获取轨迹的中心点历史"""
+        return self.store.get_history(track_id)
     
     def get_current_tracks(self):
         """获取当前活跃的轨迹（只返回未消失的轨迹）"""
-        tracking_results = []
-        for track_id, track in self.tracks.items():
-            # 只返回未消失的轨迹
-            if track['disappeared'] == 0:
-                tracking_results.append({
-                    'id': track_id,
-                    'bbox': track['bbox'],
-                    'class': track['class'],
-                    'confidence': track['confidence'],
-                    'centroid': track['centroid']
-                })
-        return tracking_results
+        return self.store.rows_to_dicts(self.store.visible_rows())
     
     def get_current_counts(self):
         """获取当前屏幕内的目标数量统计"""
-        counts = defaultdict(int)
-        for track_id, track in self.tracks.items():
-            if track['disappeared'] == 0:  # 只统计当前活跃的轨迹
-                counts[track['class']] += 1
-        return dict(counts)
+        return self.store.current_counts()
     
     def get_cumulative_counts(self):
         """获取累积计数统计（从视频开始到现在总共出现过的不同ID数量）"""
-        counts = {}
-        for class_name, id_set in self.cumulative_counts_by_class.items():
-            counts[class_name] = len(id_set)
-        return counts
+        return self.store.cumulative_counts_by_class()
     
     def get_total_count(self, class_name=None):
         """获取累积总数量（从视频开始到现在总共出现过的不同ID数量）"""
         cumulative_counts = self.get_cumulative_counts()
         if class_name:
             return cumulative_counts.get(class_name, 0)
-        return sum(cumulative_counts.values())
+        return int(self.store.cumulative_counts.sum())
     
     def get_current_screen_count(self, class_name=None):
         """获取当前屏幕内的数量（用于实时显示）"""
-        counts = self.get_current_counts()
         if class_name:
-            return counts.get(class_name, 0)
-        return sum(counts.values())
+            return self.get_current_counts().get(class_name, 0)
+        return int(self.store.visible_counts.sum())
     
     def get_count_summary(self):
         """获取完整的计数摘要"""
         return {
             'current_screen': self.get_current_counts(),
             'cumulative_total': self.get_cumulative_counts(),
-            'total_unique_ids': len(self.cumulative_ids),
+            'total_unique_ids': self.store.total_unique_ids,
             'current_screen_total': self.get_current_screen_count(),
             'cumulative_total_count': self.get_total_count()
         }
 
-# 全局跟踪器实例
-tracker = ObjectTracker()
+def create_tracker():
+    """按配置创建跟踪器"""
+    return ObjectTracker(
+        match_method=app.config['TRACKER_MATCH_METHOD'],
+        match_metric=app.config['TRACKER_MATCH_METRIC']
+    )
 
-def save_alert_frame(frame, user_id, target_info, frame_number=None, detection_result_id=None):
-    """保存预警帧到文件和数据库"""
-    try:
-        # 确保预警目录存在
-        alert_dir = os.path.join('static', 'alerts')
-        os.makedirs(alert_dir, exist_ok=True)
-        
-        # 生成预警帧文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]  # 精确到毫秒
-        filename = f'alert_{timestamp}_id{target_info["id"]}.jpg'
-        filepath = os.path.join(alert_dir, filename)
-        
-        # 在帧上绘制预警信息
-        frame_copy = frame.copy()
-        x1, y1, x2, y2 = target_info['bbox']
-        
-        # 绘制红色预警框
-        cv2.rectangle(frame_copy, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 3)
-        
-        # 绘制预警标签
-        alert_label = f'ALERT! New {target_info["class"]} ID:{target_info["id"]}'
-        label_size = cv2.getTextSize(alert_label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-        
-        # 预警标签背景（红色）
-        cv2.rectangle(frame_copy, (int(x1), int(y1) - label_size[1] - 15), 
-                     (int(x1) + label_size[0] + 10, int(y1)), (0, 0, 255), -1)
-        
-        # 预警标签文字（白色）
-        cv2.putText(frame_copy, alert_label, (int(x1) + 5, int(y1) - 5), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # 在图像顶部添加时间戳
-        timestamp_text = f'Alert Time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
-        cv2.putText(frame_copy, timestamp_text, (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-        
-        # 保存图像
-        cv2.imwrite(filepath, frame_copy)
-        
-        # 保存到数据库
-        alert_record = AlertRecord(
-            user_id=user_id,
-            detection_result_id=detection_result_id,
-            target_id=target_info['id'],
-            target_class=target_info['class'],
-            frame_number=frame_number,
-            frame_image=os.path.join('alerts', filename),
-            bbox=json.dumps(target_info['bbox']),
-            confidence=target_info['confidence'],
-            description=f'新目标出现: {target_info["class"]} (ID: {target_info["id"]})',
-            is_handled=False
-        )
-        
-        db.session.add(alert_record)
-        db.session.commit()
-        
-        print(f"🚨 预警记录已保存: {filename} - {target_info['class']} ID:{target_info['id']}")
-        
-        return alert_record.id
-        
-    except Exception as e:
-        print(f"❌ 保存预警帧失败: {e}")
-        db.session.rollback()
-        return None
+def get_tracking_session_id(data):
+    """获取跟踪会话ID：优先使用客户端传入的 session_id，否则按用户区分"""
+    data = data or {}
+    session_id = data.get('session_id')
+    if session_id:
+        return str(session_id)
+    return f"user-{data.get('user_id', 1)}"
+
+# 会话级跟踪器注册表（每个客户端会话独立的跟踪器）
+tracker_registry = TrackerRegistry(create_tracker)
+tracker_registry.init_app(app)
 
 def get_model_files(directory='models'):
     """获取指定目录下的模型文件列表"""
@@ -518,6 +504,8 @@ def get_model_files(directory='models'):
     
     try:
         for root, dirs, files in os.walk(directory):
+            # 导出产物目录不单独列出，作为源模型的 variants 展示
+            dirs[:] = [d for d in dirs if not d.endswith(ARTIFACTS_SUFFIX)]
             for file in files:
                 if any(file.lower().endswith(ext) for ext in model_extensions):
                     file_path = os.path.join(root, file)
@@ -528,7 +516,23 @@ def get_model_files(directory='models'):
                         'relative_path': os.path.relpath(file_path),
                         'size': file_size,
                         'size_mb': round(file_size / (1024 * 1024), 2),
-                        'modified': os.path.getmtime(file_path)
+                        'modified': os.path.getmtime(file_path),
+                        'backends': get_model_backends(file_path),
+                        'variants': [
+                            {
+                                'name': variant['name'],
+                                'variant': variant['variant'],
+                                'path': variant['path'],
+                                'relative_path': os.path.relpath(variant['path']),
+                                'size_mb': variant['size_mb'],
+                                'params': variant['params'],
+                                'backends': get_model_backends(variant['path']),
+                                'stale': variant['stale'],
+                                'quantization_report': variant.get('quantization_report'),
+                                'created': variant['created']
+                            }
+                            for variant in list_artifacts(file_path)
+                        ]
                     })
     except Exception as e:
         print(f"扫描模型文件时出错: {e}")
@@ -541,8 +545,55 @@ def get_model_files(directory='models'):
         {'name': 'YOLOv8m-seg (分割)', 'path': 'yolov8m-seg.pt', 'relative_path': 'yolov8m-seg.pt', 'size': 0, 'size_mb': 49.9, 'modified': 0, 'pretrained': True, 'type': 'segmentation'}
     ]
     
+    for pretrained in pretrained_models:
+        pretrained['backends'] = ['torch']
+    
     return pretrained_models + model_files
 
+def get_model_backends(model_path):
+    """模型文件可用的推理后端（分割模型只支持PyTorch）"""
+    backends = ['torch']
+    lower_path = model_path.lower().rstrip('/\\')
+    if 'seg' in os.path.basename(lower_path):
+        return backends
+    if lower_path.endswith('.onnx') and available_backends()['onnxruntime']:
+        backends.insert(0, 'onnxruntime')
+    if lower_path.endswith('_openvino_model') and available_backends()['openvino']:
+        backends.insert(0, 'openvino')
+    return backends
+
+def get_tiling_options(form):
+    """解析图像切片推理参数（tiled=true 时启用），未启用时返回 None"""
+    if form.get('tiled', 'false').lower() != 'true':
+        return None
+    overlap = float(form.get('tile_overlap', app.config['TILE_OVERLAP']))
+    include_full = form.get('tile_include_full')
+    return {
+        'tile_size': normalize_imgsz(form.get('tile_size'), app.config['TILE_SIZE']),
+        'overlap': min(max(overlap, 0.0), 0.5),
+        'include_full': app.config['TILE_INCLUDE_FULL'] if include_full is None else include_full.lower() == 'true',
+        'merge_threshold': app.config['TILE_MERGE_THRESHOLD'],
+        'max_tiles': app.config['TILE_MAX_TILES'],
+        'compare': form.get('tile_compare', 'false').lower() == 'true'
+    }
+
+def run_tiled_inference(model, img, options, segmentation=False, conf=0.25, iou=0.45):
+    """
+    切片推理（所有切片一个批次），compare 为 True 时再做一次整图推理对比耗时
+    
+    Returns:
+        dict: tiled_predict 的结果，tiling 中包含切片数量、耗时及可选的 comparison
+    """
+    options = dict(options)
+    compare = options.pop('compare', False)
+    output = tiled_predict(model, img, conf=conf, iou=iou, segmentation=segmentation, **options)
+    if compare:
+        single = single_shot_predict(model, img, app.config['INFERENCE_IMGSZ'], conf, iou)
+        output['tiling']['comparison'] = compare_timing(output['tiling'], single)
+    print(f"🧩 切片推理: {output['tiling']['tiles']} 片, 检出 {output['tiling']['merged_detections']} 个目标, "
+          f"耗时 {output['tiling']['timing']['total_ms']}ms")
+    return output
+
 # API路由
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -598,6 +649,7 @@ def detect_image():
     show_masks = request.form.get('show_masks', 'true').lower() == 'true'
     show_boxes = request.form.get('show_boxes', 'true').lower() == 'true'
     mask_alpha = float(request.form.get('mask_alpha', 0.4))
+    tiling = get_tiling_options(request.form)
     
     if file.filename == '':
         return jsonify({'success': False, 'message': '没有选择文件'}), 400
@@ -610,14 +662,24 @@ def detect_image():
         file.save(filepath)
         
         # 根据模型类型和用户选择进行检测或分割
+        tiling_report = None
         try:
+            handle = get_model_handle()
+            if handle is None:
+                return jsonify({'success': False, 'message': '模型未加载'}), 503
             img = cv2.imread(filepath)
             detections = []
             segmentation_results = None
+            use_segmentation = use_segmentation and handle.model_type == 'segmentation'
             
-            if use_segmentation and current_model_type == 'segmentation' and seg_handler:
-                # 使用分割模型
-                seg_results = seg_handler.predict(img)
+            if use_segmentation:
+                # 使用分割模型（切片推理时合并各切片的多边形）
+                if tiling is not None:
+                    tiled = run_tiled_inference(handle.model, img, tiling, segmentation=True)
+                    tiling_report = tiled['tiling']
+                    seg_results = [to_segmentation_result(tiled, handle.names)]
+                else:
+                    seg_results = handle.seg_handler.predict(img)
                 if seg_results:
                     result = seg_results[0]
                     segmentation_results = result
@@ -637,33 +699,31 @@ def detect_image():
                         })
                     
                     # 生成可视化结果
-                    img = seg_handler.visualize_segmentation(
+                    img = handle.seg_handler.visualize_segmentation(
                         img, result, show_boxes, show_masks, True, mask_alpha
                     )
                 
             else:
                 # 使用普通检测模型
-                results = model(filepath)
+                if tiling is not None:
+                    tiled = run_tiled_inference(handle.model, img, tiling)
+                    tiling_report = tiled['tiling']
+                    frame_detections = build_detections(tiled['xyxy'], tiled['conf'], tiled['cls'], handle.names)
+                else:
+                    frame_detections = [
+                        detection for r in handle.model(filepath)
+                        for detection in result_to_detections(r, handle.names)
+                    ]
                 
-                for r in results:
-                    boxes = r.boxes
-                    if boxes is not None:
-                        for box in boxes:
-                            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                            conf = box.conf[0].cpu().numpy()
-                            cls = box.cls[0].cpu().numpy()
-                            
-                            detections.append({
-                                'class': model.names[int(cls)],
-                                'confidence': float(conf),
-                                'bbox': [float(x1), float(y1), float(x2), float(y2)],
-                                'has_mask': False
-                            })
-                            
-                            # 在图像上绘制检测框
-                            cv2.rectangle(img, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                            cv2.putText(img, f'{model.names[int(cls)]}: {conf:.2f}', 
-                                      (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                for detection in frame_detections:
+                    detection['has_mask'] = False
+                    detections.append(detection)
+                    
+                    # 在图像上绘制检测框
+                    x1, y1, x2, y2 = detection['bbox']
+                    cv2.rectangle(img, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+                    cv2.putText(img, f"{detection['class']}: {detection['confidence']:.2f}", 
+                              (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
             
             # 保存结果图像
             result_filename = 'result_' + filename
@@ -688,9 +748,11 @@ def detect_image():
                 'detections': detections,
                 'result_image': f'/static/{result_filename}',
                 'detection_count': len(detections),
-                'model_type': current_model_type,
-                'used_segmentation': use_segmentation and current_model_type == 'segmentation'
+                'model_type': handle.model_type,
+                'used_segmentation': use_segmentation
             }
+            if tiling_report is not None:
+                response_data['tiling'] = tiling_report
             
             # 如果是分割结果，添加分割信息
             if segmentation_results:
@@ -701,11 +763,423 @@ def detect_image():
             
             return jsonify(response_data)
             
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'检测失败: {str(e)}'}), 500
     
     return jsonify({'success': False, 'message': '不支持的文件格式'}), 400
 
+def process_video_detection(filepath, result_name, user_id, options, progress_callback=None):
+    """
+    执行视频检测（同步接口与异步任务共用）
+    
+    Args:
+        filepath: 上传的视频文件路径
+        result_name: 输出视频文件名（不含result_前缀）
+        user_id: 用户ID
+        options: 检测选项（enable_tracking/enable_counting/counting_class/enable_alert/batch_size）
+        progress_callback: 进度回调 progress_callback(processed_frames, total_frames)
+    
+    Returns:
+        dict: 检测结果（与接口响应格式一致）
+    
+    Raises:
+        ValueError: 视频文件无效或模型未加载
+        RuntimeError: 视频处理失败
+    """
+    # 整个视频使用同一个模型句柄，处理过程中切换模型不影响本任务
+    handle = get_model_handle()
+    if handle is None:
+        raise ValueError('模型未加载')
+    enable_tracking = options.get('enable_tracking', False)
+    enable_counting = options.get('enable_counting', False)
+    counting_class = options.get('counting_class', '')
+    enable_alert = options.get('enable_alert', False)
+    batch_size = options.get('batch_size', app.config['VIDEO_BATCH_SIZE'])
+    imgsz = normalize_imgsz(options.get('imgsz'), app.config['INFERENCE_IMGSZ'])
+    filename = result_name
+    
+    # 处理视频检测
+    cap = cv2.VideoCapture(filepath)
+    
+    # 检查视频是否成功打开
+    if not cap.isOpened():
+        raise ValueError('无法打开视频文件，请检查视频格式')
+    
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    
+    # 验证视频参数
+    if fps <= 0:
+        fps = 25.0  # 默认帧率
+    if width <= 0 or height <= 0:
+        raise ValueError('视频尺寸无效')
+    
+    result_filename = 'result_' + filename
+    result_filepath = os.path.join('static', result_filename)
+    
+    # 使用浏览器兼容性更好的编码器
+    # 调整编码器优先级，优先使用浏览器支持最好的编码器
+    encoders = [
+        ('H264', cv2.VideoWriter_fourcc(*'H264')),  # H.264 (浏览器支持最好)
+        ('h264', cv2.VideoWriter_fourcc(*'h264')),  # H.264 备选
+        ('avc1', cv2.VideoWriter_fourcc(*'avc1')),  # H.264 另一种格式
+        ('X264', cv2.VideoWriter_fourcc(*'X264')),  # H.264 x264编码器
+        ('XVID', cv2.VideoWriter_fourcc(*'XVID')),  # Xvid (广泛支持)
+        ('mp4v', cv2.VideoWriter_fourcc(*'mp4v')),  # MPEG-4 Part 2 (备选)
+        ('MJPG', cv2.VideoWriter_fourcc(*'MJPG')),  # Motion JPEG (兜底)
+    ]
+    
+    out = None
+    selected_encoder = None
+    for encoder_name, fourcc in encoders:
+        try:
+            print(f"🔧 尝试编码器: {encoder_name} ({fourcc})")
+            out = cv2.VideoWriter(result_filepath, fourcc, fps, (width, height))
+            # 测试是否能正确写入
+            if out.isOpened():
+                selected_encoder = encoder_name
+                print(f"✅ 成功使用编码器: {encoder_name} ({fourcc})")
+                break
+            else:
+                print(f"❌ 编码器 {encoder_name} 初始化失败")
+                out.release()
+                out = None
+        except Exception as e:
+            print(f"❌ 编码器 {encoder_name} 出错: {e}")
+            if out:
+                out.release()
+                out = None
+            continue
+    
+    if out is None or not out.isOpened():
+        cap.release()
+        raise RuntimeError('无法创建输出视频文件')
+    
+    all_detections = []
+    all_tracking_results = []
+    processed_frames = 0
+    current_detections = []  # 保存当前检测结果，在多帧之间保持
+    current_tracking_results = []  # 保存当前跟踪结果
+    detection_interval = 1  # 全帧检测，每帧都进行检测
+    detection_hold_frames = 1  # 不保持帧数，每帧都是实时结果
+    last_detection_frame = -detection_hold_frames  # 上次检测的帧号
+    
+    # 初始化跟踪器和计数器（每个视频使用独立的跟踪器，不影响其他会话）
+    tracker = create_tracker()
+    
+    # 视频分辨率固定，letterbox参数只计算一次；每帧缩放一次后送入模型，检测框再映射回原图
+    transform = letterbox_for_model(handle.model, (height, width), imgsz)
+    
+    # 设置预警功能
+    if enable_tracking and enable_alert:
+        tracker.set_alert_enabled(True)
+    alert_key = f'video:{result_name}'
+    
+    print(f"📹 开始处理视频: {total_frames} 帧 (批量大小: {batch_size}, 输入尺寸: {imgsz})")
+    print(f"🎯 跟踪启用: {enable_tracking}, 计数启用: {enable_counting}, 预警启用: {enable_alert}")
+    
+    # 推理阶段：每个批次合并为一次模型调用
+    def infer_batch(start_index, batch_frames):
+        detect_indices = [i for i in range(len(batch_frames))
+                          if (start_index + i) % detection_interval == 0]
+        batch_results = [None] * len(batch_frames)
+        if detect_indices:
+            try:
+                results_list = handle.model([transform.apply(batch_frames[i]) for i in detect_indices],
+                                            imgsz=imgsz, verbose=False)
+                for i, r in zip(detect_indices, results_list):
+                    batch_results[i] = r
+            except Exception as batch_error:
+                print(f"⚠️  批次推理失败 (起始帧 {start_index}): {batch_error}")
+        return batch_results
+    
+    # 编码阶段：按帧顺序执行跟踪、预警和绘制
+    def render_frame(frame_count, frame, result):
+        nonlocal current_detections, current_tracking_results, last_detection_frame, processed_frames
+        
+        # 每detection_interval帧检测一次以提高性能（非检测帧的result为None）
+        if result is not None:
+            try:
+                results = [result]
+            
+                # 更新上次检测帧号
+                last_detection_frame = frame_count
+            
+                # 清空上一次的检测结果
+                current_detections = []
+                frame_detections = []
+            
+                for r in results:
+                    for detection in result_to_detections(r, handle.names, transform=transform):
+                        # 添加到总检测结果
+                        all_detections.append({'frame': frame_count, **detection})
+                        
+                        # 添加到当前检测结果（用于绘制）
+                        current_detections.append({**detection, 'detection_frame': frame_count})
+                        
+                        # 添加到帧检测结果（用于跟踪）
+                        frame_detections.append(detection)
+            
+                # 如果启用跟踪，更新跟踪器
+                if enable_tracking:
+                    current_tracking_results = tracker.update(frame_detections, height)
+                
+                    # 保存跟踪结果
+                    for track in current_tracking_results:
+                        track_info = {
+                            'frame': frame_count,
+                            'track_id': track['id'],
+                            'class': track['class'],
+                            'confidence': track['confidence'],
+                            'bbox': track['bbox'],
+                            'centroid': track['centroid']
+                        }
+                        all_tracking_results.append(track_info)
+                
+                    # 如果启用预警，检查并处理新目标
+                    if enable_alert:
+                        # 去重和限流按视频时间计算（处理速度快于实时播放）
+                        new_targets = alert_filter.filter(alert_key, frame, tracker.get_new_targets(),
+                                                          live_ids=tracker.get_live_track_ids(),
+                                                          now=frame_count / fps)
+                        # 预警帧交给后台写入服务编码、写文件和批量入库，检测循环不等待
+                        if alert_writer.submit(frame, user_id, new_targets, frame_number=frame_count,
+                                               source=alert_key):
+                            for new_target in new_targets:
+                                print(f"🚨 预警触发! 新目标: {new_target['class']} ID:{new_target['id']} 在第 {frame_count} 帧")
+                        
+            except Exception as detection_error:
+                print(f"⚠️  帧 {frame_count} 检测失败: {detection_error}")
+    
+        # 检查检测结果是否过期（超过保持帧数就清空）
+        if frame_count - last_detection_frame > detection_hold_frames:
+            current_detections = []
+    
+        # 如果启用跟踪，获取当前活跃的轨迹
+        if enable_tracking:
+            # 如果不是检测帧，只更新轨迹状态但不重新检测
+            if frame_count % detection_interval != 0:
+                # 增加所有轨迹的消失计数并清理消失太久的轨迹
+                tracker.mark_missed()
+        
+            current_tracking_results = tracker.get_current_tracks()
+        else:
+            current_tracking_results = []
+    
+        # 绘制检测框或跟踪框
+        if enable_tracking:
+            # 如果启用跟踪，绘制当前帧的跟踪结果
+            for track_info in current_tracking_results:
+                x1, y1, x2, y2 = track_info['bbox']
+                class_name = track_info['class']
+                confidence = track_info['confidence']
+                track_id = track_info['id']
+            
+                # 绘制跟踪框（蓝色）
+                color = (255, 0, 0)  # 蓝色表示跟踪
+                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+            
+                # 绘制标签（包含跟踪ID）
+                label = f'ID:{track_id} {class_name}: {confidence:.2f}'
+                label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+            
+                # 标签背景
+                cv2.rectangle(frame, (int(x1), int(y1) - label_size[1] - 10), 
+                            (int(x1) + label_size[0], int(y1)), color, -1)
+            
+                # 标签文字
+                cv2.putText(frame, label, (int(x1), int(y1) - 5), 
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+            
+                # 绘制轨迹点
+                centroid = track_info['centroid']
+                cv2.circle(frame, (int(centroid[0]), int(centroid[1])), 3, color, -1)
+        else:
+            # 如果没有启用跟踪，绘制普通检测框
+            for detection in current_detections:
+                x1, y1, x2, y2 = detection['bbox']
+                class_name = detection['class']
+                confidence = detection['confidence']
+            
+                # 根据帧数差异调整透明度（越老越透明）
+                frame_diff = frame_count - detection.get('detection_frame', frame_count)
+                alpha = max(0.3, 1.0 - (frame_diff / detection_hold_frames) * 0.7)
+            
+                # 绘制检测框
+                color = (0, int(255 * alpha), 0)  # 绿色，透明度渐变
+                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+            
+                # 绘制标签背景
+                label = f'{class_name}: {confidence:.2f}'
+                label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+            
+                # 标签背景也应用透明度
+                overlay = frame.copy()
+                cv2.rectangle(overlay, (int(x1), int(y1) - label_size[1] - 10), 
+                            (int(x1) + label_size[0], int(y1)), color, -1)
+                cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+            
+                # 绘制标签文字
+                cv2.putText(frame, label, (int(x1), int(y1) - 5), 
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+    
+        # 绘制计数信息
+        if enable_counting:
+            # 获取完整的计数摘要
+            count_summary = tracker.get_count_summary()
+        
+            # 显示累积计数（总共出现过的不同ID数量）
+            if counting_class:
+                total_count = tracker.get_total_count(counting_class)
+                current_count = tracker.get_current_screen_count(counting_class)
+                count_text = f"累积 {counting_class}: {total_count} (当前: {current_count})"
+            else:
+                total_count = tracker.get_total_count()
+                current_count = tracker.get_current_screen_count()
+                count_text = f"累积总数: {total_count} (当前: {current_count})"
+        
+            # 绘制计数信息
+            cv2.putText(frame, count_text, (10, 30), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        
+            # 可选：显示详细信息
+            if len(count_summary['cumulative_total']) > 1:
+                details = []
+                for class_name, count in count_summary['cumulative_total'].items():
+                    details.append(f"{class_name}: {count}")
+                detail_text = " | ".join(details)
+                cv2.putText(frame, detail_text, (10, 60), 
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    
+        processed_frames += 1
+    
+        if progress_callback:
+            progress_callback(processed_frames, total_frames)
+        
+        # 每处理100帧打印一次进度
+        if processed_frames % 100 == 0:
+            progress = (processed_frames / total_frames) * 100 if total_frames > 0 else 0
+            detections_count = len(current_detections)
+            print(f"🎬 处理进度: {progress:.1f}% ({processed_frames}/{total_frames}) - 当前检测: {detections_count}")
+    
+        # 内存管理：定期清理过期的检测结果
+        if frame_count % 500 == 0:
+            current_detections = [d for d in current_detections 
+                                if frame_count - d.get('detection_frame', 0) <= detection_hold_frames]
+        
+        # 返回绘制后的帧，由编码线程写入输出视频
+        return frame
+    
+    pipeline = VideoPipeline(infer_batch, render_frame, batch_size=batch_size,
+                             queue_size=app.config['VIDEO_PIPELINE_QUEUE_SIZE'],
+                             thread_context=app.app_context)
+    try:
+        performance = pipeline.run(cap, out)
+    finally:
+        cap.release()
+        out.release()
+    
+    if enable_alert:
+        alert_stats = alert_filter.get_stats(alert_key)
+        alert_filter.reset(alert_key)
+        print(f"🔕 预警去重/限流: 新目标 {alert_stats['checked']} 个, 预警 {alert_stats['passed']} 个")
+        # 只等待本视频任务提交的预警，实时流持续提交的预警不影响任务返回
+        if not alert_writer.flush(timeout=30, source=alert_key):
+            print("⚠️ 预警帧仍在后台写入，结果返回时部分预警记录尚未入库")
+    
+    print(f"⚡ 处理速度: {performance['fps']} FPS, 瓶颈阶段: {performance['bottleneck']}")
+    
+    # 验证输出文件是否存在且有效
+    if not os.path.exists(result_filepath):
+        raise RuntimeError('生成视频文件失败')
+    
+    file_size = os.path.getsize(result_filepath)
+    if file_size < 1024:  # 小于1KB可能是空文件
+        raise RuntimeError('生成的视频文件过小，可能损坏')
+    
+    # 验证视频文件是否可以正常读取
+    test_cap = cv2.VideoCapture(result_filepath)
+    if not test_cap.isOpened():
+        test_cap.release()
+        raise RuntimeError('生成的视频文件无法打开，可能格式不兼容')
+    
+    # 测试读取第一帧
+    test_ret, test_frame = test_cap.read()
+    test_cap.release()
+    
+    if not test_ret:
+        raise RuntimeError('生成的视频文件无法读取帧，可能已损坏')
+    
+    print(f"✅ 视频处理完成: {result_filename} ({file_size} bytes)")
+    print(f"🎬 使用编码器: {selected_encoder}")
+    print(f"📊 视频验证: 文件可正常读取")
+    
+    # 获取最终计数结果
+    final_counts = tracker.get_cumulative_counts()  # 使用累积计数
+    count_summary = tracker.get_count_summary()
+    
+    # 保存到数据库
+    detection_result = DetectionResult(
+        user_id=user_id,
+        detection_type='video',
+        original_file=os.path.basename(filepath),
+        result_file=result_filename,
+        detections=json.dumps(all_detections),
+        confidence=max([d['confidence'] for d in all_detections]) if all_detections else 0,
+        tracking_enabled=enable_tracking,
+        tracking_results=json.dumps(all_tracking_results) if enable_tracking else None,
+        counting_enabled=enable_counting,
+        counting_class='' if enable_counting else None,  # 不再保存特定类别
+        counting_results=json.dumps(count_summary) if enable_counting else None,  # 保存完整的计数摘要
+        total_count=tracker.get_total_count() if enable_counting else 0  # 累积总数
+    )
+    db.session.add(detection_result)
+    db.session.commit()
+    
+    response_data = {
+        'success': True,
+        'message': '视频检测完成',
+        'detections': all_detections,
+        'result_video': f'/static/{result_filename}',
+        'detection_count': len(all_detections),
+        'processed_frames': processed_frames,
+        'total_detections': len(all_detections),
+        'performance': performance
+    }
+    
+    # 如果启用跟踪，添加跟踪结果
+    if enable_tracking:
+        response_data['tracking_results'] = all_tracking_results
+        response_data['tracking_count'] = len(all_tracking_results)
+    
+    # 如果启用计数，添加计数结果
+    if enable_counting:
+        response_data['counting_results'] = final_counts  # 累积计数
+        response_data['count_summary'] = count_summary  # 完整的计数摘要
+        response_data['total_count'] = tracker.get_total_count()  # 累积总数
+        response_data['current_screen_count'] = tracker.get_current_screen_count()  # 当前屏幕内数量
+    
+    return response_data
+
+def submit_video_job(job_type, user_id, input_file, output_name, options):
+    """提交异步视频任务，立即返回任务ID"""
+    try:
+        job = job_manager.submit(job_type, user_id, input_file, output_name, options)
+    except JobQueueFullError as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
+    
+    return jsonify({
+        'success': True,
+        'message': '视频任务已提交，正在后台处理',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
 @app.route('/api/detect_video', methods=['POST'])
 def detect_video():
     if 'file' not in request.files:
@@ -720,6 +1194,13 @@ def detect_video():
     counting_class = request.form.get('counting_class', '')
     enable_alert = request.form.get('enable_alert', 'false').lower() == 'true'
     
+    # 批量推理大小：每次将多少帧合并为一次模型调用
+    batch_size = request.form.get('batch_size', app.config['VIDEO_BATCH_SIZE'], type=int)
+    batch_size = max(1, min(batch_size, app.config['VIDEO_MAX_BATCH_SIZE']))
+    # 推理输入尺寸：每帧只缩放一次到该尺寸
+    imgsz = normalize_imgsz(request.form.get('imgsz'), app.config['INFERENCE_IMGSZ'])
+    async_job = request.form.get('async', 'false').lower() == 'true'
+    
     if file.filename == '':
         return jsonify({'success': False, 'message': '没有选择文件'}), 400
     
@@ -731,365 +1212,25 @@ def detect_video():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], timestamp + secure_filename(file.filename))
         file.save(filepath)
         
+        options = {
+            'enable_tracking': enable_tracking,
+            'enable_counting': enable_counting,
+            'counting_class': counting_class,
+            'enable_alert': enable_alert,
+            'batch_size': batch_size,
+            'imgsz': imgsz
+        }
+        
+        # 异步模式：立即返回任务ID，由后台工作线程处理
+        if async_job:
+            return submit_video_job('detect_video', user_id, filepath, filename, options)
+        
         try:
-            # 处理视频检测
-            cap = cv2.VideoCapture(filepath)
-            
-            # 检查视频是否成功打开
-            if not cap.isOpened():
-                return jsonify({'success': False, 'message': '无法打开视频文件，请检查视频格式'}), 400
-            
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            # 验证视频参数
-            if fps <= 0:
-                fps = 25.0  # 默认帧率
-            if width <= 0 or height <= 0:
-                return jsonify({'success': False, 'message': '视频尺寸无效'}), 400
-            
-            result_filename = 'result_' + filename
-            result_filepath = os.path.join('static', result_filename)
-            
-            # 使用浏览器兼容性更好的编码器
-            # 调整编码器优先级，优先使用浏览器支持最好的编码器
-            encoders = [
-                ('H264', cv2.VideoWriter_fourcc(*'H264')),  # H.264 (浏览器支持最好)
-                ('h264', cv2.VideoWriter_fourcc(*'h264')),  # H.264 备选
-                ('avc1', cv2.VideoWriter_fourcc(*'avc1')),  # H.264 另一种格式
-                ('X264', cv2.VideoWriter_fourcc(*'X264')),  # H.264 x264编码器
-                ('XVID', cv2.VideoWriter_fourcc(*'XVID')),  # Xvid (广泛支持)
-                ('mp4v', cv2.VideoWriter_fourcc(*'mp4v')),  # MPEG-4 Part 2 (备选)
-                ('MJPG', cv2.VideoWriter_fourcc(*'MJPG')),  # Motion JPEG (兜底)
-            ]
-            
-            out = None
-            selected_encoder = None
-            for encoder_name, fourcc in encoders:
-                try:
-                    print(f"🔧 尝试编码器: {encoder_name} ({fourcc})")
-                    out = cv2.VideoWriter(result_filepath, fourcc, fps, (width, height))
-                    # 测试是否能正确写入
-                    if out.isOpened():
-                        selected_encoder = encoder_name
-                        print(f"✅ 成功使用编码器: {encoder_name} ({fourcc})")
-                        break
-                    else:
-                        print(f"❌ 编码器 {encoder_name} 初始化失败")
-                        out.release()
-                        out = None
-                except Exception as e:
-                    print(f"❌ 编码器 {encoder_name} 出错: {e}")
-                    if out:
-                        out.release()
-                        out = None
-                    continue
-            
-            if out is None or not out.isOpened():
-                cap.release()
-                return jsonify({'success': False, 'message': '无法创建输出视频文件'}), 500
-            
-            all_detections = []
-            all_tracking_results = []
-            frame_count = 0
-            processed_frames = 0
-            current_detections = []  # 保存当前检测结果，在多帧之间保持
-            current_tracking_results = []  # 保存当前跟踪结果
-            detection_interval = 1  # 全帧检测，每帧都进行检测
-            detection_hold_frames = 1  # 不保持帧数，每帧都是实时结果
-            last_detection_frame = -detection_hold_frames  # 上次检测的帧号
-            
-            # 初始化跟踪器和计数器
-            global tracker
-            tracker = ObjectTracker()  # 重新初始化跟踪器
-            
-            # 设置预警功能
-            if enable_tracking and enable_alert:
-                tracker.set_alert_enabled(True)
-            
-            print(f"📹 开始处理视频: {total_frames} 帧")
-            print(f"🎯 跟踪启用: {enable_tracking}, 计数启用: {enable_counting}, 预警启用: {enable_alert}")
-
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # 每detection_interval帧检测一次以提高性能
-                if frame_count % detection_interval == 0:
-                    try:
-                        results = model(frame)
-                        
-                        # 更新上次检测帧号
-                        last_detection_frame = frame_count
-                        
-                        # 清空上一次的检测结果
-                        current_detections = []
-                        frame_detections = []
-                        
-                        for r in results:
-                            boxes = r.boxes
-                            if boxes is not None:
-                                for box in boxes:
-                                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                    conf = box.conf[0].cpu().numpy()
-                                    cls = box.cls[0].cpu().numpy()
-                                    
-                                    detection_info = {
-                                        'frame': frame_count,
-                                        'class': model.names[int(cls)],
-                                        'confidence': float(conf),
-                                        'bbox': [float(x1), float(y1), float(x2), float(y2)]
-                                    }
-                                    
-                                    # 添加到总检测结果
-                                    all_detections.append(detection_info)
-                                    
-                                    # 添加到当前检测结果（用于绘制）
-                                    current_detections.append({
-                                        'bbox': [x1, y1, x2, y2],
-                                        'class': model.names[int(cls)],
-                                        'confidence': conf,
-                                        'detection_frame': frame_count
-                                    })
-                                    
-                                    # 添加到帧检测结果（用于跟踪）
-                                    frame_detections.append({
-                                        'bbox': [float(x1), float(y1), float(x2), float(y2)],
-                                        'class': model.names[int(cls)],
-                                        'confidence': float(conf)
-                                    })
-                        
-                        # 如果启用跟踪，更新跟踪器
-                        if enable_tracking:
-                            current_tracking_results = tracker.update(frame_detections, height)
-                            
-                            # 保存跟踪结果
-                            for track in current_tracking_results:
-                                track_info = {
-                                    'frame': frame_count,
-                                    'track_id': track['id'],
-                                    'class': track['class'],
-                                    'confidence': track['confidence'],
-                                    'bbox': track['bbox'],
-                                    'centroid': track['centroid']
-                                }
-                                all_tracking_results.append(track_info)
-                            
-                            # 如果启用预警，检查并处理新目标
-                            if enable_alert:
-                                new_targets = tracker.get_new_targets()
-                                for new_target in new_targets:
-                                    # 保存预警帧
-                                    alert_id = save_alert_frame(
-                                        frame=frame,
-                                        user_id=user_id,
-                                        target_info=new_target,
-                                        frame_number=frame_count,
-                                        detection_result_id=None  # 视频处理完成后再关联
-                                    )
-                                    if alert_id:
-                                        print(f"🚨 预警触发! 新目标: {new_target['class']} ID:{new_target['id']} 在第 {frame_count} 帧")
-                                    
-                    except Exception as detection_error:
-                        print(f"⚠️  帧 {frame_count} 检测失败: {detection_error}")
-                
-                # 检查检测结果是否过期（超过保持帧数就清空）
-                if frame_count - last_detection_frame > detection_hold_frames:
-                    current_detections = []
-                
-                # 如果启用跟踪，获取当前活跃的轨迹
-                if enable_tracking:
-                    # 如果不是检测帧，只更新轨迹状态但不重新检测
-                    if frame_count % detection_interval != 0:
-                        # 增加所有轨迹的消失计数
-                        for track_id in tracker.tracks:
-                            tracker.tracks[track_id]['disappeared'] += 1
-                        # 清理消失太久的轨迹
-                        tracker._cleanup_disappeared_tracks()
-                    
-                    current_tracking_results = tracker.get_current_tracks()
-                else:
-                    current_tracking_results = []
-                
-                # 绘制检测框或跟踪框
-                if enable_tracking:
-                    # 如果启用跟踪，绘制当前帧的跟踪结果
-                    for track_info in current_tracking_results:
-                        x1, y1, x2, y2 = track_info['bbox']
-                        class_name = track_info['class']
-                        confidence = track_info['confidence']
-                        track_id = track_info['id']
-                        
-                        # 绘制跟踪框（蓝色）
-                        color = (255, 0, 0)  # 蓝色表示跟踪
-                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                        
-                        # 绘制标签（包含跟踪ID）
-                        label = f'ID:{track_id} {class_name}: {confidence:.2f}'
-                        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-                        
-                        # 标签背景
-                        cv2.rectangle(frame, (int(x1), int(y1) - label_size[1] - 10), 
-                                    (int(x1) + label_size[0], int(y1)), color, -1)
-                        
-                        # 标签文字
-                        cv2.putText(frame, label, (int(x1), int(y1) - 5), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-                        
-                        # 绘制轨迹点
-                        centroid = track_info['centroid']
-                        cv2.circle(frame, (int(centroid[0]), int(centroid[1])), 3, color, -1)
-                else:
-                    # 如果没有启用跟踪，绘制普通检测框
-                    for detection in current_detections:
-                        x1, y1, x2, y2 = detection['bbox']
-                        class_name = detection['class']
-                        confidence = detection['confidence']
-                        
-                        # 根据帧数差异调整透明度（越老越透明）
-                        frame_diff = frame_count - detection.get('detection_frame', frame_count)
-                        alpha = max(0.3, 1.0 - (frame_diff / detection_hold_frames) * 0.7)
-                        
-                        # 绘制检测框
-                        color = (0, int(255 * alpha), 0)  # 绿色，透明度渐变
-                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                        
-                        # 绘制标签背景
-                        label = f'{class_name}: {confidence:.2f}'
-                        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-                        
-                        # 标签背景也应用透明度
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (int(x1), int(y1) - label_size[1] - 10), 
-                                    (int(x1) + label_size[0], int(y1)), color, -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                        
-                        # 绘制标签文字
-                        cv2.putText(frame, label, (int(x1), int(y1) - 5), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-                
-                # 绘制计数信息
-                if enable_counting:
-                    # 获取完整的计数摘要
-                    count_summary = tracker.get_count_summary()
-                    
-                    # 显示累积计数（总共出现过的不同ID数量）
-                    if counting_class:
-                        total_count = tracker.get_total_count(counting_class)
-                        current_count = tracker.get_current_screen_count(counting_class)
-                        count_text = f"累积 {counting_class}: {total_count} (当前: {current_count})"
-                    else:
-                        total_count = tracker.get_total_count()
-                        current_count = tracker.get_current_screen_count()
-                        count_text = f"累积总数: {total_count} (当前: {current_count})"
-                    
-                    # 绘制计数信息
-                    cv2.putText(frame, count_text, (10, 30), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    
-                    # 可选：显示详细信息
-                    if len(count_summary['cumulative_total']) > 1:
-                        details = []
-                        for class_name, count in count_summary['cumulative_total'].items():
-                            details.append(f"{class_name}: {count}")
-                        detail_text = " | ".join(details)
-                        cv2.putText(frame, detail_text, (10, 60), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                
-                # 写入帧到输出视频
-                out.write(frame)
-                frame_count += 1
-                processed_frames += 1
-                
-                # 每处理100帧打印一次进度
-                if processed_frames % 100 == 0:
-                    progress = (processed_frames / total_frames) * 100 if total_frames > 0 else 0
-                    detections_count = len(current_detections)
-                    print(f"🎬 处理进度: {progress:.1f}% ({processed_frames}/{total_frames}) - 当前检测: {detections_count}")
-                
-                # 内存管理：定期清理过期的检测结果
-                if frame_count % 500 == 0:
-                    current_detections = [d for d in current_detections 
-                                        if frame_count - d.get('detection_frame', 0) <= detection_hold_frames]
-            
-            cap.release()
-            out.release()
-            
-            # 验证输出文件是否存在且有效
-            if not os.path.exists(result_filepath):
-                return jsonify({'success': False, 'message': '生成视频文件失败'}), 500
-            
-            file_size = os.path.getsize(result_filepath)
-            if file_size < 1024:  # 小于1KB可能是空文件
-                return jsonify({'success': False, 'message': '生成的视频文件过小，可能损坏'}), 500
-            
-            # 验证视频文件是否可以正常读取
-            test_cap = cv2.VideoCapture(result_filepath)
-            if not test_cap.isOpened():
-                test_cap.release()
-                return jsonify({'success': False, 'message': '生成的视频文件无法打开，可能格式不兼容'}), 500
-            
-            # 测试读取第一帧
-            test_ret, test_frame = test_cap.read()
-            test_cap.release()
-            
-            if not test_ret:
-                return jsonify({'success': False, 'message': '生成的视频文件无法读取帧，可能已损坏'}), 500
-            
-            print(f"✅ 视频处理完成: {result_filename} ({file_size} bytes)")
-            print(f"🎬 使用编码器: {selected_encoder}")
-            print(f"📊 视频验证: 文件可正常读取")
-            
-            # 获取最终计数结果
-            final_counts = tracker.get_cumulative_counts()  # 使用累积计数
-            count_summary = tracker.get_count_summary()
-            
-            # 保存到数据库
-            detection_result = DetectionResult(
-                user_id=user_id,
-                detection_type='video',
-                original_file=os.path.basename(filepath),
-                result_file=result_filename,
-                detections=json.dumps(all_detections),
-                confidence=max([d['confidence'] for d in all_detections]) if all_detections else 0,
-                tracking_enabled=enable_tracking,
-                tracking_results=json.dumps(all_tracking_results) if enable_tracking else None,
-                counting_enabled=enable_counting,
-                counting_class='' if enable_counting else None,  # 不再保存特定类别
-                counting_results=json.dumps(count_summary) if enable_counting else None,  # 保存完整的计数摘要
-                total_count=tracker.get_total_count() if enable_counting else 0  # 累积总数
-            )
-            db.session.add(detection_result)
-            db.session.commit()
-            
-            response_data = {
-                'success': True,
-                'message': '视频检测完成',
-                'detections': all_detections,
-                'result_video': f'/static/{result_filename}',
-                'detection_count': len(all_detections),
-                'processed_frames': processed_frames,
-                'total_detections': len(all_detections)
-            }
-            
-            # 如果启用跟踪，添加跟踪结果
-            if enable_tracking:
-                response_data['tracking_results'] = all_tracking_results
-                response_data['tracking_count'] = len(all_tracking_results)
-            
-            # 如果启用计数，添加计数结果
-            if enable_counting:
-                response_data['counting_results'] = final_counts  # 累积计数
-                response_data['count_summary'] = count_summary  # 完整的计数摘要
-                response_data['total_count'] = tracker.get_total_count()  # 累积总数
-                response_data['current_screen_count'] = tracker.get_current_screen_count()  # 当前屏幕内数量
-            
-            return jsonify(response_data)
-            
+            return jsonify(process_video_detection(filepath, filename, user_id, options))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({'success': False, 'message': str(e)}), 500
         except Exception as e:
             print(f"❌ 视频处理异常: {e}")
             return jsonify({'success': False, 'message': f'视频检测失败: {str(e)}'}), 500
@@ -1101,8 +1242,10 @@ def detect_video():
 def reset_tracker():
     """重置跟踪器和计数器"""
     try:
-        global tracker
-        tracker = ObjectTracker()  # 重新初始化跟踪器
+        data = request.get_json(silent=True) or {}
+        session_id = get_tracking_session_id(data)
+        tracker_registry.reset(session_id)
+        alert_filter.reset(f'session:{session_id}')
         return jsonify({
             'success': True,
             'message': '跟踪器已重置'
@@ -1116,9 +1259,8 @@ def detect_camera():
     user_id = request.json.get('user_id', 1)
     
     try:
-        # 重置跟踪器，确保每次启动摄像头都是全新的状态
-        global tracker
-        tracker = ObjectTracker()
+        # 重置该会话的跟踪器，确保每次启动摄像头都是全新的状态
+        tracker_registry.reset(get_tracking_session_id(request.json))
         
         # 这里返回摄像头检测的配置信息
         # 实际的摄像头检测会在前端通过WebRTC实现
@@ -1133,84 +1275,64 @@ def detect_camera():
     except Exception as e:
         return jsonify({'success': False, 'message': f'摄像头启动失败: {str(e)}'}), 500
 
-@app.route('/api/process_frame', methods=['POST'])
-def process_frame():
-    """处理从前端发送的摄像头帧"""
-    try:
-        data = request.get_json()
-        image_data = data.get('image')
-        user_id = data.get('user_id', 1)
-        
-        # 新增参数：跟踪、计数和预警设置
-        enable_tracking = data.get('enable_tracking', False)
-        enable_counting = data.get('enable_counting', False)
-        counting_class = data.get('counting_class', '')
-        enable_alert = data.get('enable_alert', False)
-        
-        # 解码base64图像
-        image_data = image_data.split(',')[1]  # 移除data:image/jpeg;base64,前缀
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # 转换为OpenCV格式
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        height, width = frame.shape[:2]
-        
-        # YOLO检测
-        results = model(frame)
-        
-        detections = []
-        for r in results:
-            boxes = r.boxes
-            if boxes is not None:
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    conf = box.conf[0].cpu().numpy()
-                    cls = box.cls[0].cpu().numpy()
-                    
-                    detections.append({
-                        'class': model.names[int(cls)],
-                        'confidence': float(conf),
-                        'bbox': [float(x1), float(y1), float(x2), float(y2)]
-                    })
-        
-        response_data = {
-            'success': True,
-            'detections': detections
-        }
-        
-        # 如果启用跟踪，更新跟踪器
-        if enable_tracking:
-            global tracker
-            
+def decode_image_bytes(image_bytes):
+    """将JPEG/PNG字节直接解码为BGR图像"""
+    frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError('无法解码图像数据')
+    return frame
+
+def run_frame_detection(frame, user_id, options):
+    """对单帧执行检测，并按选项进行跟踪、预警和计数，返回响应数据"""
+    enable_tracking = options.get('enable_tracking', False)
+    enable_counting = options.get('enable_counting', False)
+    enable_alert = options.get('enable_alert', False)
+    height, width = frame.shape[:2]
+    
+    # YOLO检测（取一次句柄，模型切换期间本帧仍在旧模型上完成）
+    handle = get_model_handle()
+    if handle is None:
+        raise RuntimeError('模型未加载')
+    # 摄像头分辨率固定，letterbox参数按 (分辨率, imgsz) 缓存复用
+    imgsz = normalize_imgsz(options.get('imgsz'), app.config['INFERENCE_IMGSZ'])
+    transform = letterbox_for_model(handle.model, frame.shape, imgsz)
+    results = handle.model(transform.apply(frame), imgsz=imgsz, verbose=False)
+    
+    detections = []
+    for r in results:
+        detections.extend(result_to_detections(r, handle.names, transform=transform))
+    
+    response_data = {
+        'success': True,
+        'detections': detections
+    }
+    
+    # 如果启用跟踪，更新跟踪器
+    if enable_tracking:
+        with tracker_registry.session(options.get('session_id', f'user-{user_id}')) as tracker:
             # 设置预警功能
             if enable_alert:
                 tracker.set_alert_enabled(True)
-            
+        
             tracking_results = tracker.update(detections, height)
             response_data['tracking_results'] = tracking_results
-            
+        
             # 如果启用预警，检查并处理新目标
             if enable_alert:
-                new_targets = tracker.get_new_targets()
+                # 同一目标闪烁产生的新ID按位置和外观去重，并按会话/类别限流
+                raw_targets = tracker.get_new_targets()
+                alert_key = f"session:{options.get('session_id', f'user-{user_id}')}"
+                new_targets = alert_filter.filter(alert_key, frame, raw_targets, live_ids=tracker.get_live_track_ids())
                 response_data['new_targets'] = new_targets
-                
-                # 为每个新目标保存预警帧
-                alert_ids = []
-                for new_target in new_targets:
-                    alert_id = save_alert_frame(
-                        frame=frame,
-                        user_id=user_id,
-                        target_info=new_target,
-                        frame_number=None,  # 摄像头模式没有帧号
-                        detection_result_id=None
-                    )
-                    if alert_id:
-                        alert_ids.append(alert_id)
-                        print(f"🚨 实时预警! 新目标: {new_target['class']} ID:{new_target['id']}")
-                
-                response_data['alert_ids'] = alert_ids
+                response_data['suppressed_alerts'] = len(raw_targets) - len(new_targets)
+            
+                # 预警帧由后台写入服务保存（摄像头模式没有帧号），响应不等待写入完成
+                alert_images = alert_writer.submit(frame, user_id, new_targets, source=alert_key)
+                for new_target in new_targets[:len(alert_images)]:
+                    print(f"🚨 实时预警! 新目标: {new_target['class']} ID:{new_target['id']}")
             
+                response_data['alert_images'] = alert_images
+        
             # 如果启用计数，返回计数结果
             if enable_counting:
                 count_summary = tracker.get_count_summary()
@@ -1218,23 +1340,122 @@ def process_frame():
                 response_data['count_summary'] = count_summary  # 完整的计数摘要
                 response_data['total_count'] = tracker.get_total_count()  # 累积总数
                 response_data['current_screen_count'] = tracker.get_current_screen_count()  # 当前屏幕内数量
+    
+    return response_data
+
+@app.route('/api/process_frame', methods=['POST'])
+def process_frame():
+    """处理从前端发送的摄像头帧"""
+    try:
+        data = request.get_json()
+        image_data = data.get('image')
+        user_id = data.get('user_id', 1)
         
-        return jsonify(response_data)
+        # 新增参数：跟踪、计数和预警设置
+        options = {
+            'session_id': get_tracking_session_id(data),
+            'enable_tracking': data.get('enable_tracking', False),
+            'enable_counting': data.get('enable_counting', False),
+            'counting_class': data.get('counting_class', ''),
+            'enable_alert': data.get('enable_alert', False),
+            'imgsz': data.get('imgsz')
+        }
+        
+        # 解码base64图像（直接解码为BGR，不经过PIL）
+        image_data = image_data.split(',')[1]  # 移除data:image/jpeg;base64,前缀
+        frame = decode_image_bytes(base64.b64decode(image_data))
+        
+        return jsonify(run_frame_detection(frame, user_id, options))
         
     except Exception as e:
         return jsonify({'success': False, 'message': f'帧处理失败: {str(e)}'}), 500
 
+if sock is not None:
+    @sock.route('/ws/process_frame')
+    def ws_process_frame(ws):
+        """
+        摄像头帧WebSocket通道
+        
+        - 文本消息：JSON配置 {user_id, session_id, enable_tracking, enable_counting, counting_class, enable_alert, imgsz, format}，
+          可随时发送以更新配置；format 为 'msgpack'（默认，需安装msgpack）或 'json'；
+          未指定 session_id 时每个连接使用独立的跟踪会话，连接关闭后释放
+        - 二进制消息：一帧原始JPEG字节
+        
+        推理跟不上发送速度时，只处理已到达帧中最新的一帧，其余旧帧直接丢弃。
+        每帧结果包含 frame_seq（已接收帧序号）、dropped_frames（累计丢弃帧数）和 process_ms。
+        """
+        connection_session_id = f'ws-{uuid.uuid4().hex}'
+        options = {
+            'user_id': 1,
+            'session_id': connection_session_id,
+            'enable_tracking': False,
+            'enable_counting': False,
+            'counting_class': '',
+            'enable_alert': False,
+            'format': 'msgpack' if msgpack is not None else 'json'
+        }
+        frame_seq = 0
+        dropped_frames = 0
+        
+        try:
+            while True:
+                message = ws.receive()
+            
+                # 取出所有已到达的消息，只保留最新的一帧
+                latest_frame = None
+                latest_seq = frame_seq
+                while message is not None:
+                    if isinstance(message, str):
+                        try:
+                            config = json.loads(message)
+                        except ValueError:
+                            config = None
+                        # 只接受JSON对象（数字、字符串、数组等同样视为无效配置）
+                        if isinstance(config, dict):
+                            options.update(config)
+                        else:
+                            ws.send(json.dumps({'success': False, 'message': '配置消息不是有效的JSON'}))
+                    else:
+                        if latest_frame is not None:
+                            dropped_frames += 1
+                        latest_frame = message
+                        frame_seq += 1
+                        latest_seq = frame_seq
+                    message = ws.receive(timeout=0)
+            
+                if latest_frame is None:
+                    continue
+            
+                start_time = time.perf_counter()
+                try:
+                    frame = decode_image_bytes(latest_frame)
+                    response_data = run_frame_detection(frame, options['user_id'], options)
+                except Exception as e:
+                    response_data = {'success': False, 'message': f'帧处理失败: {str(e)}'}
+            
+                response_data['frame_seq'] = latest_seq
+                response_data['dropped_frames'] = dropped_frames
+                response_data['process_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+            
+                if options.get('format') == 'msgpack' and msgpack is not None:
+                    ws.send(msgpack.packb(response_data, use_bin_type=True))
+                else:
+                    ws.send(json.dumps(response_data))
+        finally:
+            tracker_registry.remove(connection_session_id)
+
 @app.route('/api/tracking/counts', methods=['GET'])
 def get_tracking_counts():
     """获取当前计数结果"""
     try:
-        global tracker
-        counts = tracker.get_current_counts()
-        total_count = tracker.get_total_count()
+        with tracker_registry.session(get_tracking_session_id(request.args)) as tracker:
+            counts = tracker.get_current_counts()
+            total_count = tracker.get_total_count()
         return jsonify({
             'success': True,
             'counts': counts,
-            'total_count': total_count
+            'total_count': total_count,
+            'sessions': tracker_registry.get_stats()
         })
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取计数失败: {str(e)}'}), 500
@@ -1243,11 +1464,11 @@ def get_tracking_counts():
 def get_model_classes():
     """获取当前模型支持的类别"""
     try:
-        global model
-        if model is None:
+        handle = get_model_handle()
+        if handle is None:
             return jsonify({'success': False, 'message': '模型未加载'}), 400
         
-        classes = list(model.names.values())
+        classes = list(handle.names.values())
         return jsonify({
             'success': True,
             'classes': classes
@@ -1447,8 +1668,9 @@ def get_models():
         return jsonify({
             'success': True,
             'models': model_files,
-            'current_model': current_model_path,
-            'models_directory': models_dir
+            'current_model': get_current_model_path(),
+            'models_directory': models_dir,
+            'available_backends': available_backends()
         })
         
     except Exception as e:
@@ -1468,42 +1690,91 @@ def load_model():
         if not model_path.startswith('yolov8') and not os.path.exists(model_path):
             return jsonify({'success': False, 'message': f'模型文件不存在: {model_path}'}), 404
         
-        # 加载模型
-        success = load_yolo_model(model_path)
+        backend = data.get('backend') or None
+        if backend and backend != 'auto' and not available_backends().get(backend):
+            return jsonify({'success': False, 'message': f'推理后端不可用: {backend}'}), 400
+        
+        # 默认在后台加载，加载完成后原子切换；切换期间请求继续使用当前模型
+        if not data.get('wait', False):
+            model_switcher.switch(model_path, backend=backend)
+            return jsonify({
+                'success': True,
+                'loading': True,
+                'message': f'模型正在后台加载: {model_path}',
+                'current_model': get_current_model_path(),
+                'switch': model_switcher.get_status()
+            }), 202
+        
+        # wait=true 时等待切换完成（兼容旧的同步调用方式）
+        success = load_yolo_model(model_path, backend=backend)
         
         if success:
+            handle = get_model_handle()
             return jsonify({
                 'success': True,
                 'message': f'模型加载成功: {model_path}',
-                'current_model': current_model_path,
+                'current_model': handle.path,
                 'model_info': {
-                    'path': current_model_path,
-                    'classes': list(model.names.values()) if model else [],
-                    'class_count': len(model.names) if model else 0
+                    'path': handle.path,
+                    'backend': handle.backend,
+                    'classes': list(handle.names.values()),
+                    'class_count': len(handle.names)
                 }
             })
         else:
-            return jsonify({'success': False, 'message': '模型加载失败'}), 500
+            return jsonify({'success': False, 'message': model_switcher.last_error or '模型加载失败'}), 500
             
     except Exception as e:
         return jsonify({'success': False, 'message': f'加载模型时出错: {str(e)}'}), 500
 
+@app.route('/api/models/registry', methods=['GET'])
+def get_model_registry():
+    """获取模型注册表状态（常驻模型、引用者和内存占用）"""
+    try:
+        return jsonify({
+            'success': True,
+            'registry': model_registry.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'获取模型注册表失败: {str(e)}'}), 500
+
+@app.route('/api/models/registry/evict', methods=['POST'])
+def evict_idle_models():
+    """淘汰空闲模型（all=true 时淘汰全部空闲模型，否则仅按内存预算淘汰）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        evicted = model_registry.evict_idle(all_idle=bool(data.get('all', False)))
+        return jsonify({
+            'success': True,
+            'evicted': evicted,
+            'registry': model_registry.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'淘汰模型失败: {str(e)}'}), 500
+
 @app.route('/api/models/current', methods=['GET'])
 def get_current_model():
     """获取当前模型信息"""
     try:
+        handle = get_model_handle()
         model_info = {
-            'path': current_model_path,
-            'loaded': model is not None,
-            'type': current_model_type,
-            'classes': list(model.names.values()) if model else [],
-            'class_count': len(model.names) if model else 0,
-            'supports_segmentation': current_model_type == 'segmentation'
+            'path': handle.path if handle else None,
+            'loaded': handle is not None,
+            # 句柄只在加载和预热都完成后才发布，因此有句柄即已就绪
+            'ready': handle is not None,
+            'warmup': model_registry.get_warmup(handle.path, handle.backend) if handle else None,
+            'type': handle.model_type if handle else None,
+            'backend': handle.backend if handle else None,
+            'version': handle.version if handle else 0,
+            'classes': list(handle.names.values()) if handle else [],
+            'class_count': len(handle.names) if handle else 0,
+            'supports_segmentation': handle is not None and handle.model_type == 'segmentation'
         }
         
         return jsonify({
             'success': True,
-            'model_info': model_info
+            'model_info': model_info,
+            'switch': model_switcher.get_status()
         })
         
     except Exception as e:
@@ -1523,12 +1794,14 @@ def segment_image():
     mask_alpha = float(request.form.get('mask_alpha', 0.4))
     conf_threshold = float(request.form.get('conf_threshold', 0.25))
     iou_threshold = float(request.form.get('iou_threshold', 0.45))
+    tiling = get_tiling_options(request.form)
     
     if file.filename == '':
         return jsonify({'success': False, 'message': '没有选择文件'}), 400
     
     # 检查是否加载了分割模型
-    if current_model_type != 'segmentation' or not seg_handler:
+    handle = get_model_handle()
+    if handle is None or handle.model_type != 'segmentation':
         return jsonify({
             'success': False, 
             'message': '当前未加载分割模型，请先加载YOLO分割模型（如yolov8n-seg.pt）'
@@ -1544,8 +1817,15 @@ def segment_image():
         try:
             img = cv2.imread(filepath)
             
-            # 执行分割预测
-            seg_results = seg_handler.predict(img, conf=conf_threshold, iou=iou_threshold)
+            # 执行分割预测（切片推理时合并各切片的多边形）
+            tiling_report = None
+            if tiling is not None:
+                tiled = run_tiled_inference(handle.model, img, tiling, segmentation=True,
+                                            conf=conf_threshold, iou=iou_threshold)
+                tiling_report = tiled['tiling']
+                seg_results = [to_segmentation_result(tiled, handle.names)] if len(tiled['xyxy']) else []
+            else:
+                seg_results = handle.seg_handler.predict(img, conf=conf_threshold, iou=iou_threshold)
             
             if not seg_results:
                 return jsonify({
@@ -1553,13 +1833,14 @@ def segment_image():
                     'message': '未检测到任何目标',
                     'detections': [],
                     'segmentation_results': {'masks_count': 0, 'segments_count': 0},
-                    'result_image': None
+                    'result_image': None,
+                    'tiling': tiling_report
                 })
             
             result = seg_results[0]
             
             # 生成可视化结果
-            vis_img = seg_handler.visualize_segmentation(
+            vis_img = handle.seg_handler.visualize_segmentation(
                 img, result, show_boxes, show_masks, show_labels, mask_alpha
             )
             
@@ -1612,14 +1893,128 @@ def segment_image():
                     'show_boxes': show_boxes,
                     'show_labels': show_labels,
                     'mask_alpha': mask_alpha
-                }
+                },
+                'tiling': tiling_report
             })
             
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'分割失败: {str(e)}'}), 500
     
     return jsonify({'success': False, 'message': '不支持的文件格式'}), 400
 
+def process_video_segmentation(input_filepath, input_filename, output_filename, user_id, options,
+                               progress_callback=None):
+    """
+    执行视频分割（同步接口与异步任务共用）
+    
+    Args:
+        input_filepath: 上传的视频文件路径
+        input_filename: 上传的视频文件名
+        output_filename: 输出视频文件名
+        user_id: 用户ID
+        options: 分割选项（show_masks/show_boxes/show_labels/mask_alpha/conf_threshold/iou_threshold/batch_size）
+        progress_callback: 进度回调 progress_callback(processed_frames, total_frames)
+    
+    Returns:
+        dict: 分割结果（与接口响应格式一致）
+    
+    Raises:
+        ValueError: 未加载分割模型或视频文件无效
+    """
+    handle = get_model_handle()
+    if handle is None or handle.model_type != 'segmentation':
+        raise ValueError('当前未加载分割模型，请先加载YOLO分割模型（如yolov8n-seg.pt）')
+    
+    output_filepath = os.path.join('static', output_filename)
+    
+    # 使用分割处理器处理视频
+    def on_progress(progress, current_frame, total_frames):
+        if progress_callback:
+            progress_callback(current_frame, total_frames)
+        if current_frame % 100 == 0:
+            print(f"🎬 分割进度: {progress:.1f}% ({current_frame}/{total_frames})")
+    
+    result_stats = handle.seg_handler.process_video_segmentation(
+        input_filepath, output_filepath,
+        conf=options.get('conf_threshold', 0.25), iou=options.get('iou_threshold', 0.45),
+        show_boxes=options.get('show_boxes', True), show_masks=options.get('show_masks', True), 
+        show_labels=options.get('show_labels', True), mask_alpha=options.get('mask_alpha', 0.4),
+        progress_callback=on_progress,
+        batch_size=options.get('batch_size', app.config['VIDEO_BATCH_SIZE']),
+        queue_size=app.config['VIDEO_PIPELINE_QUEUE_SIZE']
+    )
+    
+    # 转换结果格式
+    all_detections = []
+    for frame_result in result_stats['results']:
+        if frame_result['result'] and 'boxes' in frame_result['result']:
+            for i, (box, conf, cls, cls_name) in enumerate(zip(
+                frame_result['result'].get('boxes', []),
+                frame_result['result'].get('confidences', []),
+                frame_result['result'].get('classes', []),
+                frame_result['result'].get('class_names', [])
+            )):
+                all_detections.append({
+                    'frame': frame_result['frame'],
+                    'class': cls_name,
+                    'confidence': float(conf),
+                    'bbox': box,
+                    'has_mask': i < len(frame_result['result'].get('masks', []))
+                })
+    
+    # 保存到数据库
+    detection_result = DetectionResult(
+        user_id=user_id,
+        detection_type='video_segmentation',
+        original_file=input_filename,
+        result_file=output_filename,
+        detections=json.dumps(all_detections),
+        confidence=max([d['confidence'] for d in all_detections]) if all_detections else 0
+    )
+    db.session.add(detection_result)
+    db.session.commit()
+    
+    return {
+        'success': True,
+        'message': f'视频分割完成！处理了 {result_stats["total_frames"]} 帧',
+        'result_video': f'/static/{output_filename}',
+        'segmentation_stats': {
+            'total_frames': result_stats['total_frames'],
+            'total_detections': result_stats['total_detections'],
+            'total_masks': result_stats['total_masks'],
+            'average_detections_per_frame': result_stats['average_detections_per_frame']
+        },
+        'detections': all_detections,
+        'model_type': 'segmentation',
+        'performance': result_stats['pipeline_stats']
+    }
+
+def run_segment_video_job(input_file, output_name, user_id, options, progress_callback):
+    """后台任务入口：视频分割"""
+    return process_video_segmentation(
+        input_file, os.path.basename(input_file), output_name, user_id, options, progress_callback
+    )
+
+def run_export_model_job(input_file, output_name, user_id, params, progress_callback):
+    """后台任务入口：模型导出"""
+    return export_model(input_file, params, progress_callback)
+
+def run_quantize_model_job(input_file, output_name, user_id, params, progress_callback):
+    """后台任务入口：INT8量化并与FP32模型对比"""
+    return quantize_model(
+        input_file, params['image_dir'], imgsz=params['imgsz'], max_images=params['max_images'],
+        conf=params['conf'], iou=params['iou'], backend_options=model_registry.backend_options,
+        progress_callback=progress_callback
+    )
+
+# 注册后台任务处理函数
+job_manager.register_handler('detect_video', process_video_detection)
+job_manager.register_handler('segment_video', run_segment_video_job)
+job_manager.register_handler('export_model', run_export_model_job)
+job_manager.register_handler('quantize_model', run_quantize_model_job)
+
 @app.route('/api/segment_video', methods=['POST'])
 def segment_video():
     """视频分割接口"""
@@ -1634,12 +2029,16 @@ def segment_video():
     mask_alpha = float(request.form.get('mask_alpha', 0.4))
     conf_threshold = float(request.form.get('conf_threshold', 0.25))
     iou_threshold = float(request.form.get('iou_threshold', 0.45))
+    batch_size = request.form.get('batch_size', app.config['VIDEO_BATCH_SIZE'], type=int)
+    batch_size = max(1, min(batch_size, app.config['VIDEO_MAX_BATCH_SIZE']))
+    async_job = request.form.get('async', 'false').lower() == 'true'
     
     if file.filename == '':
         return jsonify({'success': False, 'message': '没有选择文件'}), 400
     
     # 检查是否加载了分割模型
-    if current_model_type != 'segmentation' or not seg_handler:
+    handle = get_model_handle()
+    if handle is None or handle.model_type != 'segmentation':
         return jsonify({
             'success': False, 
             'message': '当前未加载分割模型，请先加载YOLO分割模型（如yolov8n-seg.pt）'
@@ -1653,67 +2052,29 @@ def segment_video():
         output_filename = 'seg_result_' + timestamp + original_name + '.mp4'
         
         input_filepath = os.path.join(app.config['UPLOAD_FOLDER'], input_filename)
-        output_filepath = os.path.join('static', output_filename)
         
         file.save(input_filepath)
         
+        options = {
+            'show_masks': show_masks,
+            'show_boxes': show_boxes,
+            'show_labels': show_labels,
+            'mask_alpha': mask_alpha,
+            'conf_threshold': conf_threshold,
+            'iou_threshold': iou_threshold,
+            'batch_size': batch_size
+        }
+        
+        # 异步模式：立即返回任务ID，由后台工作线程处理
+        if async_job:
+            return submit_video_job('segment_video', user_id, input_filepath, output_filename, options)
+        
         try:
-            # 使用分割处理器处理视频
-            def progress_callback(progress, current_frame, total_frames):
-                print(f"🎬 分割进度: {progress:.1f}% ({current_frame}/{total_frames})")
-            
-            result_stats = seg_handler.process_video_segmentation(
-                input_filepath, output_filepath,
-                conf=conf_threshold, iou=iou_threshold,
-                show_boxes=show_boxes, show_masks=show_masks, 
-                show_labels=show_labels, mask_alpha=mask_alpha,
-                progress_callback=progress_callback
-            )
-            
-            # 转换结果格式
-            all_detections = []
-            for frame_result in result_stats['results']:
-                if frame_result['result'] and 'boxes' in frame_result['result']:
-                    for i, (box, conf, cls, cls_name) in enumerate(zip(
-                        frame_result['result'].get('boxes', []),
-                        frame_result['result'].get('confidences', []),
-                        frame_result['result'].get('classes', []),
-                        frame_result['result'].get('class_names', [])
-                    )):
-                        all_detections.append({
-                            'frame': frame_result['frame'],
-                            'class': cls_name,
-                            'confidence': float(conf),
-                            'bbox': box,
-                            'has_mask': i < len(frame_result['result'].get('masks', []))
-                        })
-            
-            # 保存到数据库
-            detection_result = DetectionResult(
-                user_id=user_id,
-                detection_type='video_segmentation',
-                original_file=input_filename,
-                result_file=output_filename,
-                detections=json.dumps(all_detections),
-                confidence=max([d['confidence'] for d in all_detections]) if all_detections else 0
-            )
-            db.session.add(detection_result)
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'message': f'视频分割完成！处理了 {result_stats["total_frames"]} 帧',
-                'result_video': f'/static/{output_filename}',
-                'segmentation_stats': {
-                    'total_frames': result_stats['total_frames'],
-                    'total_detections': result_stats['total_detections'],
-                    'total_masks': result_stats['total_masks'],
-                    'average_detections_per_frame': result_stats['average_detections_per_frame']
-                },
-                'detections': all_detections,
-                'model_type': 'segmentation'
-            })
-            
+            return jsonify(process_video_segmentation(
+                input_filepath, input_filename, output_filename, user_id, options
+            ))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'视频分割失败: {str(e)}'}), 500
     
@@ -1756,6 +2117,127 @@ def upload_model():
     except Exception as e:
         return jsonify({'success': False, 'message': f'上传模型失败: {str(e)}'}), 500
 
+@app.route('/api/models/export', methods=['POST'])
+def export_model_artifact():
+    """
+    把 .pt 模型导出为CPU推理产物（ONNX / OpenVINO，可选动态batch、FP16/INT8量化）
+
+    支持上传文件（multipart，字段 file）或指定已有模型（model_path），导出参数
+    format / imgsz / dynamic / quantize / opset 通过表单或JSON传入。产物按源模型
+    内容哈希和导出参数缓存在模型旁边的 .artifacts 目录，已缓存时直接返回，
+    否则提交后台任务并返回任务ID。
+    """
+    try:
+        data = request.form.to_dict() if request.files or request.form else (request.get_json(silent=True) or {})
+        user_id = data.get('user_id', 1)
+        
+        if 'file' in request.files:
+            file = request.files['file']
+            if file.filename == '' or not file.filename.lower().endswith('.pt'):
+                return jsonify({'success': False, 'message': '请上传 .pt 模型文件'}), 400
+            models_dir = 'models'
+            os.makedirs(models_dir, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
+            model_path = os.path.join(models_dir, timestamp + secure_filename(file.filename))
+            file.save(model_path)
+        else:
+            model_path = data.get('model_path')
+            if not model_path:
+                return jsonify({'success': False, 'message': '未指定模型路径'}), 400
+            if not model_path.lower().endswith('.pt') or not os.path.exists(model_path):
+                return jsonify({'success': False, 'message': '只能导出已存在的 .pt 模型文件'}), 400
+        
+        to_bool = lambda value: str(value).lower() in ('1', 'true', 'yes')
+        params = normalize_export_params({
+            'format': data.get('format'),
+            'imgsz': data.get('imgsz'),
+            'dynamic': to_bool(data.get('dynamic', False)),
+            'quantize': data.get('quantize'),
+            'opset': data.get('opset')
+        })
+        
+        cached = find_artifact(model_path, params)
+        if cached is not None:
+            return jsonify({
+                'success': True,
+                'message': '已存在相同参数的导出产物',
+                'cached': True,
+                'artifact': cached
+            })
+        
+        try:
+            job = job_manager.submit('export_model', user_id, model_path, os.path.basename(model_path), params)
+        except JobQueueFullError as e:
+            return jsonify({'success': False, 'message': str(e)}), 429
+        
+        return jsonify({
+            'success': True,
+            'message': '模型导出任务已提交，正在后台处理',
+            'cached': False,
+            'model_path': model_path,
+            'params': params,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'模型导出失败: {str(e)}'}), 500
+
+@app.route('/api/models/quantize', methods=['POST'])
+def quantize_model_artifact():
+    """
+    生成模型的INT8变体，并在本地图像目录上报告相对FP32模型的加速比和检测一致性
+
+    参数 model_path（默认当前加载的模型，需为 .pt）、image_dir（默认
+    QUANT_VALIDATION_DIR）、imgsz、max_images、conf、iou。以后台任务执行，
+    结果（含 quantization_report）见 /api/jobs/<id>。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('user_id', 1)
+        model_path = data.get('model_path') or get_current_model_path()
+        if not model_path or not model_path.lower().endswith('.pt') or not os.path.exists(model_path):
+            return jsonify({'success': False, 'message': '只能量化已存在的 .pt 模型文件'}), 400
+        if 'seg' in os.path.basename(model_path).lower():
+            return jsonify({'success': False, 'message': '分割模型暂不支持INT8量化'}), 400
+        if not available_backends()['onnxruntime']:
+            return jsonify({'success': False, 'message': 'INT8量化需要安装 onnxruntime'}), 400
+        
+        image_dir = data.get('image_dir') or app.config['QUANT_VALIDATION_DIR']
+        max_images = int(data.get('max_images', app.config['QUANT_MAX_IMAGES']))
+        if not os.path.isdir(image_dir) or not list_images(image_dir, 1):
+            return jsonify({'success': False, 'message': f'验证图像目录不存在或没有图像: {image_dir}'}), 400
+        
+        params = {
+            'image_dir': image_dir,
+            'imgsz': int(data.get('imgsz', 640)),
+            'max_images': max_images,
+            'conf': float(data.get('conf', 0.25)),
+            'iou': float(data.get('iou', 0.45))
+        }
+        try:
+            job = job_manager.submit('quantize_model', user_id, model_path, os.path.basename(model_path), params)
+        except JobQueueFullError as e:
+            return jsonify({'success': False, 'message': str(e)}), 429
+        
+        return jsonify({
+            'success': True,
+            'message': 'INT8量化任务已提交，正在后台生成并对比',
+            'model_path': model_path,
+            'params': params,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'提交量化任务失败: {str(e)}'}), 500
+
 @app.route('/api/models/delete', methods=['DELETE'])
 def delete_model():
     """删除指定的模型文件"""
@@ -1775,11 +2257,14 @@ def delete_model():
             return jsonify({'success': False, 'message': '模型文件不存在'}), 404
         
         # 如果是当前使用的模型，不允许删除
-        if model_path == current_model_path:
+        current_path = get_current_model_path()
+        if current_path and (model_path == current_path or current_path.startswith(model_path + ARTIFACTS_SUFFIX)):
             return jsonify({'success': False, 'message': '不能删除当前正在使用的模型'}), 400
         
-        # 删除文件
+        # 删除文件（连同导出产物）
         os.remove(model_path)
+        if os.path.isdir(model_path + ARTIFACTS_SUFFIX):
+            shutil.rmtree(model_path + ARTIFACTS_SUFFIX)
         
         return jsonify({
             'success': True,
@@ -1944,7 +2429,9 @@ def get_alert_stats(user_id):
                 'unhandled_alerts': unhandled_alerts,
                 'today_alerts': today_alerts,
                 'class_counts': class_counts
-            }
+            },
+            'writer': alert_writer.get_stats(),
+            'filter': alert_filter.get_stats()
         })
         
     except Exception as e:
@@ -2261,8 +2748,8 @@ def test_polling_config():
         
         for i, model_path in enumerate(model_paths):
             try:
-                # 尝试加载模型
-                test_model = YOLO(model_path)
+                # 尝试加载模型（经由注册表，已常驻的模型不会重复加载）
+                test_model = model_registry.acquire(model_path, owner='polling-test')
                 test_results.append({
                     'index': i,
                     'model_path': model_path,
@@ -2272,7 +2759,7 @@ def test_polling_config():
                     'model_type': 'segmentation' if 'seg' in model_path.lower() else 'detection'
                 })
                 valid_models.append(model_path)
-                del test_model  # 释放内存
+                model_registry.release(model_path, owner='polling-test')
             except Exception as e:
                 test_results.append({
                     'index': i,
@@ -2301,6 +2788,7 @@ def test_polling_config():
 if __name__ == '__main__':
     # 创建数据库表和初始数据
     with app.app_context():
+        migrate_schema()
         db.create_all()
         
         # 创建默认管理员用户
@@ -2313,6 +2801,13 @@ if __name__ == '__main__':
     # 加载YOLO模型
     load_yolo_model()
     
+    # 恢复上次退出时未完成的后台任务（需在模型加载之后）
+    # 调试模式下 Werkzeug 重载器会在父进程和子进程各执行一次本段，只在实际服务请求的子进程中恢复，避免同一任务执行两次
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            job_manager.recover_jobs()
+    
     # 初始化RTSP流管理器并加载已配置的流
     def init_rtsp_streams():
         """初始化RTSP流"""
@@ -2332,7 +2827,11 @@ if __name__ == '__main__':
                         'model_path': stream.model_path,
                         'tracking_enabled': stream.tracking_enabled,
                         'counting_enabled': stream.counting_enabled,
-                        'alert_enabled': stream.alert_enabled
+                        'alert_enabled': stream.alert_enabled,
+                        'inference_backend': stream.inference_backend,
+                        'imgsz': stream.imgsz,
+                        'roi_polygons': json.loads(stream.roi_polygons) if stream.roi_polygons else [],
+                        **parse_stream_options(stream.stream_options)
                     }
                     
                     if rtsp_manager.add_stream(stream_config):
@@ -2356,11 +2855,13 @@ if __name__ == '__main__':
     print("🔧 后端重构: 模块化架构")
     
     try:
-        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+        app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)
     except KeyboardInterrupt:
         print("\n🛑 正在关闭系统...")
         # 清理RTSP资源
         rtsp_manager.cleanup()
+        job_manager.shutdown()
+        alert_writer.shutdown()
         print("✅ 系统已安全关闭")
     except Exception as e:
         print(f"❌ 系统启动失败: {e}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+检测结果提取微基准测试
+
+对比逐框调用 box.xyxy[0].cpu().numpy() 的旧实现与
+services.detection_results 中整帧一次性转移的实现。
+
+用法:
+    python benchmarks/bench_result_extraction.py [--objects 10 100 300] [--device cuda]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from ultralytics.engine.results import Boxes
+
+from services.detection_results import result_to_detections
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+
+
+class FakeResult:
+    """只包含检测框的最小YOLO结果"""
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def make_result(num_objects, device):
+    """生成包含 num_objects 个检测框的单帧结果"""
+    xy = torch.rand(num_objects, 2, device=device) * 1200
+    wh = torch.rand(num_objects, 2, device=device) * 200 + 20
+    conf = torch.rand(num_objects, 1, device=device)
+    cls = torch.randint(0, len(NAMES), (num_objects, 1), device=device).float()
+    data = torch.cat([xy, xy + wh, conf, cls], dim=1)
+    return FakeResult(Boxes(data, orig_shape=(1440, 2560)))
+
+
+def per_box_loop(result, names):
+    """旧实现：每个检测框分别做三次设备传输"""
+    detections = []
+    boxes = result.boxes
+    if boxes is not None:
+        for box in boxes:
+            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+            conf = box.conf[0].cpu().numpy()
+            cls = box.cls[0].cpu().numpy()
+            detections.append({
+                'class': names[int(cls)],
+                'confidence': float(conf),
+                'bbox': [float(x1), float(y1), float(x2), float(y2)]
+            })
+    return detections
+
+
+def measure(fn, result, repeat):
+    """返回每帧平均耗时（毫秒）"""
+    fn(result, NAMES)  # 预热
+    if result.boxes.data.is_cuda:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(result, NAMES)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检测结果提取微基准测试')
+    parser.add_argument('--objects', type=int, nargs='+', default=[10, 50, 100, 300, 1000])
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"🧪 设备: {args.device}, 每组重复 {args.repeat} 次")
+    print(f"{'目标数':>8} | {'逐框循环(ms)':>14} | {'整帧向量化(ms)':>16} | {'加速比':>8}")
+    print('-' * 58)
+
+    for num_objects in args.objects:
+        result = make_result(num_objects, args.device)
+
+        # 校验两种实现结果一致
+        old = per_box_loop(result, NAMES)
+        new = result_to_detections(result, NAMES)
+        assert len(old) == len(new)
+        for a, b in zip(old, new):
+            assert a['class'] == b['class']
+            assert abs(a['confidence'] - b['confidence']) < 1e-6
+            assert all(abs(x - y) < 1e-3 for x, y in zip(a['bbox'], b['bbox']))
+
+        loop_ms = measure(per_box_loop, result, args.repeat)
+        vector_ms = measure(result_to_detections, result, args.repeat)
+        speedup = loop_ms / vector_ms if vector_ms > 0 else float('inf')
+        print(f"{num_objects:>8} | {loop_ms:>14.3f} | {vector_ms:>16.3f} | {speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+轨迹匹配微基准测试
+
+对比 ObjectTracker 原先的嵌套循环 + 排序贪心匹配与
+services.track_matching 中向量化代价矩阵的贪心 / 匈牙利匹配，
+并在同一组轨迹上测量完整的 ObjectTracker.update（稳定性过滤、匹配、
+轨迹存储更新和结果转换），输出每次更新的平均耗时。
+
+用法:
+    python benchmarks/bench_tracker_matching.py [--objects 50 200 1000] [--metric centroid]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.track_matching import associate
+from services.rtsp_handler import ObjectTracker
+
+MAX_DISTANCE = 80
+FRAME_HEIGHT = 2160
+
+
+def make_frames(num_objects, seed=0):
+    """生成两帧检测框：第二帧在第一帧基础上随机抖动并打乱顺序"""
+    rng = np.random.default_rng(seed)
+    xy = rng.random((num_objects, 2)) * np.array([3840, 2160])
+    wh = rng.random((num_objects, 2)) * 60 + 30  # 不小于跟踪器稳定性过滤的最小尺寸和面积
+    tracks = np.concatenate([xy, xy + wh], axis=1)
+
+    jitter = rng.normal(0, 5, (num_objects, 2))
+    detections = tracks + np.concatenate([jitter, jitter], axis=1)
+    detections = detections[rng.permutation(num_objects)]
+    return tracks.tolist(), detections.tolist()
+
+
+def legacy_match(track_boxes, detection_boxes):
+    """旧实现：Python嵌套循环计算距离矩阵，再对阈值内配对排序贪心匹配"""
+    track_centroids = [((b[0] + b[2]) / 2, (b[1] + b[3]) / 2) for b in track_boxes]
+    detection_centroids = [((b[0] + b[2]) / 2, (b[1] + b[3]) / 2) for b in detection_boxes]
+
+    distance_matrix = np.zeros((len(track_centroids), len(detection_centroids)))
+    for i, p1 in enumerate(track_centroids):
+        for j, p2 in enumerate(detection_centroids):
+            distance_matrix[i][j] = np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+
+    matches = []
+    for i in range(len(track_centroids)):
+        for j in range(len(detection_centroids)):
+            if distance_matrix[i][j] < MAX_DISTANCE:
+                matches.append((i, j, distance_matrix[i][j]))
+    matches.sort(key=lambda x: x[2])
+
+    used_tracks = set()
+    used_detections = set()
+    result = []
+    for track_idx, detection_idx, _ in matches:
+        if track_idx not in used_tracks and detection_idx not in used_detections:
+            result.append((track_idx, detection_idx))
+            used_tracks.add(track_idx)
+            used_detections.add(detection_idx)
+    return result
+
+
+def to_detections(boxes):
+    """检测框转换为跟踪器输入格式"""
+    return [{'bbox': box, 'class': 'person', 'confidence': 0.9} for box in boxes]
+
+
+def make_tracker(track_boxes, metric):
+    """用第一帧建立轨迹的跟踪器（匈牙利匹配，距离阈值与匹配基准一致）"""
+    tracker = ObjectTracker(match_method='hungarian', match_metric=metric)
+    tracker.max_distance = MAX_DISTANCE
+    tracker.update(to_detections(track_boxes), FRAME_HEIGHT)
+    return tracker
+
+
+def measure(fn, repeat):
+    """返回每次更新平均耗时（毫秒）"""
+    fn()  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='轨迹匹配微基准测试')
+    parser.add_argument('--objects', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--metric', choices=['centroid', 'iou'], default='centroid')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"🧪 匹配度量: {args.metric}, 每组重复 {args.repeat} 次")
+    print(f"{'目标数':>8} | {'嵌套循环(ms)':>14} | {'向量化贪心(ms)':>16} | {'匈牙利(ms)':>12} | "
+          f"{'加速比':>8} | {'跟踪器更新(ms)':>16}")
+    print('-' * 96)
+
+    for num_objects in args.objects:
+        track_boxes, detection_boxes = make_frames(num_objects)
+
+        def run_greedy():
+            return associate(track_boxes, detection_boxes, metric=args.metric, method='greedy',
+                             max_distance=MAX_DISTANCE)
+
+        def run_hungarian():
+            return associate(track_boxes, detection_boxes, metric=args.metric, method='hungarian',
+                             max_distance=MAX_DISTANCE)
+
+        # 中心点度量下向量化贪心匹配应与旧实现结果完全一致
+        if args.metric == 'centroid':
+            assert sorted(legacy_match(track_boxes, detection_boxes)) == sorted(run_greedy()[0])
+
+        # 旧实现在1000个目标时单次耗时较长，减少重复次数
+        legacy_repeat = max(1, args.repeat // 10) if num_objects >= 500 else args.repeat
+        legacy_ms = measure(lambda: legacy_match(track_boxes, detection_boxes), legacy_repeat)
+        greedy_ms = measure(run_greedy, args.repeat)
+        hungarian_ms = measure(run_hungarian, args.repeat)
+        speedup = legacy_ms / hungarian_ms if hungarian_ms > 0 else float('inf')
+
+        # 完整的跟踪器更新：第二帧的检测全部匹配到第一帧建立的轨迹
+        tracker = make_tracker(track_boxes, args.metric)
+        detections = to_detections(detection_boxes)
+        update_ms = measure(lambda: tracker.update(detections, FRAME_HEIGHT), args.repeat)
+        if args.metric == 'centroid':
+            assert len(tracker.get_current_tracks()) == num_objects
+        print(f"{num_objects:>8} | {legacy_ms:>14.3f} | {greedy_ms:>16.3f} | {hungarian_ms:>12.3f} | "
+              f"{speedup:>7.1f}x | {update_ms:>16.3f}")
+
+
+if __name__ == '__main__':
+    main()
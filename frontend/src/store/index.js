@@ -3,6 +3,16 @@ import axios from 'axios'
 
 const API_BASE_URL = 'http://localhost:5000/api'
 
+// 每个浏览器标签页使用独立的跟踪会话
+function getTrackingSessionId() {
+  let sessionId = sessionStorage.getItem('trackingSessionId')
+  if (!sessionId) {
+    sessionId = `tab-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`
+    sessionStorage.setItem('trackingSessionId', sessionId)
+  }
+  return sessionId
+}
+
 export default createStore({
   state: {
     user: null,
@@ -123,11 +133,13 @@ export default createStore({
         if (typeof frameData === 'string') {
           frameData = {
             image: frameData,
-            user_id: state.user.id
+            user_id: state.user.id,
+            session_id: getTrackingSessionId()
           }
         } else {
-          // 确保包含user_id
+          // 确保包含user_id和跟踪会话ID
           frameData.user_id = frameData.user_id || state.user.id
+          frameData.session_id = frameData.session_id || getTrackingSessionId()
         }
         
         const response = await axios.post(`${API_BASE_URL}/process_frame`, frameData)
@@ -162,7 +174,8 @@ export default createStore({
     async resetTracker({ state }) {
       try {
         const response = await axios.post(`${API_BASE_URL}/tracking/reset`, {
-          user_id: state.user.id
+          user_id: state.user.id,
+          session_id: getTrackingSessionId()
         })
         return response.data
       } catch (error) {
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -70,6 +71,10 @@ class RTSPStream(db.Model):
     tracking_enabled = db.Column(db.Boolean, default=False)  # 是否启用跟踪
     counting_enabled = db.Column(db.Boolean, default=False)  # 是否启用计数
     alert_enabled = db.Column(db.Boolean, default=False)  # 是否启用预警
+    inference_backend = db.Column(db.String(20))  # 推理后端（torch/onnxruntime/openvino/auto，为空时使用全局默认）
+    imgsz = db.Column(db.Integer)  # 推理输入尺寸（为空时使用 RTSP_DEFAULT_IMGSZ，调小可直接提高吞吐）
+    roi_polygons = db.Column(db.Text)  # JSON格式的ROI多边形列表（坐标为相对宽高的比例），为空时整帧检测
+    stream_options = db.Column(db.Text)  # JSON格式的按流运行参数（采集方式、轨迹匹配、运动预过滤、MJPEG、检测间隔），为空时使用全局默认值
     position_x = db.Column(db.Integer, default=0)  # 在四宫格中的X位置
     position_y = db.Column(db.Integer, default=0)  # 在四宫格中的Y位置
     
@@ -85,4 +90,46 @@ class RTSPStream(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关联关系
-    polling_config = db.relationship('ModelPollingConfig', backref='rtsp_streams') 
\ No newline at end of file
+    polling_config = db.relationship('ModelPollingConfig', backref='rtsp_streams') 
+
+class ProcessingJob(db.Model):
+    """后台处理任务表（异步视频检测/分割）"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    job_type = db.Column(db.String(30), nullable=False)  # 任务类型：detect_video, segment_video
+    status = db.Column(db.String(20), default='queued')  # 状态：queued, running, completed, failed
+    input_file = db.Column(db.String(255), nullable=False)  # 输入文件路径
+    output_name = db.Column(db.String(255))  # 输出文件名
+    params = db.Column(db.Text)  # JSON格式的任务参数
+    progress = db.Column(db.Float, default=0)  # 进度百分比
+    processed_frames = db.Column(db.Integer, default=0)  # 已处理帧数
+    total_frames = db.Column(db.Integer, default=0)  # 总帧数
+    throughput_fps = db.Column(db.Float, default=0)  # 实测处理速度（帧/秒）
+    result = db.Column(db.Text)  # JSON格式的最终结果
+    error_message = db.Column(db.Text)  # 失败原因
+    attempts = db.Column(db.Integer, default=0)  # 已执行次数（用于崩溃恢复）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# 已有数据库中需要补充的列（create_all 只建新表，不会给已存在的表加列）
+ADDED_COLUMNS = {
+    'rtsp_stream': ['inference_backend', 'imgsz', 'roi_polygons', 'stream_options']
+}
+
+
+def migrate_schema():
+    """为已有数据库补充新增的列（可重复执行，需在应用上下文中、create_all 之前调用）"""
+    tables = {table.name: table for table in db.metadata.sorted_tables}
+    with db.engine.begin() as conn:
+        for table_name, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.execute(text(f'PRAGMA table_info({table_name})'))}
+            if not existing:
+                continue  # 表尚不存在，由 create_all 创建
+            for column_name in columns:
+                if column_name in existing:
+                    continue
+                column_type = tables[table_name].c[column_name].type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+                print(f"🔧 数据库迁移: {table_name} 新增列 {column_name}")
@@ -0,0 +1,62 @@
+from flask import Blueprint, request, jsonify
+from models.database import ProcessingJob
+from services.job_queue import job_manager
+
+job_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+@job_bp.route('', methods=['GET'])
+def get_jobs():
+    """获取用户的后台任务列表"""
+    try:
+        user_id = request.args.get('user_id', 1, type=int)
+        status = request.args.get('status')
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        query = ProcessingJob.query.filter_by(user_id=user_id)
+        if status:
+            query = query.filter_by(status=status)
+
+        jobs = query.order_by(ProcessingJob.created_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+
+        job_list = []
+        for job in jobs.items:
+            job_info = job_manager.get_job_info(job)
+            # 列表中不返回完整结果，避免响应过大
+            job_info.pop('result', None)
+            job_list.append(job_info)
+
+        return jsonify({
+            'success': True,
+            'jobs': job_list,
+            'queue': job_manager.get_stats(),
+            'pagination': {
+                'page': jobs.page,
+                'pages': jobs.pages,
+                'per_page': jobs.per_page,
+                'total': jobs.total,
+                'has_next': jobs.has_next,
+                'has_prev': jobs.has_prev
+            }
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'获取任务列表失败: {str(e)}'}), 500
+
+@job_bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """获取任务进度、实测吞吐量和最终结果"""
+    try:
+        job = ProcessingJob.query.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'message': '任务不存在'}), 404
+
+        return jsonify({
+            'success': True,
+            'job': job_manager.get_job_info(job)
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'获取任务状态失败: {str(e)}'}), 500
@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 import json
 from models.database import db, RTSPStream, ModelPollingConfig
-from services.rtsp_handler import rtsp_manager
+from services.rtsp_handler import rtsp_manager, parse_stream_options, STREAM_OPTION_TYPES
+from services.roi import parse_roi_polygons
+from services.inference_backends import BACKENDS
+from services.letterbox import normalize_imgsz
+from services.mjpeg_streamer import BOUNDARY
 
 rtsp_bp = Blueprint('rtsp', __name__, url_prefix='/api/rtsp')
 
@@ -34,6 +38,10 @@ def get_streams():
                 'tracking_enabled': stream.tracking_enabled,
                 'counting_enabled': stream.counting_enabled,
                 'alert_enabled': stream.alert_enabled,
+                'inference_backend': stream.inference_backend,
+                'imgsz': stream.imgsz,
+                'roi_polygons': _load_roi(stream),
+                'stream_options': json.loads(stream.stream_options) if stream.stream_options else {},
                 'position_x': stream.position_x,
                 'position_y': stream.position_y,
                 'created_at': stream.created_at.isoformat(),
@@ -91,6 +99,14 @@ def create_stream():
         if existing:
             return jsonify({'success': False, 'message': '同名流已存在'}), 400
         
+        try:
+            roi_polygons = _serialize_roi(data.get('roi_polygons'))
+            stream_options = _serialize_stream_options(None, data)
+            inference_backend = _parse_inference_backend(data.get('inference_backend'))
+            imgsz = _parse_imgsz(data.get('imgsz'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
         # 自动分配位置（四宫格）
         existing_streams = RTSPStream.query.filter_by(user_id=user_id, is_active=True).all()
         position_x, position_y = _find_available_position(existing_streams)
@@ -134,6 +150,10 @@ def create_stream():
             tracking_enabled=data.get('tracking_enabled', False),
             counting_enabled=data.get('counting_enabled', False),
             alert_enabled=data.get('alert_enabled', False),
+            inference_backend=inference_backend,
+            imgsz=imgsz,
+            roi_polygons=roi_polygons,
+            stream_options=stream_options,
             position_x=position_x,
             position_y=position_y,
             # 轮询相关字段
@@ -160,6 +180,10 @@ def create_stream():
             'tracking_enabled': stream.tracking_enabled,
             'counting_enabled': stream.counting_enabled,
             'alert_enabled': stream.alert_enabled,
+            'inference_backend': stream.inference_backend,
+            'imgsz': stream.imgsz,
+            'roi_polygons': _load_roi(stream),
+            **parse_stream_options(stream.stream_options),
             # 轮询配置
             'polling_enabled': stream.polling_enabled,
             'polling_type': stream.polling_type,
@@ -177,7 +201,10 @@ def create_stream():
                     'name': stream.name,
                     'position_x': stream.position_x,
                     'position_y': stream.position_y,
-                    'polling_enabled': stream.polling_enabled
+                    'polling_enabled': stream.polling_enabled,
+                    'inference_backend': stream.inference_backend,
+                    'imgsz': stream.imgsz,
+                    'roi_polygons': stream_config['roi_polygons']
                 }
             })
         else:
@@ -216,6 +243,17 @@ def update_stream(stream_id):
             if field in data:
                 setattr(stream, field, data[field])
         
+        try:
+            if 'roi_polygons' in data:
+                stream.roi_polygons = _serialize_roi(data['roi_polygons'])
+            if 'inference_backend' in data:
+                stream.inference_backend = _parse_inference_backend(data['inference_backend'])
+            if 'imgsz' in data:
+                stream.imgsz = _parse_imgsz(data['imgsz'])
+            stream.stream_options = _serialize_stream_options(stream.stream_options, data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
         # 处理轮询配置更新
         if 'polling_enabled' in data:
             stream.polling_enabled = data['polling_enabled']
@@ -265,6 +303,10 @@ def update_stream(stream_id):
             'tracking_enabled': stream.tracking_enabled,
             'counting_enabled': stream.counting_enabled,
             'alert_enabled': stream.alert_enabled,
+            'inference_backend': stream.inference_backend,
+            'imgsz': stream.imgsz,
+            'roi_polygons': _load_roi(stream),
+            **parse_stream_options(stream.stream_options),
             'polling_enabled': stream.polling_enabled,
             'polling_type': stream.polling_type,
             'polling_interval': stream.polling_interval,
@@ -276,7 +318,15 @@ def update_stream(stream_id):
         
         return jsonify({
             'success': True,
-            'message': 'RTSP流更新成功'
+            'message': 'RTSP流更新成功',
+            'stream': {
+                'id': stream.id,
+                'name': stream.name,
+                'inference_backend': stream.inference_backend,
+                'imgsz': stream.imgsz,
+                'roi_polygons': stream_config['roi_polygons'],
+                'stream_options': parse_stream_options(stream.stream_options)
+            }
         })
         
     except Exception as e:
@@ -415,6 +465,56 @@ def get_stream_frame(stream_id):
         print(f"❌ API获取流 {stream_id} 帧时异常: {e}")
         return jsonify({'success': False, 'message': f'获取帧失败: {str(e)}'}), 500
 
+@rtsp_bp.route('/streams/<int:stream_id>/mjpeg', methods=['GET'])
+def get_stream_mjpeg(stream_id):
+    """以 multipart/x-mixed-replace 方式推送RTSP流的标注画面（可直接用于<img src>）"""
+    try:
+        broadcaster = rtsp_manager.get_mjpeg_broadcaster(stream_id)
+        if broadcaster is None:
+            return jsonify({'success': False, 'message': '流不存在'}), 404
+        
+        # 观看者可以请求更低的帧率；质量与广播帧率是流级配置，所有观看者共享
+        max_fps = request.args.get('fps', type=float)
+        
+        response = Response(
+            broadcaster.stream(max_fps=max_fps),
+            mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+        )
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'获取视频流失败: {str(e)}'}), 500
+
+@rtsp_bp.route('/streams/<int:stream_id>/mjpeg/config', methods=['POST'])
+def update_stream_mjpeg_config(stream_id):
+    """调整MJPEG广播的帧率和JPEG质量"""
+    try:
+        broadcaster = rtsp_manager.get_mjpeg_broadcaster(stream_id)
+        if broadcaster is None:
+            return jsonify({'success': False, 'message': '流不存在'}), 404
+        
+        data = request.get_json() or {}
+        broadcaster.configure(fps=data.get('fps'), quality=data.get('quality'))
+        
+        # 保存为该流的运行参数，重启后仍然生效
+        stream = RTSPStream.query.filter_by(id=stream_id).first()
+        if stream is not None:
+            stream.stream_options = _serialize_stream_options(stream.stream_options, {
+                'mjpeg_fps': broadcaster.fps,
+                'mjpeg_quality': broadcaster.quality
+            })
+            db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'mjpeg': broadcaster.get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'更新视频流配置失败: {str(e)}'}), 500
+
 @rtsp_bp.route('/streams/<int:stream_id>/detections', methods=['GET'])
 def get_stream_detections(stream_id):
     """获取RTSP流的检测结果"""
@@ -580,7 +680,8 @@ def get_all_status():
         
         return jsonify({
             'success': True,
-            'streams_status': status_data
+            'streams_status': status_data,
+            'inference': rtsp_manager.get_inference_stats()
         })
         
     except Exception as e:
@@ -619,6 +720,44 @@ def get_debug_info():
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取调试信息失败: {str(e)}'}), 500
 
+def _load_roi(stream):
+    """已保存的ROI多边形列表（未设置时为空列表），接口和流配置统一使用该格式"""
+    return json.loads(stream.roi_polygons) if stream.roi_polygons else []
+
+def _serialize_roi(value):
+    """校验ROI多边形并序列化为JSON存储，空列表表示整帧检测（存为空）"""
+    polygons = parse_roi_polygons(value)
+    return json.dumps(polygons) if polygons else None
+
+def _parse_inference_backend(value):
+    """校验推理后端，为空时使用全局默认值（存为空）"""
+    if not value:
+        return None
+    if value != 'auto' and value not in BACKENDS:
+        raise ValueError(f'不支持的推理后端: {value}，可选: {" / ".join(BACKENDS + ("auto",))}')
+    return value
+
+def _parse_imgsz(value):
+    """校验推理输入尺寸并按 stride 取整，为空时使用全局默认值（存为空）"""
+    if value is None or value == '':
+        return None
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'imgsz 必须是正整数: {value}')
+    if isinstance(value, bool) or size <= 0:
+        raise ValueError(f'imgsz 必须是正整数: {value}')
+    return normalize_imgsz(size)
+
+def _serialize_stream_options(current, data):
+    """把请求中的按流运行参数合并到已保存的参数并序列化为JSON（字段为 null 时恢复全局默认值）"""
+    options = parse_stream_options(current)
+    for key in STREAM_OPTION_TYPES:
+        if key in data:
+            options[key] = data[key]
+    options = parse_stream_options(options)
+    return json.dumps(options) if options else None
+
 def _find_available_position(existing_streams):
     """查找可用的四宫格位置"""
     # 四宫格位置 (x, y): (0,0), (1,0), (0,1), (1,1)
@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from .detection_results import box_iou
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个令牌，最多积攒 capacity 个"""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> float:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        return self.tokens
+
+
+def appearance_histogram(frame: Optional[np.ndarray], bbox) -> Optional[np.ndarray]:
+    """目标区域的 HSV 色调-饱和度直方图（归一化），用于判断是否为同一目标"""
+    if frame is None:
+        return None
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = (int(v) for v in bbox)
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(width, x2), min(height, y2)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return None
+    hsv = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+
+class _StreamState:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.recent = deque()  # [{'id', 'time', 'class', 'bbox', 'hist'}]，按最近出现时间排列
+        self.stream_bucket = TokenBucket(rate, burst, now)
+        self.class_buckets: Dict[str, TokenBucket] = {}
+        self.last_check = time.monotonic()  # 最后一次检查的墙钟时间（视频任务的 now 是视频时间）
+        self.stats = {'checked': 0, 'passed': 0, 'duplicates': 0, 'rate_limited': 0}
+
+
+class AlertFilter:
+    """新目标预警的去重和限流
+
+    跟踪器丢失轨迹超过 max_disappeared 帧后会为同一个目标分配新ID，闪烁的
+    目标因此反复触发"新目标"预警。预警保存前依次经过：
+
+    1. 去重：与时间窗口 window 秒内出现过、轨迹已丢失的同类别目标比较，位置接近
+       （IoU ≥ iou_threshold 或中心距离 ≤ distance × 画面对角线）且外观相似
+       （HSV直方图相关系数 ≥ appearance_threshold，无法计算时只看位置）的视为
+       同一目标，不再预警，并刷新该目标的出现时间和位置；
+    2. 限流：每个流（摄像头会话/RTSP流/视频）一个总令牌桶，每个流的每个类别
+       一个令牌桶，两个桶都有令牌时才预警。
+
+    被限流的目标仍记入时间窗口，后续闪烁同样会被去重。
+    """
+
+    def __init__(self, window: float = 10.0, iou_threshold: float = 0.3, distance: float = 0.05,
+                 appearance_threshold: float = 0.7, class_rate: float = 0.5, class_burst: float = 10,
+                 stream_rate: float = 1.0, stream_burst: float = 20, max_recent: int = 200,
+                 idle_timeout: float = 600.0):
+        self.window = window
+        self.iou_threshold = iou_threshold
+        self.distance = distance
+        self.appearance_threshold = appearance_threshold
+        self.class_rate = class_rate
+        self.class_burst = class_burst
+        self.stream_rate = stream_rate
+        self.stream_burst = stream_burst
+        self.max_recent = max_recent
+        self.idle_timeout = idle_timeout  # 流超过该时间没有预警检查时释放其状态
+
+        self._lock = threading.Lock()
+        self._streams: Dict[str, _StreamState] = {}
+        self._last_purge = 0.0
+        self.totals = {'checked': 0, 'passed': 0, 'duplicates': 0, 'rate_limited': 0}
+
+    def init_app(self, app):
+        """从Flask配置读取去重和限流参数"""
+        self.window = app.config.get('ALERT_DEDUP_WINDOW', self.window)
+        self.iou_threshold = app.config.get('ALERT_DEDUP_IOU', self.iou_threshold)
+        self.distance = app.config.get('ALERT_DEDUP_DISTANCE', self.distance)
+        self.appearance_threshold = app.config.get('ALERT_DEDUP_APPEARANCE', self.appearance_threshold)
+        self.class_rate = app.config.get('ALERT_CLASS_RATE', self.class_rate)
+        self.class_burst = app.config.get('ALERT_CLASS_BURST', self.class_burst)
+        self.stream_rate = app.config.get('ALERT_STREAM_RATE', self.stream_rate)
+        self.stream_burst = app.config.get('ALERT_STREAM_BURST', self.stream_burst)
+
+    def filter(self, stream_key: str, frame: Optional[np.ndarray], targets: List[Dict[str, Any]],
+               live_ids: Optional[Iterable[int]] = None, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        过滤一帧的新目标，返回需要预警（保存预警帧和记录）的目标
+
+        只与之前帧记录、且轨迹已经丢失（不在 live_ids 中）的目标比较：同一帧的
+        多个新目标互不去重，仍在跟踪中的目标也不会吞掉旁边新出现的目标。
+
+        Args:
+            stream_key: 流标识（摄像头会话、RTSP流或视频任务）
+            frame: 当前帧，用于计算外观直方图（为空时只按位置去重）
+            targets: 跟踪器返回的新目标 [{'id', 'class', 'confidence', 'bbox', ...}]
+            live_ids: 跟踪器中仍存在的轨迹ID，为空时视为全部已丢失
+            now: 时间戳（秒），视频文件传入视频时间，默认使用单调时钟
+        """
+        if not targets:
+            return []
+        now = time.monotonic() if now is None else now
+        live_ids = set(live_ids) if live_ids is not None else set()
+
+        with self._lock:
+            self._purge_idle_streams()
+            state = self._streams.get(stream_key)
+            if state is None:
+                state = self._streams[stream_key] = _StreamState(self.stream_rate, self.stream_burst, now)
+            state.last_check = time.monotonic()
+            while state.recent and now - state.recent[0]['time'] > self.window:
+                state.recent.popleft()
+
+            diagonal = float(np.hypot(*frame.shape[:2])) if frame is not None else None
+            lost = [entry for entry in state.recent if entry['id'] not in live_ids]
+            reappeared, added, passed = [], [], []
+            for target in targets:
+                hist = appearance_histogram(frame, target['bbox'])
+                self._count(state, 'checked')
+
+                duplicate = self._find_duplicate(lost, target, hist, diagonal)
+                if duplicate is not None:
+                    # 同一目标以新ID再次出现：记录改为新ID，每个丢失的目标只能被认领一次
+                    lost.remove(duplicate)
+                    duplicate.update(id=target['id'], time=now, bbox=target['bbox'],
+                                     hist=hist if hist is not None else duplicate['hist'])
+                    reappeared.append(duplicate)
+                    self._count(state, 'duplicates')
+                    continue
+
+                added.append({'id': target['id'], 'time': now, 'class': target['class'],
+                              'bbox': target['bbox'], 'hist': hist})
+                if not self._take_token(state, target['class'], now):
+                    self._count(state, 'rate_limited')
+                    continue
+
+                self._count(state, 'passed')
+                passed.append(target)
+
+            # 本帧的目标在循环结束后才记入，移到队尾保持按时间排列
+            for entry in reappeared:
+                state.recent.remove(entry)
+            state.recent.extend(reappeared + added)
+            while len(state.recent) > self.max_recent:
+                state.recent.popleft()
+
+        return passed
+
+    def _find_duplicate(self, candidates: List[Dict[str, Any]], target, hist, diagonal) -> Optional[Dict[str, Any]]:
+        """在已丢失的目标中查找同类别、位置接近且外观相似的目标"""
+        candidates = [entry for entry in candidates if entry['class'] == target['class']]
+        if not candidates:
+            return None
+
+        boxes = np.array([entry['bbox'] for entry in candidates], dtype=np.float64)
+        box = np.array([target['bbox']], dtype=np.float64)
+        iou = box_iou(box, boxes)[0]
+        close = iou >= self.iou_threshold
+        if diagonal:
+            centers = (boxes[:, :2] + boxes[:, 2:4]) / 2
+            center = (box[0, :2] + box[0, 2:4]) / 2
+            close |= np.hypot(*(centers - center).T) <= self.distance * diagonal
+
+        # 最近出现的候选优先
+        for index in np.flatnonzero(close)[::-1]:
+            entry = candidates[index]
+            if hist is None or entry['hist'] is None:
+                return entry
+            if cv2.compareHist(hist, entry['hist'], cv2.HISTCMP_CORREL) >= self.appearance_threshold:
+                return entry
+        return None
+
+    def _take_token(self, state: _StreamState, class_name: str, now: float) -> bool:
+        bucket = state.class_buckets.get(class_name)
+        if bucket is None:
+            bucket = state.class_buckets[class_name] = TokenBucket(self.class_rate, self.class_burst, now)
+        if bucket.refill(now) < 1 or state.stream_bucket.refill(now) < 1:
+            return False
+        bucket.tokens -= 1
+        state.stream_bucket.tokens -= 1
+        return True
+
+    def _count(self, state: _StreamState, key: str):
+        state.stats[key] += 1
+        self.totals[key] += 1
+
+    def _purge_idle_streams(self):
+        """释放长时间没有预警检查的流（会话结束、视频任务完成等）"""
+        wall = time.monotonic()
+        if wall - self._last_purge < 60:
+            return
+        self._last_purge = wall
+        for key in [key for key, state in self._streams.items() if wall - state.last_check > self.idle_timeout]:
+            del self._streams[key]
+
+    def reset(self, stream_key: str):
+        """清除流的去重记录和令牌桶（视频任务结束、跟踪器重置时调用）"""
+        with self._lock:
+            self._streams.pop(stream_key, None)
+
+    def get_stats(self, stream_key: Optional[str] = None) -> Dict[str, Any]:
+        """获取去重和限流统计；指定 stream_key 时返回该流的统计"""
+        with self._lock:
+            if stream_key is not None:
+                state = self._streams.get(stream_key)
+                stats = dict(state.stats) if state else {'checked': 0, 'passed': 0, 'duplicates': 0, 'rate_limited': 0}
+                stats['recent_targets'] = len(state.recent) if state else 0
+            else:
+                stats = dict(self.totals)
+                stats['streams'] = len(self._streams)
+            stats['suppressed_ratio'] = round(1 - stats['passed'] / stats['checked'], 3) if stats['checked'] else 0
+            return stats
+
+
+# 全局预警过滤器实例
+alert_filter = AlertFilter()
@@ -0,0 +1,305 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import cv2
+
+from models.database import db, AlertRecord
+
+_STOP = object()
+
+
+def draw_alert(frame, target: Dict[str, Any], alert_time: datetime):
+    """在帧的副本上绘制预警框、标签和预警时间"""
+    frame_copy = frame.copy()
+    x1, y1, x2, y2 = target['bbox']
+
+    # 绘制红色预警框
+    cv2.rectangle(frame_copy, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 3)
+
+    # 绘制预警标签
+    alert_label = f'ALERT! New {target["class"]} ID:{target["id"]}'
+    label_size = cv2.getTextSize(alert_label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+
+    # 预警标签背景（红色）
+    cv2.rectangle(frame_copy, (int(x1), int(y1) - label_size[1] - 15),
+                  (int(x1) + label_size[0] + 10, int(y1)), (0, 0, 255), -1)
+
+    # 预警标签文字（白色）
+    cv2.putText(frame_copy, alert_label, (int(x1) + 5, int(y1) - 5),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    # 在图像顶部添加时间戳
+    timestamp_text = f'Alert Time: {alert_time.strftime("%Y-%m-%d %H:%M:%S")}'
+    cv2.putText(frame_copy, timestamp_text, (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+    return frame_copy
+
+
+class AlertWriter:
+    """预警帧异步写入服务
+
+    检测循环只做一次帧拷贝并把预警放入有界队列后立即返回；后台线程池
+    负责绘制、JPEG编码和写文件，写好的预警记录由单独的线程按批（达到
+    batch_size 或每 flush_interval 秒）在一个事务中插入 AlertRecord。
+
+    队列满时新的预警被丢弃并计数，检测循环不会被阻塞；进程退出或
+    shutdown() 时会等待队列中的预警全部写完并提交。每条预警按提交来源
+    （摄像头会话、视频任务等）计数，flush(source=...) 只等待该来源自己的
+    预警，不受其他仍在提交的实时流影响。
+    """
+
+    def __init__(self, max_queue: int = 256, workers: int = 2, batch_size: int = 50,
+                 flush_interval: float = 1.0, jpeg_quality: int = 90):
+        self.max_queue = max_queue
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.jpeg_quality = jpeg_quality
+
+        self.app = None
+        self._queue: Optional[queue.Queue] = None
+        self._records: queue.Queue = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._flusher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending: Dict[Optional[str], int] = {}  # 每个来源已提交、尚未入库（或失败）的预警数
+        self._stopped = False  # 不再接收新预警
+        self._encoders_done = False  # 编码线程已全部退出，数据库线程写完剩余记录后退出
+
+        self.queued = 0
+        self.written_images = 0
+        self.inserted_records = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.encode_time = 0.0
+        self.commit_time = 0.0
+
+    def init_app(self, app):
+        """从Flask配置读取参数并启动后台线程"""
+        self.app = app
+        self.max_queue = app.config.get('ALERT_QUEUE_SIZE', self.max_queue)
+        self.workers = app.config.get('ALERT_WRITER_WORKERS', self.workers)
+        self.batch_size = app.config.get('ALERT_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('ALERT_FLUSH_INTERVAL', self.flush_interval)
+        self.jpeg_quality = app.config.get('ALERT_JPEG_QUALITY', self.jpeg_quality)
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._threads = [
+            threading.Thread(target=self._encode_loop, name=f'alert-writer-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        self._flusher = threading.Thread(target=self._flush_loop, name='alert-writer-db', daemon=True)
+        for thread in self._threads + [self._flusher]:
+            thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, frame, user_id, targets: List[Dict[str, Any]], frame_number: Optional[int] = None,
+               detection_result_id: Optional[int] = None, source: Optional[str] = None) -> List[str]:
+        """
+        提交一帧上的新目标预警（不阻塞）
+
+        同一帧的多个目标共用一次帧拷贝，每个目标一张预警图像。source 标识提交
+        来源，用于 flush(source=...) 和预警图像文件名（不同会话的轨迹ID会重复）。
+
+        Returns:
+            List[str]: 预警图像的相对路径（static 下，写入完成前文件可能尚不存在）；队列满被丢弃时为空列表
+        """
+        if not targets:
+            return []
+        if self._queue is None or self._stopped:
+            with self._lock:
+                self.dropped += len(targets)
+            return []
+
+        alert_time = datetime.now()
+        timestamp = alert_time.strftime('%Y%m%d_%H%M%S_%f')[:-3]  # 精确到毫秒
+        prefix = f'alert_{re.sub(r"[^0-9A-Za-z_-]+", "_", source)}_' if source else 'alert_'
+        images = [
+            os.path.join('alerts', f'{prefix}{timestamp}_id{target["id"]}_{uuid.uuid4().hex[:6]}.jpg')
+            for target in targets
+        ]
+        item = {
+            'frame': frame.copy(),  # 调用方会继续在原帧上绘制
+            'targets': [dict(target) for target in targets],
+            'images': images,
+            'user_id': user_id,
+            'frame_number': frame_number,
+            'detection_result_id': detection_result_id,
+            'alert_time': alert_time,
+            'created_at': datetime.utcnow(),
+            'source': source
+        }
+        with self._lock:
+            # 先计数再入队，flush() 不会在预警入队前误判为已写完
+            self._pending[source] = self._pending.get(source, 0) + len(targets)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._idle:
+                self.dropped += len(targets)
+                self._settle(source, len(targets))
+            print(f"⚠️ 预警写入队列已满，丢弃 {len(targets)} 条预警")
+            return []
+
+        with self._lock:
+            self.queued += len(targets)
+        return images
+
+    def _settle(self, source: Optional[str], count: int):
+        """预警已入库或失败，减少来源的待写计数（调用方持有 self._idle）"""
+        remaining = self._pending.get(source, 0) - count
+        if remaining > 0:
+            self._pending[source] = remaining
+        else:
+            self._pending.pop(source, None)
+        self._idle.notify_all()
+
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write_images(item, params)
+            finally:
+                self._queue.task_done()
+
+    def _write_images(self, item, params):
+        alert_dir = os.path.join('static', 'alerts')
+        os.makedirs(alert_dir, exist_ok=True)
+        for target, image in zip(item['targets'], item['images']):
+            start_time = time.perf_counter()
+            try:
+                annotated = draw_alert(item['frame'], target, item['alert_time'])
+                ok, buffer = cv2.imencode('.jpg', annotated, params)
+                if not ok:
+                    raise RuntimeError('JPEG编码失败')
+                with open(os.path.join('static', image), 'wb') as f:
+                    f.write(buffer.tobytes())
+            except Exception as e:
+                with self._idle:
+                    self.failed += 1
+                    self._settle(item['source'], 1)
+                print(f"❌ 保存预警帧失败: {e}")
+                continue
+
+            with self._lock:
+                self.written_images += 1
+                self.encode_time += time.perf_counter() - start_time
+            self._records.put((item['source'], {
+                'user_id': item['user_id'],
+                'detection_result_id': item['detection_result_id'],
+                'target_id': target['id'],
+                'target_class': target['class'],
+                'frame_number': item['frame_number'],
+                'frame_image': image,
+                'bbox': json.dumps(target['bbox']),
+                'confidence': target['confidence'],
+                'description': f'新目标出现: {target["class"]} (ID: {target["id"]})',
+                'is_handled': False,
+                'created_at': item['created_at']
+            }))
+
+    def _flush_loop(self):
+        while not (self._encoders_done and self._records.empty()):
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                self._insert(batch)
+
+    def _take_batch(self, timeout: float) -> List[tuple]:
+        """取出一批待插入的 (来源, 记录)（最多 batch_size 条，最多等待 timeout 秒）"""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._records.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch: List[tuple]):
+        """在一个事务中批量插入预警记录"""
+        start_time = time.perf_counter()
+        error = None
+        with self.app.app_context():
+            try:
+                db.session.bulk_insert_mappings(AlertRecord, [record for _, record in batch])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                error = e
+        with self._idle:
+            for source, _ in batch:
+                self._settle(source, 1)
+            if error is None:
+                self.inserted_records += len(batch)
+                self.batches += 1
+                self.commit_time += time.perf_counter() - start_time
+            else:
+                self.failed += len(batch)
+        if error is None:
+            print(f"🚨 预警记录已保存: {len(batch)} 条")
+        else:
+            print(f"❌ 批量写入预警记录失败 ({len(batch)} 条): {error}")
+
+    def flush(self, timeout: Optional[float] = None, source: Optional[str] = None) -> bool:
+        """
+        等待已提交的预警写入文件和数据库，返回是否在超时前完成
+
+        指定 source 时只等待该来源提交的预警；timeout 是整个等待的上限。
+        """
+        if self._queue is None:
+            return True
+        with self._idle:
+            if source is None:
+                return self._idle.wait_for(lambda: not self._pending, timeout)
+            return self._idle.wait_for(lambda: source not in self._pending, timeout)
+
+    def shutdown(self, timeout: float = 10.0):
+        """停止接收新预警，写完队列中的预警后退出（进程退出时自动调用）"""
+        if self._queue is None or self._stopped:
+            return
+        self._stopped = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._encoders_done = True
+        self._flusher.join(max(0.0, deadline - time.monotonic()))
+        stats = self.get_stats()
+        print(f"✅ 预警写入服务已关闭: 写入 {stats['inserted_records']} 条, 丢弃 {stats['dropped']} 条")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queue_size': self._queue.qsize() if self._queue is not None else 0,
+                'max_queue': self.max_queue,
+                'pending_records': sum(self._pending.values()),
+                'queued': self.queued,
+                'written_images': self.written_images,
+                'inserted_records': self.inserted_records,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+                'encode_ms_avg': round(self.encode_time * 1000 / self.written_images, 2) if self.written_images else 0,
+                'commit_ms_avg': round(self.commit_time * 1000 / self.batches, 2) if self.batches else 0
+            }
+
+
+# 全局预警写入服务实例
+alert_writer = AlertWriter()
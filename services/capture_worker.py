@@ -0,0 +1,93 @@
+import json
+import sys
+import time
+
+import cv2
+
+from .frame_ring import (SharedFrameRing, CAPTURE_CONNECTING, CAPTURE_RUNNING, CAPTURE_RECONNECTING,
+                         CAPTURE_STOPPED, CAPTURE_FAILED)
+
+
+def _untrack(ring: SharedFrameRing):
+    """共享内存由主进程创建和删除，子进程退出时不能被本进程的 resource_tracker 删除"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(ring.shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _wait(ring: SharedFrameRing, seconds: float):
+    """等待指定时间，期间收到停止请求时提前返回"""
+    deadline = time.monotonic() + seconds
+    while not ring.stop_requested and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+def capture_main(ring_name, slots, max_height, max_width, url, is_local_file, options):
+    """解码视频流并写入共享内存环，直到主进程请求停止或重连次数用尽"""
+    ring = SharedFrameRing.attach(ring_name, slots, max_height, max_width)
+    _untrack(ring)
+    reconnect_attempts = 0
+    max_reconnect_attempts = options.get('max_reconnect_attempts', 5)
+    reconnect_delay = options.get('reconnect_delay', 5)
+    resize_width = options.get('max_width', max_width)
+
+    try:
+        while not ring.stop_requested:
+            ring.set_state(CAPTURE_CONNECTING if reconnect_attempts == 0 else CAPTURE_RECONNECTING)
+            if is_local_file:
+                cap = cv2.VideoCapture(url)
+            else:
+                cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                try:
+                    cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 10000)
+                    cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
+                except Exception:
+                    pass
+
+            if cap.isOpened():
+                ring.set_state(CAPTURE_RUNNING)
+                # 本地文件按文件自身的帧率播放（读不到有效帧率时按30帧）
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                frame_interval = 1.0 / (fps if 0 < fps <= 120 else 30)
+                while not ring.stop_requested:
+                    ret, frame = cap.read()
+                    if not ret:
+                        if is_local_file:
+                            # 本地视频文件循环播放
+                            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                            ret, frame = cap.read()
+                        if not ret:
+                            break
+                    ring.write(frame, resize_width)
+                    reconnect_attempts = 0
+                    if is_local_file:
+                        # 本地文件按原节奏播放，避免解码空转
+                        time.sleep(frame_interval)
+            cap.release()
+
+            if ring.stop_requested:
+                break
+            reconnect_attempts += 1
+            if reconnect_attempts > max_reconnect_attempts:
+                ring.set_state(CAPTURE_FAILED)
+                return
+            ring.set_state(CAPTURE_RECONNECTING)
+            _wait(ring, reconnect_delay)
+
+        ring.set_state(CAPTURE_STOPPED)
+    finally:
+        ring.close()
+
+
+def main():
+    """采集进程入口（python -m services.capture_worker），连接参数以JSON从标准输入读取"""
+    config = json.loads(sys.stdin.read())
+    capture_main(config['ring_name'], config['slots'], config['max_height'], config['max_width'],
+                 config['url'], config['is_local_file'], config['options'])
+
+
+if __name__ == '__main__':
+    main()
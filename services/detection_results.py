@@ -0,0 +1,94 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# 空结果（避免每帧重复分配）
+_EMPTY_XYXY = np.zeros((0, 4), dtype=np.float32)
+_EMPTY_CONF = np.zeros((0,), dtype=np.float32)
+_EMPTY_CLS = np.zeros((0,), dtype=np.int64)
+
+
+def to_numpy(data) -> np.ndarray:
+    """将torch张量或类数组对象转换为numpy数组（张量只做一次设备传输）"""
+    if hasattr(data, 'cpu'):
+        data = data.cpu()
+    if hasattr(data, 'numpy'):
+        return data.numpy()
+    return np.asarray(data)
+
+
+def boxes_to_arrays(result) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    将单帧YOLO结果的检测框一次性转移到主机内存
+
+    boxes.data 的布局为 [x1, y1, x2, y2, (track_id,) conf, cls]，
+    整块传输一次后再切分，避免逐框调用 .cpu().numpy()。
+
+    Args:
+        result: YOLO单帧结果（需具有 boxes 属性）
+
+    Returns:
+        Tuple: (xyxy (N,4) float32, conf (N,) float32, cls (N,) int64)，均为连续数组
+    """
+    boxes = getattr(result, 'boxes', None)
+    if boxes is None or len(boxes) == 0:
+        return _EMPTY_XYXY, _EMPTY_CONF, _EMPTY_CLS
+
+    data = to_numpy(boxes.data)
+    xyxy = np.ascontiguousarray(data[:, :4], dtype=np.float32)
+    conf = np.ascontiguousarray(data[:, -2], dtype=np.float32)
+    cls = data[:, -1].astype(np.int64)
+    return xyxy, conf, cls
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray, metric: str = 'iou') -> np.ndarray:
+    """
+    两组 xyxy 框的重叠度矩阵 (len(a), len(b))
+
+    Args:
+        metric: 'iou' 交并比；'ios' 交集占较小框面积的比例（被切割的框与完整框也能判为重叠）
+    """
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:4], boxes_b[None, :, 2:4])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:4] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:4] - boxes_b[:, :2], axis=1)
+    if metric == 'ios':
+        denominator = np.minimum(area_a[:, None], area_b[None, :])
+    else:
+        denominator = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(denominator, 1e-9)
+
+
+def build_detections(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray, names,
+                     min_confidence: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    由检测数组构建标准检测结果列表
+
+    Args:
+        xyxy: 边界框数组 (N,4)
+        conf: 置信度数组 (N,)
+        cls: 类别ID数组 (N,)
+        names: 类别名称映射（model.names）
+        min_confidence: 仅保留置信度大于该值的检测框
+
+    Returns:
+        List[Dict]: [{'class', 'confidence', 'bbox'}, ...]
+    """
+    if min_confidence is not None and len(conf) > 0:
+        keep = conf > min_confidence
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+    # tolist() 一次性转换为Python数值，避免逐元素float()
+    return [
+        {'class': names[class_id], 'confidence': confidence, 'bbox': bbox}
+        for bbox, confidence, class_id in zip(xyxy.tolist(), conf.tolist(), cls.tolist())
+    ]
+
+
+def result_to_detections(result, names, min_confidence: Optional[float] = None,
+                         transform=None) -> List[Dict[str, Any]]:
+    """将单帧YOLO结果转换为标准检测结果列表（transform 为输入时使用的 LetterboxTransform，框映射回原图坐标）"""
+    xyxy, conf, cls = boxes_to_arrays(result)
+    if transform is not None:
+        xyxy = transform.unmap_boxes(xyxy)
+    return build_detections(xyxy, conf, cls, names, min_confidence)
@@ -0,0 +1,229 @@
+import json
+import os
+import subprocess
+import sys
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 头部字段（int64）
+_WRITE_SEQ = 0      # 最新已发布帧的序号（从1开始，0表示还没有帧）
+_STATE = 1          # 采集进程状态
+_STOP = 2           # 停止请求（非0时采集进程退出）
+_HEADER_FIELDS = 4
+# 每个槽位的元数据（int64）：帧序号（-1表示正在写入）、高、宽
+_SLOT_FIELDS = 3
+
+# 采集进程状态
+CAPTURE_CONNECTING = 0
+CAPTURE_RUNNING = 1
+CAPTURE_RECONNECTING = 2
+CAPTURE_STOPPED = 3
+CAPTURE_FAILED = 4
+
+CAPTURE_STATE_NAMES = {
+    CAPTURE_CONNECTING: 'connecting',
+    CAPTURE_RUNNING: 'running',
+    CAPTURE_RECONNECTING: 'reconnecting',
+    CAPTURE_STOPPED: 'stopped',
+    CAPTURE_FAILED: 'failed'
+}
+
+
+class SharedFrameRing:
+    """基于 multiprocessing.shared_memory 的定长帧环形缓冲区
+
+    采集进程把解码后的帧直接写入下一个槽位并发布其序号。读取方通过
+    snapshot() 把最新槽位拷贝出来再使用（推理和绘制期间采集进程会继续
+    覆盖槽位），拷贝后用 is_current() 校验拷贝期间槽位未被覆盖，被覆盖
+    时重新拷贝。view() 只是拷贝的来源，不应在拷贝之外长期持有。
+
+    单写多读：只有采集进程写入。
+    """
+
+    def __init__(self, slots: int, max_height: int, max_width: int, channels: int = 3,
+                 name: Optional[str] = None, create: bool = False):
+        self.slots = slots
+        self.max_height = max_height
+        self.max_width = max_width
+        self.channels = channels
+        self._owner = create
+
+        header_bytes = (_HEADER_FIELDS + slots * _SLOT_FIELDS) * 8
+        frame_bytes = max_height * max_width * channels
+        size = header_bytes + slots * frame_bytes
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self._slot_meta = np.ndarray((slots, _SLOT_FIELDS), dtype=np.int64, buffer=self.shm.buf,
+                                     offset=_HEADER_FIELDS * 8)
+        self._frames = np.ndarray((slots, max_height, max_width, channels), dtype=np.uint8,
+                                  buffer=self.shm.buf, offset=header_bytes)
+        if create:
+            self._header[:] = 0
+            self._slot_meta[:] = 0
+
+    @classmethod
+    def create(cls, slots: int, max_height: int, max_width: int, channels: int = 3) -> 'SharedFrameRing':
+        """创建新的共享内存环（由创建方负责 unlink）"""
+        return cls(slots, max_height, max_width, channels, create=True)
+
+    @classmethod
+    def attach(cls, name: str, slots: int, max_height: int, max_width: int, channels: int = 3) -> 'SharedFrameRing':
+        """连接已存在的共享内存环"""
+        return cls(slots, max_height, max_width, channels, name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def state(self) -> int:
+        return int(self._header[_STATE])
+
+    def set_state(self, state: int):
+        self._header[_STATE] = state
+
+    @property
+    def stop_requested(self) -> bool:
+        return bool(self._header[_STOP])
+
+    def request_stop(self):
+        self._header[_STOP] = 1
+
+    def fit_size(self, width: int, height: int, max_width: int) -> Tuple[int, int]:
+        """计算帧写入槽位时的尺寸（先按 max_width 缩放，再保证不超出槽位）"""
+        ratio = min(1.0, max_width / width, self.max_width / width, self.max_height / height)
+        if ratio >= 1.0:
+            return width, height
+        return max(1, int(width * ratio)), max(1, int(height * ratio))
+
+    def write(self, frame: np.ndarray, max_width: Optional[int] = None) -> int:
+        """
+        写入一帧（必要时直接缩放到槽位内存中），返回发布的帧序号
+
+        Args:
+            frame: 解码得到的BGR帧
+            max_width: 最大宽度，超过时等比缩放
+        """
+        seq = int(self._header[_WRITE_SEQ]) + 1
+        slot = seq % self.slots
+        height, width = frame.shape[:2]
+        new_width, new_height = self.fit_size(width, height, max_width or self.max_width)
+
+        # 标记槽位正在写入，读取方据此判断数据失效
+        self._slot_meta[slot, 0] = -1
+        target = self._frames[slot, :new_height, :new_width]
+        if (new_width, new_height) == (width, height):
+            np.copyto(target, frame)
+        else:
+            cv2.resize(frame, (new_width, new_height), dst=target)
+        self._slot_meta[slot, 1] = new_height
+        self._slot_meta[slot, 2] = new_width
+        self._slot_meta[slot, 0] = seq
+        self._header[_WRITE_SEQ] = seq
+        return seq
+
+    def latest(self) -> Optional[Tuple[int, int]]:
+        """获取最新已发布帧的 (序号, 槽位)，没有帧时返回 None"""
+        seq = int(self._header[_WRITE_SEQ])
+        if seq == 0:
+            return None
+        return seq, seq % self.slots
+
+    def view(self, slot: int) -> np.ndarray:
+        """槽位中帧数据的视图（数据随时可能被采集进程覆盖，读取方应通过 snapshot() 拷贝）"""
+        height, width = int(self._slot_meta[slot, 1]), int(self._slot_meta[slot, 2])
+        return self._frames[slot, :height, :width]
+
+    def is_current(self, seq: int) -> bool:
+        """检查序号为 seq 的帧是否仍未被覆盖"""
+        return int(self._slot_meta[seq % self.slots, 0]) == seq
+
+    def snapshot(self, retries: int = 3) -> Optional[Tuple[int, np.ndarray]]:
+        """拷贝最新帧（校验拷贝期间未被覆盖，被覆盖时重试），连续失败时返回 None"""
+        for _ in range(retries):
+            latest = self.latest()
+            if latest is None:
+                return None
+            seq, slot = latest
+            frame = self.view(slot).copy()
+            if self.is_current(seq):
+                return seq, frame
+        return None
+
+    def close(self):
+        """释放本进程的映射（仍有视图引用时保留映射，由GC释放）"""
+        self._header = self._slot_meta = self._frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+    def unlink(self):
+        """删除共享内存（仅创建方调用）"""
+        if self._owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class CaptureProcess:
+    """独立采集进程：在Flask进程的GIL之外解码视频流并写入共享内存环
+
+    子进程以 `python -m services.capture_worker` 启动，只导入 OpenCV 和共享
+    内存环，不会重新执行 app.py 的初始化（加载模型、启动后台线程等）。
+    连接参数（含认证信息）通过标准输入传递，不出现在进程命令行中；停止
+    请求写入共享内存环的头部。
+    """
+
+    def __init__(self, url: str, is_local_file: bool = False, slots: int = 8,
+                 max_height: int = 1080, max_width: int = 1920, options: Optional[dict] = None):
+        self.url = url
+        self.is_local_file = is_local_file
+        self.options = options or {}
+        self.ring = SharedFrameRing.create(slots, max_height, max_width)
+        self.process = None
+
+    def start(self):
+        config = {
+            'ring_name': self.ring.name,
+            'slots': self.ring.slots,
+            'max_height': self.ring.max_height,
+            'max_width': self.ring.max_width,
+            'url': self.url,
+            'is_local_file': self.is_local_file,
+            'options': self.options
+        }
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'services.capture_worker'],
+            stdin=subprocess.PIPE, cwd=package_root
+        )
+        self.process.stdin.write(json.dumps(config).encode('utf-8'))
+        self.process.stdin.close()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def state_name(self) -> str:
+        return CAPTURE_STATE_NAMES.get(self.ring.state, 'unknown')
+
+    def stop(self, timeout: float = 5):
+        """停止采集进程并释放共享内存"""
+        self.ring.request_stop()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.terminate()
+                try:
+                    self.process.wait(1)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+        self.ring.close()
+        self.ring.unlink()
@@ -0,0 +1,146 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class AdaptiveFrameScheduler:
+    """按实测推理耗时和解码帧率自适应选择检测间隔（stride）
+
+    一个目标从出现到被检测出来，最坏要等一个检测间隔再加上一次处理：
+
+        检测延迟 ≈ stride × 帧间隔 + 端到端处理延迟
+
+    调度器在满足目标延迟的前提下选择尽量大的 stride，把多余的算力留给
+    其他流；同时 stride 不能小于推理能跟上解码所需的最小值（推理耗时 /
+    (帧间隔 × 最大占用率)），否则处理线程会积压帧。两者冲突时优先保证
+    能跟上解码，并在统计中标记目标延迟无法满足。
+
+    stride 以源帧计数（包括被丢弃的旧帧），与解码帧率的单位一致。
+    """
+
+    def __init__(self, target_latency_ms: float = 500, min_stride: int = 1, max_stride: int = 30,
+                 max_utilization: float = 0.8, smoothing: float = 0.2, fps_window: float = 2.0):
+        self.target_latency_ms = target_latency_ms
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.max_utilization = max_utilization
+        self.smoothing = smoothing  # 指数滑动平均系数
+        self.fps_window = fps_window  # 解码帧率统计窗口（秒）
+
+        self._lock = threading.Lock()
+        self._decode_times = deque()
+        self.stride = self.min_stride
+        self.target_met = True
+        self.inference_ms: Optional[float] = None
+        self.latency_ms: Optional[float] = None  # 解码完成到结果发布的端到端延迟
+        self._last_detect_index: Optional[int] = None
+        self.decoded_frames = 0
+        self.dropped_frames = 0
+        self.detections = 0
+
+    def configure(self, target_latency_ms: Optional[float] = None, max_stride: Optional[int] = None):
+        """调整目标延迟或最大间隔（流配置更新时调用）"""
+        with self._lock:
+            if target_latency_ms:
+                self.target_latency_ms = float(target_latency_ms)
+            if max_stride:
+                self.max_stride = max(self.min_stride, int(max_stride))
+            self._update_stride()
+
+    def record_decoded(self, count: int = 1, dropped: bool = False, now: Optional[float] = None):
+        """记录解码（或丢弃）的源帧"""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            for _ in range(count):
+                self._decode_times.append(now)
+            while self._decode_times and now - self._decode_times[0] > self.fps_window:
+                self._decode_times.popleft()
+            self.decoded_frames += count
+            if dropped:
+                self.dropped_frames += count
+
+    @property
+    def decode_fps(self) -> float:
+        """最近窗口内的源帧速率"""
+        with self._lock:
+            return self._decode_fps()
+
+    def _decode_fps(self) -> float:
+        times = self._decode_times
+        if len(times) < 2:
+            return 0.0
+        span = times[-1] - times[0]
+        return (len(times) - 1) / span if span > 0 else 0.0
+
+    def should_detect(self, frame_index: int) -> bool:
+        """第 frame_index 个源帧是否需要检测"""
+        with self._lock:
+            return self._last_detect_index is None or frame_index - self._last_detect_index >= self.stride \
+                or frame_index < self._last_detect_index  # 序号回绕（如重连）时重新开始
+
+    def record_detection(self, frame_index: int, inference_ms: float, latency_ms: float):
+        """
+        记录一次检测并重新计算 stride
+
+        Args:
+            frame_index: 被检测帧的源帧序号
+            inference_ms: 模型推理耗时
+            latency_ms: 帧解码完成到检测结果发布的耗时
+        """
+        with self._lock:
+            self._last_detect_index = frame_index
+            self.detections += 1
+            alpha = self.smoothing
+            self.inference_ms = inference_ms if self.inference_ms is None else \
+                (1 - alpha) * self.inference_ms + alpha * inference_ms
+            self.latency_ms = latency_ms if self.latency_ms is None else \
+                (1 - alpha) * self.latency_ms + alpha * latency_ms
+            self._update_stride()
+
+    def record_skip(self, frame_index: int):
+        """记录一次被跳过的检测（如画面无变化），下一次检测仍按当前 stride 间隔"""
+        with self._lock:
+            self._last_detect_index = frame_index
+
+    def _update_stride(self):
+        fps = self._decode_fps()
+        if fps <= 0 or self.inference_ms is None:
+            return
+        frame_ms = 1000.0 / fps
+        # 推理能跟上解码所需的最小间隔
+        sustainable = math.ceil(self.inference_ms / (frame_ms * self.max_utilization))
+        # 满足目标延迟允许的最大间隔
+        latency_bound = math.floor((self.target_latency_ms - (self.latency_ms or 0)) / frame_ms)
+        self.target_met = latency_bound >= max(sustainable, self.min_stride)
+        self.stride = int(min(max(sustainable, latency_bound, self.min_stride), self.max_stride))
+
+    def frames_to_drop(self, elapsed: float, fps: Optional[float] = None) -> int:
+        """
+        处理一帧耗时 elapsed 秒期间积压的源帧数（这些帧应直接丢弃而不是排队处理）
+
+        Args:
+            elapsed: 从读取该帧到处理完成的秒数
+            fps: 源帧率，为空时使用实测解码帧率（本地视频文件传入文件帧率）
+        """
+        fps = fps or self.decode_fps
+        return int(elapsed * fps) if fps > 0 else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            fps = self._decode_fps()
+            frame_ms = 1000.0 / fps if fps > 0 else None
+            expected = self.stride * frame_ms + (self.latency_ms or 0) if frame_ms else None
+            return {
+                'stride': self.stride,
+                'decode_fps': round(fps, 2),
+                'inference_ms': round(self.inference_ms, 2) if self.inference_ms is not None else None,
+                'end_to_end_latency_ms': round(self.latency_ms, 2) if self.latency_ms is not None else None,
+                'expected_detection_latency_ms': round(expected, 1) if expected is not None else None,
+                'target_latency_ms': self.target_latency_ms,
+                'target_met': self.target_met,
+                'decoded_frames': self.decoded_frames,
+                'dropped_frames': self.dropped_frames,
+                'detections': self.detections
+            }
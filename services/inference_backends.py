@@ -0,0 +1,338 @@
+import ast
+import glob
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime 为可选依赖
+    ort = None
+
+try:
+    import openvino as ov
+except ImportError:  # openvino 为可选依赖
+    ov = None
+
+BACKEND_TORCH = 'torch'
+BACKEND_ONNXRUNTIME = 'onnxruntime'
+BACKEND_OPENVINO = 'openvino'
+BACKENDS = (BACKEND_TORCH, BACKEND_ONNXRUNTIME, BACKEND_OPENVINO)
+
+
+def available_backends() -> Dict[str, bool]:
+    """各推理后端在当前环境中是否可用"""
+    return {
+        BACKEND_TORCH: True,
+        BACKEND_ONNXRUNTIME: ort is not None,
+        BACKEND_OPENVINO: ov is not None
+    }
+
+
+def resolve_backend(model_path: str, backend: Optional[str] = None) -> str:
+    """
+    确定模型使用的后端
+
+    backend 为空或 'auto' 时按文件类型选择：.onnx 优先用 ONNX Runtime，
+    OpenVINO 导出目录/.xml 用 OpenVINO，其余使用 PyTorch。
+    """
+    if backend and backend != 'auto':
+        if backend not in BACKENDS:
+            raise ValueError(f'不支持的推理后端: {backend}')
+        return backend
+
+    lower_path = model_path.lower().rstrip('/\\')
+    if lower_path.endswith('.onnx') and ort is not None:
+        return BACKEND_ONNXRUNTIME
+    if (lower_path.endswith('.xml') or lower_path.endswith('_openvino_model')) and ov is not None:
+        return BACKEND_OPENVINO
+    return BACKEND_TORCH
+
+
+class BackendBoxes:
+    """与 ultralytics Boxes 兼容的检测框，data 布局为 [x1, y1, x2, y2, conf, cls]"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.data[:, :4]
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.data[:, 4]
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.data[:, 5]
+
+
+class BackendResult:
+    """与 ultralytics Results 兼容的单帧检测结果（仅检测框，不含掩码）"""
+
+    def __init__(self, data: np.ndarray, names: Dict[int, str], orig_shape: Tuple[int, int]):
+        self.boxes = BackendBoxes(data)
+        self.masks = None
+        self.names = names
+        self.orig_shape = orig_shape
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int]) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    等比缩放并填充到 new_shape (高, 宽)
+
+    Returns:
+        (填充后的图像, 缩放比例, (左侧填充, 顶部填充))
+    """
+    height, width = image.shape[:2]
+    ratio = min(new_shape[0] / height, new_shape[1] / width)
+    resized_width, resized_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_w = (new_shape[1] - resized_width) / 2
+    pad_h = (new_shape[0] - resized_height) / 2
+
+    if (resized_width, resized_height) != (width, height):
+        image = cv2.resize(image, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio, (left, top)
+
+
+def postprocess_detections(output: np.ndarray, conf_threshold: float, iou_threshold: float,
+                           ratio: float, pad: Tuple[float, float], orig_shape: Tuple[int, int],
+                           max_det: int = 300) -> np.ndarray:
+    """
+    解析YOLOv8导出模型的单帧输出 (4 + 类别数, 候选框数)，执行NMS并映射回原图坐标
+
+    Returns:
+        (N,6) float32 数组 [x1, y1, x2, y2, conf, cls]
+    """
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_scores)), class_ids]
+    keep = scores > conf_threshold
+    if not keep.any():
+        return np.zeros((0, 6), dtype=np.float32)
+
+    boxes, scores, class_ids = predictions[keep, :4], scores[keep], class_ids[keep]
+    # 中心点+宽高 -> 左上角+宽高（NMSBoxes 需要的格式）
+    xywh = boxes.copy()
+    xywh[:, :2] -= xywh[:, 2:] / 2
+    indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores.tolist(), class_ids.tolist(),
+                                      conf_threshold, iou_threshold, top_k=max_det)
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:max_det]
+
+    xyxy = np.concatenate([xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]], axis=1)
+    xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / ratio
+    xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / ratio
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, orig_shape[1])
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, orig_shape[0])
+
+    return np.concatenate([xyxy, scores[indices, None], class_ids[indices, None]], axis=1).astype(np.float32)
+
+
+def _parse_metadata_value(value, default=None):
+    """解析 ultralytics 导出时写入的元数据（字符串形式的 dict/list）"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return default
+    return value
+
+
+def _to_imgsz(value, default=(640, 640)) -> Tuple[int, int]:
+    if isinstance(value, int):
+        return value, value
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return int(value[0]), int(value[1])
+    return default
+
+
+class _ExportedDetectionModel:
+    """导出格式检测模型的公共部分：预处理、批处理和后处理
+
+    调用方式与 YOLO 模型一致：model(source, conf=, iou=, imgsz=, verbose=)，
+    source 可以是图像路径、BGR图像或它们的列表，返回 BackendResult 列表。
+    """
+
+    backend = None
+    task = 'detect'
+
+    def __init__(self, model_path: str, names: Dict[int, str], imgsz: Tuple[int, int],
+                 dynamic_batch: bool, dynamic_shape: bool):
+        self.model_path = model_path
+        self.ckpt_path = model_path
+        self.names = names
+        self.imgsz = imgsz
+        self.dynamic_batch = dynamic_batch
+        self.dynamic_shape = dynamic_shape
+
+    @staticmethod
+    def _load_sources(source) -> List[np.ndarray]:
+        sources = source if isinstance(source, (list, tuple)) else [source]
+        frames = []
+        for item in sources:
+            if isinstance(item, str):
+                image = cv2.imread(item)
+                if image is None:
+                    raise ValueError(f'无法读取图像: {item}')
+                frames.append(image)
+            else:
+                frames.append(item)
+        return frames
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, source, conf: float = 0.25, iou: float = 0.45, imgsz=None,
+                 verbose: bool = False, max_det: int = 300, **kwargs) -> List[BackendResult]:
+        frames = self._load_sources(source)
+        # 固定输入尺寸的模型忽略 imgsz 参数
+        input_shape = _to_imgsz(imgsz, self.imgsz) if self.dynamic_shape else self.imgsz
+
+        inputs, transforms = [], []
+        for frame in frames:
+            padded, ratio, pad = letterbox(frame, input_shape)
+            # BGR HWC uint8 -> RGB CHW float32
+            inputs.append(padded[:, :, ::-1].transpose(2, 0, 1))
+            transforms.append((ratio, pad, frame.shape[:2]))
+        batch = np.ascontiguousarray(np.stack(inputs), dtype=np.float32) / 255.0
+
+        if self.dynamic_batch:
+            outputs = self._infer(batch)
+        else:
+            outputs = np.concatenate([self._infer(batch[i:i + 1]) for i in range(len(batch))])
+
+        return [
+            BackendResult(postprocess_detections(output, conf, iou, ratio, pad, orig_shape, max_det),
+                          self.names, orig_shape)
+            for output, (ratio, pad, orig_shape) in zip(outputs, transforms)
+        ]
+
+    predict = __call__
+
+
+class OnnxRuntimeModel(_ExportedDetectionModel):
+    """ONNX Runtime CPU 推理后端"""
+
+    backend = BACKEND_ONNXRUNTIME
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        if ort is None:
+            raise RuntimeError('未安装 onnxruntime，无法使用 ONNX Runtime 后端')
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 表示由 ONNX Runtime 自动决定线程数
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        names = _parse_metadata_value(metadata.get('names'), {})
+        input_shape = model_input.shape
+        static_shape = tuple(input_shape[2:4]) if all(isinstance(dim, int) for dim in input_shape[2:4]) else None
+        imgsz = static_shape or _to_imgsz(_parse_metadata_value(metadata.get('imgsz')))
+
+        super().__init__(model_path, names or {}, imgsz,
+                         dynamic_batch=not isinstance(input_shape[0], int),
+                         dynamic_shape=static_shape is None)
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOModel(_ExportedDetectionModel):
+    """OpenVINO CPU 推理后端（需安装 openvino）"""
+
+    backend = BACKEND_OPENVINO
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        if ov is None:
+            raise RuntimeError('未安装 openvino，无法使用 OpenVINO 后端')
+
+        # 支持 .xml 文件或 ultralytics 导出的 *_openvino_model 目录
+        xml_path = model_path
+        if os.path.isdir(model_path):
+            xml_files = glob.glob(os.path.join(model_path, '*.xml'))
+            if not xml_files:
+                raise ValueError(f'OpenVINO模型目录中没有 .xml 文件: {model_path}')
+            xml_path = xml_files[0]
+
+        core = ov.Core()
+        ov_model = core.read_model(xml_path)
+        config = {'INFERENCE_NUM_THREADS': num_threads} if num_threads else {}
+        self.compiled = core.compile_model(ov_model, 'CPU', config)
+        self.num_threads = num_threads
+
+        input_shape = ov_model.inputs[0].get_partial_shape()
+        static_shape = None if input_shape[2].is_dynamic or input_shape[3].is_dynamic else \
+            (input_shape[2].get_length(), input_shape[3].get_length())
+        metadata = self._read_metadata(os.path.dirname(xml_path))
+        names = _parse_metadata_value(metadata.get('names'), {})
+        imgsz = static_shape or _to_imgsz(_parse_metadata_value(metadata.get('imgsz')))
+
+        super().__init__(model_path, {int(k): v for k, v in (names or {}).items()}, imgsz,
+                         dynamic_batch=input_shape[0].is_dynamic,
+                         dynamic_shape=static_shape is None)
+
+    @staticmethod
+    def _read_metadata(directory: str) -> Dict[str, Any]:
+        metadata_path = os.path.join(directory, 'metadata.yaml')
+        if not os.path.exists(metadata_path):
+            return {}
+        try:
+            import yaml
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                return yaml.safe_load(f) or {}
+        except Exception:
+            return {}
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled(batch)[self.compiled.output(0)]
+
+
+def load_model(model_path: str, backend: str = BACKEND_TORCH, options: Optional[Dict[str, Any]] = None):
+    """
+    按后端加载模型，所有后端返回的模型调用方式和结果结构一致
+
+    Args:
+        model_path: 模型路径（PyTorch 后端支持 ultralytics 可加载的任何格式）
+        backend: torch / onnxruntime / openvino
+        options: 后端参数，如 ort_intra_op_threads、ort_inter_op_threads、openvino_num_threads
+    """
+    options = options or {}
+    if backend == BACKEND_TORCH:
+        return YOLO(model_path)
+
+    if 'seg' in os.path.basename(model_path).lower():
+        raise ValueError('分割模型仅支持 PyTorch 后端')
+    if backend == BACKEND_ONNXRUNTIME:
+        if not model_path.lower().endswith('.onnx'):
+            raise ValueError('ONNX Runtime 后端需要 .onnx 模型文件')
+        return OnnxRuntimeModel(model_path,
+                                intra_op_threads=options.get('ort_intra_op_threads', 0),
+                                inter_op_threads=options.get('ort_inter_op_threads', 0))
+    if backend == BACKEND_OPENVINO:
+        return OpenVINOModel(model_path, num_threads=options.get('openvino_num_threads', 0))
+    raise ValueError(f'不支持的推理后端: {backend}')
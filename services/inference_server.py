@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class _InferenceRequest:
+    """单个流提交的一帧推理请求"""
+
+    __slots__ = ('stream_key', 'model', 'frame', 'imgsz', 'submitted_at', 'event', 'result', 'error')
+
+    def __init__(self, stream_key, model, frame, imgsz=None):
+        self.stream_key = stream_key
+        self.model = model
+        self.frame = frame
+        self.imgsz = imgsz
+        self.submitted_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceServer:
+    """共享推理服务
+
+    所有RTSP流处理线程把待检测帧提交到这里，由唯一的推理线程把各流的帧
+    合并成一个批次调用模型，再把单帧结果分发回各自的流：
+
+    - 每个流同时只有一个待处理槽位，流越多也不会让某一路独占批次；
+      活跃流数超过批大小时按轮转顺序取帧，保证每路都能轮到。
+    - 第一帧到达后最多等待 max_latency 秒凑批，所有活跃流都已提交或
+      达到批大小时立即执行。
+    - 同一批次内按模型对象和输入尺寸分组，每组只调用一次模型。
+    """
+
+    def __init__(self, max_batch_size: int = 8, max_latency: float = 0.02):
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+
+        self._pending: 'OrderedDict[Hashable, _InferenceRequest]' = OrderedDict()
+        self._active_streams = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        # 统计信息
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.batch_count = 0
+        self.frame_count = 0
+        self.model_calls = 0
+        self.total_wait_time = 0.0
+        self.total_inference_time = 0.0
+        self.frames_by_stream: Dict[Hashable, int] = {}
+
+    def init_app(self, app):
+        """从Flask配置读取批处理参数"""
+        self.max_batch_size = app.config.get('RTSP_INFERENCE_MAX_BATCH', self.max_batch_size)
+        self.max_latency = app.config.get('RTSP_INFERENCE_MAX_LATENCY_MS', self.max_latency * 1000) / 1000
+
+    def start(self):
+        """启动推理线程"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._serve, name='rtsp-inference', daemon=True)
+            self._thread.start()
+        print(f"🚀 共享推理服务已启动 (批大小: {self.max_batch_size}, 最大等待: {self.max_latency * 1000:.0f}ms)")
+
+    def stop(self):
+        """停止推理线程，未完成的请求以错误结束"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._condition.notify_all()
+
+        for request in pending:
+            request.error = RuntimeError('推理服务已停止')
+            request.event.set()
+
+        if self._thread:
+            self._thread.join(timeout=5)
+        print("⏹️ 共享推理服务已停止")
+
+    def register_stream(self, stream_key: Hashable):
+        """登记活跃流（用于判断是否已收齐一轮帧）"""
+        with self._condition:
+            self._active_streams.add(stream_key)
+
+    def unregister_stream(self, stream_key: Hashable):
+        """注销流并取消其未完成的请求"""
+        with self._condition:
+            self._active_streams.discard(stream_key)
+            request = self._pending.pop(stream_key, None)
+            self._condition.notify_all()
+
+        if request is not None:
+            request.error = RuntimeError('流已停止')
+            request.event.set()
+
+    def infer(self, stream_key: Hashable, model, frame, imgsz: Optional[int] = None,
+              timeout: Optional[float] = 10.0):
+        """
+        提交一帧并阻塞等待结果
+
+        Args:
+            stream_key: 流标识
+            model: 该流当前使用的YOLO模型
+            frame: BGR图像
+            imgsz: 推理输入尺寸（为空时使用模型默认值）
+            timeout: 等待超时时间（秒）
+
+        Returns:
+            该帧的YOLO结果（单个Results对象）
+        """
+        if not self._running:
+            self.start()
+
+        request = _InferenceRequest(stream_key, model, frame, imgsz)
+        with self._condition:
+            previous = self._pending.pop(stream_key, None)
+            self._pending[stream_key] = request
+            self._condition.notify_all()
+
+        # 同一流的旧请求被新帧替换（每个流只保留一个槽位）
+        if previous is not None:
+            previous.error = RuntimeError('请求已被同一流的新帧替换')
+            previous.event.set()
+
+        if not request.event.wait(timeout):
+            with self._condition:
+                if self._pending.get(stream_key) is request:
+                    del self._pending[stream_key]
+            raise TimeoutError(f'流 {stream_key} 推理超时')
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self) -> List[_InferenceRequest]:
+        """等待并取出一个批次（在持有条件锁时调用）"""
+        while self._running and not self._pending:
+            self._condition.wait()
+        if not self._running:
+            return []
+
+        # 从最早的请求开始计算凑批截止时间
+        oldest = min(request.submitted_at for request in self._pending.values())
+        deadline = oldest + self.max_latency
+        while self._running:
+            ready = len(self._pending)
+            waiting_for = len(self._active_streams - set(self._pending.keys()))
+            remaining = deadline - time.perf_counter()
+            if ready >= self.max_batch_size or waiting_for == 0 or remaining <= 0:
+                break
+            self._condition.wait(remaining)
+
+        # 按提交顺序（即轮转顺序）取帧，未被选中的流下一批优先
+        batch = []
+        for stream_key in list(self._pending.keys())[:self.max_batch_size]:
+            batch.append(self._pending.pop(stream_key))
+        return batch
+
+    def _serve(self):
+        """推理线程主循环"""
+        while True:
+            with self._condition:
+                batch = self._collect_batch()
+                if not self._running:
+                    break
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_InferenceRequest]):
+        """按模型和输入尺寸分组执行一个批次并分发结果"""
+        start_time = time.perf_counter()
+
+        groups: Dict[tuple, List[_InferenceRequest]] = {}
+        for request in batch:
+            groups.setdefault((id(request.model), request.imgsz), []).append(request)
+
+        for (_, imgsz), requests in groups.items():
+            model = requests[0].model
+            options = {'imgsz': imgsz} if imgsz else {}
+            try:
+                results = model([request.frame for request in requests], verbose=False, **options)
+                for request, result in zip(requests, results):
+                    request.result = result
+            except Exception as e:
+                print(f"❌ 共享推理批次失败 ({len(requests)} 帧): {e}")
+                for request in requests:
+                    request.error = e
+
+        inference_time = time.perf_counter() - start_time
+        with self._stats_lock:
+            self.batch_count += 1
+            self.frame_count += len(batch)
+            self.model_calls += len(groups)
+            self.total_inference_time += inference_time
+            for request in batch:
+                self.total_wait_time += start_time - request.submitted_at
+                self.frames_by_stream[request.stream_key] = self.frames_by_stream.get(request.stream_key, 0) + 1
+
+        for request in batch:
+            request.event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计"""
+        with self._stats_lock:
+            frames = self.frame_count
+            return {
+                'running': self._running,
+                'max_batch_size': self.max_batch_size,
+                'max_latency_ms': round(self.max_latency * 1000, 2),
+                'active_streams': len(self._active_streams),
+                'batches': self.batch_count,
+                'frames': frames,
+                'model_calls': self.model_calls,
+                'avg_batch_size': round(frames / self.batch_count, 2) if self.batch_count else 0,
+                'avg_wait_ms': round(self.total_wait_time * 1000 / frames, 2) if frames else 0,
+                'avg_batch_inference_ms': round(self.total_inference_time * 1000 / self.batch_count, 2) if self.batch_count else 0,
+                'frames_by_stream': {str(key): count for key, count in self.frames_by_stream.items()}
+            }
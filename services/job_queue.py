@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from models.database import db, ProcessingJob
+
+
+class JobQueueFullError(Exception):
+    """任务队列已满"""
+    pass
+
+
+class JobManager:
+    """后台任务管理器
+
+    接收上传后的视频任务并在有界线程池中执行，任务状态持久化到
+    ProcessingJob 表。进程重启后，未完成的任务会被重新排队执行。
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20,
+                 max_attempts: int = 3, progress_interval: float = 1.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.progress_interval = progress_interval
+
+        self.app = None
+        self.executor = None
+        self.handlers = {}  # job_type -> handler(input_file, output_name, user_id, params, progress_callback)
+        self.live_progress = {}  # job_id -> 内存中的最新进度
+        self.active_jobs = set()  # 已排队或正在执行的任务ID
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        """绑定Flask应用并创建工作线程池"""
+        self.app = app
+        self.max_workers = app.config.get('JOB_MAX_WORKERS', self.max_workers)
+        self.max_pending = app.config.get('JOB_MAX_PENDING', self.max_pending)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', self.max_attempts)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='video-job')
+
+    def register_handler(self, job_type: str, handler: Callable):
+        """注册任务类型的处理函数"""
+        self.handlers[job_type] = handler
+
+    def submit(self, job_type: str, user_id, input_file: str, output_name: str,
+               params: dict) -> ProcessingJob:
+        """
+        创建任务记录并加入执行队列
+
+        Returns:
+            ProcessingJob: 新建的任务记录
+
+        Raises:
+            ValueError: 未知的任务类型
+            JobQueueFullError: 排队任务数已达上限
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f'未知的任务类型: {job_type}')
+
+        with self.lock:
+            if len(self.active_jobs) >= self.max_workers + self.max_pending:
+                raise JobQueueFullError('任务队列已满，请稍后再试')
+
+            job = ProcessingJob(
+                user_id=user_id,
+                job_type=job_type,
+                status='queued',
+                input_file=input_file,
+                output_name=output_name,
+                params=json.dumps(params)
+            )
+            db.session.add(job)
+            db.session.commit()
+
+            self.active_jobs.add(job.id)
+
+        self.executor.submit(self._run_job, job.id)
+        print(f"📥 任务已提交: #{job.id} ({job_type})")
+        return job
+
+    def recover_jobs(self) -> int:
+        """重新排队上次进程退出时未完成的任务（需在app_context中调用）"""
+        unfinished = ProcessingJob.query.filter(
+            ProcessingJob.status.in_(['queued', 'running'])
+        ).order_by(ProcessingJob.created_at).all()
+
+        recovered = []
+        for job in unfinished:
+            if job.id in self.active_jobs:
+                continue
+
+            if job.attempts >= self.max_attempts:
+                job.status = 'failed'
+                job.error_message = f'任务已中断 {job.attempts} 次，不再重试'
+                job.finished_at = datetime.utcnow()
+                continue
+
+            job.status = 'queued'
+            job.progress = 0
+            job.processed_frames = 0
+            recovered.append(job.id)
+
+        # 先提交状态重置再交给工作线程，避免覆盖工作线程已写入的 running 状态
+        db.session.commit()
+        for job_id in recovered:
+            with self.lock:
+                self.active_jobs.add(job_id)
+            self.executor.submit(self._run_job, job_id)
+
+        if recovered:
+            print(f"♻️ 已恢复 {len(recovered)} 个未完成的任务")
+        return len(recovered)
+
+    def get_job_info(self, job: ProcessingJob) -> Dict:
+        """生成任务状态信息（合并内存中的实时进度）"""
+        info = {
+            'id': job.id,
+            'user_id': job.user_id,
+            'job_type': job.job_type,
+            'status': job.status,
+            'progress': job.progress or 0,
+            'processed_frames': job.processed_frames or 0,
+            'total_frames': job.total_frames or 0,
+            'throughput_fps': job.throughput_fps or 0,
+            'attempts': job.attempts,
+            'error_message': job.error_message,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'result': json.loads(job.result) if job.result else None
+        }
+
+        live = self.live_progress.get(job.id)
+        if live and job.status == 'running':
+            info.update(live)
+
+        return info
+
+    def get_stats(self) -> Dict:
+        """获取任务队列统计"""
+        with self.lock:
+            active = len(self.active_jobs)
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'active_jobs': active,
+            'running_jobs': len(self.live_progress)
+        }
+
+    def shutdown(self, wait: bool = False):
+        """关闭工作线程池"""
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+
+    def _run_job(self, job_id: int):
+        """在工作线程中执行任务"""
+        with self.app.app_context():
+            try:
+                job = ProcessingJob.query.get(job_id)
+                if job is None:
+                    return
+
+                handler = self.handlers.get(job.job_type)
+                if handler is None:
+                    self._finish(job, 'failed', error=f'未知的任务类型: {job.job_type}')
+                    return
+
+                if not os.path.exists(job.input_file):
+                    self._finish(job, 'failed', error=f'输入文件不存在: {job.input_file}')
+                    return
+
+                job.status = 'running'
+                job.attempts = (job.attempts or 0) + 1
+                job.started_at = datetime.utcnow()
+                db.session.commit()
+
+                input_file = job.input_file
+                output_name = job.output_name
+                user_id = job.user_id
+                params = json.loads(job.params) if job.params else {}
+
+                print(f"▶️ 开始执行任务: #{job_id} ({job.job_type})")
+                start_time = time.time()
+                progress_callback = self._make_progress_callback(job_id, start_time)
+
+                try:
+                    result = handler(input_file, output_name, user_id, params, progress_callback)
+                except Exception as e:
+                    db.session.rollback()
+                    job = ProcessingJob.query.get(job_id)
+                    print(f"❌ 任务执行失败: #{job_id}: {e}")
+                    self._finish(job, 'failed', error=str(e))
+                    return
+
+                job = ProcessingJob.query.get(job_id)
+                elapsed = time.time() - start_time
+                live = self.live_progress.get(job_id, {})
+                job.processed_frames = live.get('processed_frames', job.processed_frames)
+                job.total_frames = live.get('total_frames', job.total_frames)
+                job.throughput_fps = round(job.processed_frames / elapsed, 2) if elapsed > 0 else 0
+                self._finish(job, 'completed', result=result)
+                print(f"✅ 任务完成: #{job_id} ({elapsed:.1f}s, {job.throughput_fps} FPS)")
+
+            except Exception as e:
+                print(f"❌ 任务 #{job_id} 调度异常: {e}")
+                db.session.rollback()
+            finally:
+                self.live_progress.pop(job_id, None)
+                with self.lock:
+                    self.active_jobs.discard(job_id)
+                db.session.remove()
+
+    def _make_progress_callback(self, job_id: int, start_time: float) -> Callable[[int, int], None]:
+        """创建进度回调：实时更新内存进度，并按间隔持久化到数据库"""
+        last_persist = [0.0]
+
+        def progress_callback(processed_frames, total_frames):
+            elapsed = time.time() - start_time
+            live = {
+                'processed_frames': processed_frames,
+                'total_frames': total_frames,
+                'progress': round(processed_frames / total_frames * 100, 1) if total_frames > 0 else 0,
+                'throughput_fps': round(processed_frames / elapsed, 2) if elapsed > 0 else 0
+            }
+            self.live_progress[job_id] = live
+
+            now = time.time()
+            if now - last_persist[0] < self.progress_interval:
+                return
+            last_persist[0] = now
+
+            # 回调可能来自流水线线程，使用独立的应用上下文写库
+            try:
+                with self.app.app_context():
+                    ProcessingJob.query.filter_by(id=job_id).update(live)
+                    db.session.commit()
+            except Exception as e:
+                print(f"⚠️ 任务 #{job_id} 进度保存失败: {e}")
+
+        return progress_callback
+
+    def _finish(self, job: Optional[ProcessingJob], status: str, result=None, error=None):
+        """标记任务结束"""
+        if job is None:
+            return
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        if status == 'completed':
+            job.progress = 100
+        if result is not None:
+            job.result = json.dumps(result)
+        if error is not None:
+            job.error_message = error
+        db.session.commit()
+
+
+# 全局任务管理器实例
+job_manager = JobManager()
@@ -0,0 +1,102 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_IMGSZ = 640
+LETTERBOX_STRIDE = 32
+PAD_VALUE = 114
+
+
+def normalize_imgsz(value, default: int = DEFAULT_IMGSZ, min_size: int = 160, max_size: int = 1920) -> int:
+    """把请求中的 imgsz 规范为 stride 的整数倍并限制范围（无效值使用默认值）"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    if size <= 0:
+        return default
+    size = min(max(size, min_size), max_size)
+    return int(np.ceil(size / LETTERBOX_STRIDE) * LETTERBOX_STRIDE)
+
+
+class LetterboxTransform:
+    """固定输入分辨率下预先计算好的letterbox参数
+
+    同一路视频/摄像头的分辨率不变，缩放比例、缩放后尺寸和填充量只需要
+    计算一次。apply() 每帧只做一次缩放和填充，模型收到的图像已经是目标
+    尺寸，内部letterbox不会再次缩放；unmap_boxes() 把模型输出的框一次性
+    映射回原图坐标。
+
+    auto 为 True 时只填充到 stride 的整数倍（矩形推理，PyTorch 模型支持），
+    否则填充到 imgsz x imgsz（固定输入尺寸的导出模型需要）。
+    """
+
+    def __init__(self, src_shape: Tuple[int, int], imgsz: int = DEFAULT_IMGSZ,
+                 auto: bool = False, stride: int = LETTERBOX_STRIDE):
+        height, width = src_shape[:2]
+        self.src_shape = (height, width)
+        self.imgsz = imgsz
+        self.auto = auto
+
+        self.ratio = min(imgsz / height, imgsz / width)
+        self.resized_size = (int(round(width * self.ratio)), int(round(height * self.ratio)))  # (宽, 高)
+        pad_w, pad_h = imgsz - self.resized_size[0], imgsz - self.resized_size[1]
+        if auto:
+            pad_w, pad_h = pad_w % stride, pad_h % stride
+        pad_w, pad_h = pad_w / 2, pad_h / 2
+        self.top, self.bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+        self.left, self.right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+        self.output_shape = (self.resized_size[1] + self.top + self.bottom,
+                             self.resized_size[0] + self.left + self.right)
+        self.needs_resize = self.resized_size != (width, height)
+        self.needs_pad = self.top or self.bottom or self.left or self.right
+
+        # 反向映射：原图坐标 = (模型坐标 - 偏移) / 比例，按 x1, y1, x2, y2 排列
+        self._offset = np.array([self.left, self.top, self.left, self.top], dtype=np.float32)
+        self._clip_max = np.array([width, height, width, height], dtype=np.float32)
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """缩放并填充一帧（帧尺寸必须与 src_shape 一致）"""
+        if self.needs_resize:
+            frame = cv2.resize(frame, self.resized_size, interpolation=cv2.INTER_LINEAR)
+        if self.needs_pad:
+            frame = cv2.copyMakeBorder(frame, self.top, self.bottom, self.left, self.right,
+                                       cv2.BORDER_CONSTANT, value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+        return frame
+
+    def unmap_boxes(self, xyxy: np.ndarray) -> np.ndarray:
+        """把letterbox图像上的 (N,4) xyxy 框映射回原图坐标（向量化，结果裁剪到原图范围）"""
+        if len(xyxy) == 0:
+            return xyxy
+        boxes = (xyxy - self._offset) / self.ratio
+        return np.clip(boxes, 0, self._clip_max, out=boxes)
+
+    def matches(self, src_shape: Tuple[int, int], imgsz: int, auto: bool) -> bool:
+        return self.src_shape == tuple(src_shape[:2]) and self.imgsz == imgsz and self.auto == auto
+
+
+@lru_cache(maxsize=64)
+def _cached_transform(src_shape: Tuple[int, int], imgsz: int, auto: bool) -> LetterboxTransform:
+    return LetterboxTransform(src_shape, imgsz, auto)
+
+
+def get_letterbox(src_shape, imgsz: int = DEFAULT_IMGSZ, auto: bool = False) -> LetterboxTransform:
+    """获取（缓存的）letterbox参数，同一分辨率和尺寸只计算一次"""
+    return _cached_transform(tuple(int(v) for v in src_shape[:2]), int(imgsz), bool(auto))
+
+
+def supports_rect_input(model) -> bool:
+    """模型是否接受矩形输入（PyTorch .pt 模型可以，导出的固定尺寸模型需要正方形输入）"""
+    if getattr(model, 'backend', 'torch') != 'torch':
+        return False
+    model_path = str(getattr(model, 'ckpt_path', '') or '')
+    return model_path.lower().endswith('.pt')
+
+
+def letterbox_for_model(model, src_shape, imgsz: Optional[int]) -> Optional[LetterboxTransform]:
+    """为检测模型选择letterbox参数；未指定 imgsz 时返回 None（交给模型自行处理）"""
+    if not imgsz:
+        return None
+    return get_letterbox(src_shape, imgsz, auto=supports_rect_input(model))
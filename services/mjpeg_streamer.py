@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+BOUNDARY = 'frame'
+
+
+class MJPEGBroadcaster:
+    """单个RTSP流的MJPEG广播器
+
+    推送线程按设定帧率从流处理器的编码缓存取最新标注帧，所有观看者共享
+    同一份JPEG字节；帧和检测结果没有变化时不重复推送。没有观看者一段时间
+    后推送线程自动退出，有新观看者连接时再启动。
+    """
+
+    def __init__(self, stream_id, handler, fps: float = 15, quality: int = 70, idle_timeout: float = 5.0):
+        self.stream_id = stream_id
+        self.handler = handler
+        self.fps = fps
+        self.quality = quality
+        self.idle_timeout = idle_timeout
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._viewers = 0
+        self._last_viewer_left = None
+
+        self.frame_bytes: Optional[bytes] = None
+        self.frame_seq = 0
+        self.published_frames = 0
+        self.skipped_frames = 0
+        self.sent_frames = 0
+
+    def configure(self, fps: Optional[float] = None, quality: Optional[int] = None):
+        """更新帧率和JPEG质量（下一帧生效），同步到流处理器的预编码和 /frame 预览"""
+        if fps:
+            self.fps = max(1.0, min(float(fps), 60.0))
+        if quality:
+            self.quality = max(10, min(int(quality), 100))
+        self.handler.configure_preview(fps=self.fps, quality=self.quality)
+
+    def _ensure_running(self):
+        """在持有条件锁时调用：按需启动推送线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._encode_loop, name=f'mjpeg-{self.stream_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止推送线程并唤醒所有观看者"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _encode_loop(self):
+        """推送线程：每个周期最多发布一次新的编码帧"""
+        last_frame_key = None
+        while True:
+            with self._condition:
+                if not self._running:
+                    break
+                # 没有观看者超过 idle_timeout 时退出
+                if (self._viewers == 0 and self._last_viewer_left is not None and
+                        time.time() - self._last_viewer_left > self.idle_timeout):
+                    self._running = False
+                    break
+            interval = 1.0 / self.fps
+            tick_start = time.perf_counter()
+
+            try:
+                encoded = self.handler.get_encoded_frame(quality=self.quality)
+            except Exception as e:
+                print(f"❌ 流 {self.stream_id} 获取编码帧失败: {e}")
+                encoded = None
+
+            if encoded is not None:
+                frame_key, frame_bytes = encoded
+                if frame_key == last_frame_key:
+                    self.skipped_frames += 1
+                else:
+                    last_frame_key = frame_key
+                    with self._condition:
+                        self.frame_bytes = frame_bytes
+                        self.frame_seq += 1
+                        self.published_frames += 1
+                        self._condition.notify_all()
+
+            elapsed = time.perf_counter() - tick_start
+            time.sleep(max(0.0, interval - elapsed))
+
+        print(f"⏹️ 流 {self.stream_id} MJPEG推送线程已退出")
+
+    def stream(self, max_fps: Optional[float] = None) -> Iterator[bytes]:
+        """
+        生成 multipart/x-mixed-replace 响应体
+
+        Args:
+            max_fps: 该观看者的最大帧率（低于广播帧率时跳帧发送）
+        """
+        with self._condition:
+            self._viewers += 1
+            self._ensure_running()
+
+        min_interval = 1.0 / max_fps if max_fps else 0
+        last_seq = 0
+        last_sent = 0.0
+        try:
+            while True:
+                with self._condition:
+                    while self._running and self.frame_seq == last_seq:
+                        self._condition.wait(timeout=1.0)
+                    if not self._running:
+                        break
+                    frame_bytes = self.frame_bytes
+                    last_seq = self.frame_seq
+
+                now = time.perf_counter()
+                if min_interval and now - last_sent < min_interval:
+                    continue
+                last_sent = now
+                self.sent_frames += 1
+
+                yield (b'--' + BOUNDARY.encode() + b'\r\n'
+                       b'Content-Type: image/jpeg\r\n'
+                       b'Content-Length: ' + str(len(frame_bytes)).encode() + b'\r\n\r\n' +
+                       frame_bytes + b'\r\n')
+        finally:
+            with self._condition:
+                self._viewers -= 1
+                if self._viewers == 0:
+                    self._last_viewer_left = time.time()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取广播统计"""
+        return {
+            'running': self._running,
+            'viewers': self._viewers,
+            'fps': self.fps,
+            'quality': self.quality,
+            'published_frames': self.published_frames,
+            'skipped_frames': self.skipped_frames,
+            'sent_frames': self.sent_frames,
+            'frame_size': len(self.frame_bytes) if self.frame_bytes else 0
+        }
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ultralytics import YOLO
+
+ARTIFACTS_SUFFIX = '.artifacts'
+EXPORT_FORMATS = ('onnx', 'openvino')
+QUANTIZE_MODES = (None, 'fp16', 'int8')
+
+_hash_cache: Dict[str, tuple] = {}  # 绝对路径 -> (mtime_ns, size, sha256)
+_hash_lock = threading.Lock()
+_export_locks: Dict[str, threading.Lock] = {}
+
+
+def file_sha256(path: str) -> str:
+    """计算文件内容哈希（按修改时间和大小缓存，文件未变化时不重复读取）"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+    with _hash_lock:
+        _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+    return content_hash
+
+
+def normalize_export_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    规范化导出参数（决定缓存键，不同写法的相同参数得到同一个产物）
+
+    Args:
+        params: {format: onnx/openvino, imgsz: int, dynamic: 动态batch, quantize: None/fp16/int8, opset: int}
+    """
+    export_format = (params.get('format') or 'onnx').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {export_format}')
+    quantize = params.get('quantize') or None
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f'不支持的量化方式: {quantize}')
+    if export_format == 'openvino' and quantize == 'fp16':
+        raise ValueError('OpenVINO 导出暂不支持 fp16 量化')
+
+    return {
+        'format': export_format,
+        'imgsz': int(params.get('imgsz') or 640),
+        'dynamic': bool(params.get('dynamic', False)),
+        'quantize': quantize,
+        'opset': int(params['opset']) if params.get('opset') else None
+    }
+
+
+def artifacts_dir(model_path: str) -> str:
+    """模型产物目录（位于源模型旁边）"""
+    return model_path + ARTIFACTS_SUFFIX
+
+
+def artifact_key(content_hash: str, params: Dict[str, Any]) -> str:
+    """产物缓存键：源模型内容哈希 + 导出参数哈希"""
+    params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f'{content_hash[:16]}-{params_hash[:8]}'
+
+
+def _variant_name(params: Dict[str, Any]) -> str:
+    parts = [params['format'], str(params['imgsz'])]
+    if params['dynamic']:
+        parts.append('dynamic')
+    if params['quantize']:
+        parts.append(params['quantize'])
+    return '-'.join(parts)
+
+
+def find_artifact(model_path: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """查找与源模型内容和参数都匹配的已缓存产物"""
+    key = artifact_key(file_sha256(model_path), params)
+    manifest_path = os.path.join(artifacts_dir(model_path), key + '.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if os.path.exists(manifest['path']) else None
+
+
+def list_artifacts(model_path: str) -> List[Dict[str, Any]]:
+    """列出源模型的全部产物（stale 表示源模型内容已变化，产物已过期）"""
+    directory = artifacts_dir(model_path)
+    if not os.path.isdir(directory):
+        return []
+
+    current_hash = file_sha256(model_path) if os.path.exists(model_path) else None
+    variants = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not os.path.exists(manifest.get('path', '')):
+            continue
+        manifest['stale'] = manifest.get('source_hash') != current_hash
+        variants.append(manifest)
+    return variants
+
+
+def _quantize_onnx(onnx_path: str, mode: str) -> str:
+    """对ONNX模型做FP16转换或INT8动态量化，返回新文件路径"""
+    output_path = onnx_path[:-len('.onnx')] + f'.{mode}.onnx'
+    if mode == 'int8':
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise RuntimeError('INT8 量化需要安装 onnxruntime')
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+    else:
+        try:
+            import onnx
+            from onnxconverter_common import float16
+        except ImportError:
+            raise RuntimeError('FP16 转换需要安装 onnx 和 onnxconverter-common')
+        model = float16.convert_float_to_float16(onnx.load(onnx_path), keep_io_types=True)
+        onnx.save(model, output_path)
+    return output_path
+
+
+def export_model(model_path: str, params: Dict[str, Any],
+                 progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    导出模型为CPU推理产物（已缓存时直接返回缓存结果）
+
+    产物保存在 <模型路径>.artifacts/ 目录，文件名为缓存键，同名 .json
+    为产物清单（源模型哈希、导出参数、耗时、大小）。
+
+    Args:
+        model_path: 源模型（.pt）路径
+        params: 导出参数，见 normalize_export_params
+        progress_callback: 进度回调 progress_callback(已完成步骤, 总步骤)
+
+    Returns:
+        dict: 产物清单，cached 表示是否命中缓存
+    """
+    params = normalize_export_params(params)
+    total_steps = 4 if params['quantize'] else 3
+
+    def report(step):
+        if progress_callback:
+            progress_callback(step, total_steps)
+
+    content_hash = file_sha256(model_path)
+    key = artifact_key(content_hash, params)
+    lock = _export_locks.setdefault(key, threading.Lock())
+    with lock:
+        cached = find_artifact(model_path, params)
+        if cached is not None:
+            report(total_steps)
+            return {**cached, 'cached': True}
+        report(1)
+
+        directory = artifacts_dir(model_path)
+        os.makedirs(directory, exist_ok=True)
+        start_time = time.perf_counter()
+
+        # ultralytics 把导出结果写在模型文件旁边（固定为 <stem>.onnx / <stem>_openvino_model），
+        # 先把源模型复制到该缓存键独立的临时目录再导出，同一模型不同参数的导出可以并行
+        export_kwargs = {'format': params['format'], 'imgsz': params['imgsz'], 'dynamic': params['dynamic']}
+        if params['opset']:
+            export_kwargs['opset'] = params['opset']
+        if params['format'] == 'openvino' and params['quantize'] == 'int8':
+            export_kwargs['int8'] = True
+        staging_dir = tempfile.mkdtemp(prefix=f'.export-{key}-', dir=directory)
+        try:
+            staged_model = os.path.join(staging_dir, os.path.basename(model_path))
+            shutil.copy2(model_path, staged_model)
+            exported_path = str(YOLO(staged_model).export(**export_kwargs))
+            report(2)
+
+            # 文件名保留源模型名（分割模型按文件名识别）
+            stem = os.path.splitext(os.path.basename(model_path))[0]
+            if params['format'] == 'onnx':
+                artifact_path = os.path.join(directory, f'{stem}-{key}.onnx')
+                shutil.move(exported_path, artifact_path)
+                if params['quantize']:
+                    try:
+                        quantized_path = _quantize_onnx(artifact_path, params['quantize'])
+                    except Exception:
+                        os.remove(artifact_path)
+                        raise
+                    os.replace(quantized_path, artifact_path)
+                    report(3)
+            else:
+                artifact_path = os.path.join(directory, f'{stem}-{key}_openvino_model')
+                if os.path.exists(artifact_path):
+                    shutil.rmtree(artifact_path)
+                shutil.move(exported_path, artifact_path)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        artifact_size = os.path.getsize(artifact_path) if os.path.isfile(artifact_path) else sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(artifact_path) for name in names
+        )
+        manifest = {
+            'key': key,
+            'name': f'{os.path.basename(model_path)} [{_variant_name(params)}]',
+            'variant': _variant_name(params),
+            'path': artifact_path,
+            'source_path': model_path,
+            'source_hash': content_hash,
+            'params': params,
+            'size': artifact_size,
+            'size_mb': round(artifact_size / (1024 * 1024), 2),
+            'export_seconds': round(time.perf_counter() - start_time, 2),
+            'created': time.time()
+        }
+        with open(os.path.join(directory, key + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        report(total_steps)
+
+        print(f"📦 模型导出完成: {manifest['name']} ({manifest['size_mb']}MB, {manifest['export_seconds']}s)")
+        return {**manifest, 'cached': False}
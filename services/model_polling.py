@@ -4,10 +4,12 @@ from typing import List, Dict, Optional
 from ultralytics import YOLO
 import threading
 
+from .model_registry import model_registry
+
 class ModelPolling:
     """模型轮询管理器"""
     
-    def __init__(self, polling_config: dict):
+    def __init__(self, polling_config: dict, owner: str = None):
         """
         初始化模型轮询器
         
@@ -18,7 +20,9 @@ class ModelPolling:
                 'models': ['model1.pt', 'model2.pt', ...],  # 模型路径列表
                 'order': [0, 1, 2, ...] or None  # 自定义轮询顺序，None表示按模型列表顺序
             }
+            owner: 在模型注册表中的引用者标识
         """
+        self.owner = owner or f'polling:{id(self)}'
         self.polling_type = polling_config.get('type', 'frame')
         self.interval = polling_config.get('interval', 10)
         self.model_paths = polling_config.get('models', [])
@@ -29,7 +33,7 @@ class ModelPolling:
         self.frame_counter = 0  # 帧计数器
         self.last_switch_time = time.time()  # 上次切换时间
         self.loaded_models = {}  # 已加载的模型缓存
-        self.lock = threading.Lock()  # 线程锁
+        self.lock = threading.RLock()  # 线程锁（可重入：update_config 持锁时会调用 reset）
         
         # 验证配置
         self._validate_config()
@@ -67,7 +71,7 @@ class ModelPolling:
         for i, model_path in enumerate(self.model_paths):
             try:
                 print(f"⏳ 加载模型 {i+1}/{len(self.model_paths)}: {model_path}")
-                model = YOLO(model_path)
+                model = model_registry.acquire(model_path, owner=self.owner)
                 self.loaded_models[model_path] = model
                 print(f"✅ 模型加载成功: {model_path}")
             except Exception as e:
@@ -178,12 +182,13 @@ class ModelPolling:
                 for model_path in old_models:
                     if model_path not in new_models and model_path in self.loaded_models:
                         del self.loaded_models[model_path]
+                        model_registry.release(model_path, owner=self.owner)
                 
                 # 加载新模型
                 for model_path in new_models:
                     if model_path not in self.loaded_models:
                         try:
-                            self.loaded_models[model_path] = YOLO(model_path)
+                            self.loaded_models[model_path] = model_registry.acquire(model_path, owner=self.owner)
                             print(f"✅ 新模型加载成功: {model_path}")
                         except Exception as e:
                             print(f"❌ 新模型加载失败: {model_path}, 错误: {e}")
@@ -191,6 +196,12 @@ class ModelPolling:
             # 重置状态
             self.reset()
             print("✅ 模型轮询配置已更新")
+    
+    def close(self):
+        """释放轮询器持有的全部模型引用"""
+        with self.lock:
+            self.loaded_models.clear()
+            model_registry.release_owner(self.owner)
 
 
 class ModelPollingManager:
@@ -198,7 +209,7 @@ class ModelPollingManager:
     
     def __init__(self):
         self.pollings = {}  # stream_id -> ModelPolling
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()  # 可重入：create_polling 持锁时会调用 remove_polling
     
     def create_polling(self, stream_id: int, polling_config: dict) -> bool:
         """为指定流创建模型轮询器"""
@@ -207,7 +218,7 @@ class ModelPollingManager:
                 if stream_id in self.pollings:
                     self.remove_polling(stream_id)
                 
-                polling = ModelPolling(polling_config)
+                polling = ModelPolling(polling_config, owner=f'polling:{stream_id}')
                 self.pollings[stream_id] = polling
                 print(f"✅ 流 {stream_id} 的模型轮询器创建成功")
                 return True
@@ -219,7 +230,7 @@ class ModelPollingManager:
         """移除指定流的轮询器"""
         with self.lock:
             if stream_id in self.pollings:
-                del self.pollings[stream_id]
+                self.pollings.pop(stream_id).close()
                 print(f"🗑️ 流 {stream_id} 的模型轮询器已移除")
     
     def get_model_for_stream(self, stream_id: int) -> Optional[YOLO]:
@@ -258,6 +269,8 @@ class ModelPollingManager:
     def cleanup(self):
         """清理所有轮询器"""
         with self.lock:
+            for polling in self.pollings.values():
+                polling.close()
             self.pollings.clear()
             print("🧹 所有模型轮询器已清理")
 
@@ -0,0 +1,208 @@
+import glob
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .detection_results import box_iou
+from .inference_backends import BACKEND_ONNXRUNTIME, load_model
+from .model_export import artifacts_dir, export_model
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def list_images(image_dir: str, max_images: int = 0) -> List[str]:
+    """列出目录中的图像文件（按文件名排序，max_images 为0时不限制数量）"""
+    images = sorted(
+        path for path in glob.glob(os.path.join(image_dir, '**', '*'), recursive=True)
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return images[:max_images] if max_images else images
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float = 0.5) -> np.ndarray:
+    """
+    按置信度从高到低把候选框贪心匹配到同类别、IoU达标的参考框
+
+    Args:
+        reference: (N,6) 参考检测 [x1, y1, x2, y2, conf, cls]
+        candidate: (M,6) 待评估检测
+
+    Returns:
+        (M,) bool 数组，候选框是否匹配到参考框
+    """
+    matched = np.zeros(len(candidate), dtype=bool)
+    if len(reference) == 0 or len(candidate) == 0:
+        return matched
+
+    iou = box_iou(candidate[:, :4], reference[:, :4])
+    iou[candidate[:, 5][:, None] != reference[:, 5][None, :]] = 0
+    used = np.zeros(len(reference), dtype=bool)
+    for i in np.argsort(-candidate[:, 4]):
+        ious = np.where(used, 0, iou[i])
+        j = int(ious.argmax())
+        if ious[j] >= iou_threshold:
+            used[j] = True
+            matched[i] = True
+    return matched
+
+
+def average_precision(matched: np.ndarray, scores: np.ndarray, num_reference: int) -> float:
+    """全点插值AP（matched/scores 为某一类别在所有图像上的候选框）"""
+    if num_reference == 0:
+        return float('nan')
+    if len(scores) == 0:
+        return 0.0
+    order = np.argsort(-scores)
+    true_positive = np.cumsum(matched[order])
+    recall = true_positive / num_reference
+    precision = true_positive / np.arange(1, len(order) + 1)
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+
+def _timed_predict(model, image: np.ndarray, imgsz: int, conf: float, iou: float):
+    start_time = time.perf_counter()
+    result = model(image, conf=conf, iou=iou, imgsz=imgsz, verbose=False)[0]
+    return np.asarray(result.boxes.data, dtype=np.float32), (time.perf_counter() - start_time) * 1000
+
+
+def compare_models(reference_model, candidate_model, images: List[str], imgsz: int = 640,
+                   conf: float = 0.25, iou: float = 0.45, match_iou: float = 0.5,
+                   progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    在同一批图像上对比两个模型的延迟和检测一致性（以参考模型的检测结果为基准）
+
+    Returns:
+        dict: 平均/P50延迟、加速比、框匹配率（precision/recall/F1）和 mAP@match_iou（map）
+    """
+    blank = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    for model in (reference_model, candidate_model):
+        model(blank, imgsz=imgsz, verbose=False)  # 预热，不计入延迟
+
+    reference_ms, candidate_ms = [], []
+    per_class: Dict[int, Dict[str, list]] = {}
+    totals = {'reference': 0, 'candidate': 0, 'matched': 0}
+
+    for index, image_path in enumerate(images):
+        image = cv2.imread(image_path)
+        if image is None:
+            continue
+        reference, ms = _timed_predict(reference_model, image, imgsz, conf, iou)
+        reference_ms.append(ms)
+        candidate, ms = _timed_predict(candidate_model, image, imgsz, conf, iou)
+        candidate_ms.append(ms)
+
+        matched = match_detections(reference, candidate, match_iou)
+        totals['reference'] += len(reference)
+        totals['candidate'] += len(candidate)
+        totals['matched'] += int(matched.sum())
+        for cls in np.unique(np.concatenate([reference[:, 5], candidate[:, 5]])).astype(int):
+            stats = per_class.setdefault(int(cls), {'matched': [], 'scores': [], 'reference': [0]})
+            mask = candidate[:, 5] == cls
+            stats['matched'].append(matched[mask])
+            stats['scores'].append(candidate[mask, 4])
+            stats['reference'][0] += int((reference[:, 5] == cls).sum())
+
+        if progress_callback:
+            progress_callback(index + 1, len(images))
+
+    if not reference_ms:
+        raise ValueError('验证图像均无法读取')
+
+    aps = {
+        cls: average_precision(np.concatenate(stats['matched']), np.concatenate(stats['scores']), stats['reference'][0])
+        for cls, stats in per_class.items()
+    }
+    valid_aps = [ap for ap in aps.values() if not np.isnan(ap)]
+    precision = totals['matched'] / totals['candidate'] if totals['candidate'] else 1.0
+    recall = totals['matched'] / totals['reference'] if totals['reference'] else 1.0
+    reference_mean, candidate_mean = float(np.mean(reference_ms)), float(np.mean(candidate_ms))
+
+    return {
+        'images': len(reference_ms),
+        'imgsz': imgsz,
+        'latency_ms': {
+            'reference_mean': round(reference_mean, 2),
+            'reference_p50': round(float(np.median(reference_ms)), 2),
+            'candidate_mean': round(candidate_mean, 2),
+            'candidate_p50': round(float(np.median(candidate_ms)), 2)
+        },
+        'speedup': round(reference_mean / candidate_mean, 3) if candidate_mean > 0 else None,
+        'detections': totals,
+        'box_match': {
+            'iou_threshold': match_iou,
+            'precision': round(precision, 4),
+            'recall': round(recall, 4),
+            'f1': round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0
+        },
+        'map': round(float(np.mean(valid_aps)), 4) if valid_aps else None,  # mAP@match_iou
+        'per_class_ap': {str(cls): (None if np.isnan(ap) else round(ap, 4)) for cls, ap in aps.items()}
+    }
+
+
+def quantize_model(model_path: str, image_dir: str, imgsz: int = 640, max_images: int = 100,
+                   conf: float = 0.25, iou: float = 0.45, backend_options: Optional[Dict[str, Any]] = None,
+                   progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    生成模型的INT8变体，并在本地图像目录上与FP32模型对比延迟和检测一致性
+
+    FP32 和 INT8 两个变体都通过模型导出缓存生成（ONNX，INT8 为ONNX Runtime
+    动态量化），对比在同一个ONNX Runtime后端上进行，加速比只反映量化的影响。
+    报告写入INT8变体的产物清单，/api/models 的 variants 中可以看到。
+
+    Args:
+        model_path: 源模型（.pt）路径
+        image_dir: 验证图像目录
+        imgsz: 导出和推理的输入尺寸
+        max_images: 最多使用的图像数量（0 表示全部）
+        backend_options: ONNX Runtime 线程参数（与模型注册表一致）
+
+    Returns:
+        dict: INT8 变体清单及对比报告
+    """
+    images = list_images(image_dir, max_images)
+    if not images:
+        raise ValueError(f'验证图像目录中没有图像: {image_dir}')
+
+    # 进度：导出占前 20%，对比推理占后 80%
+    def report(done, total):
+        if progress_callback:
+            progress_callback(done, total)
+
+    fp32 = export_model(model_path, {'format': 'onnx', 'imgsz': imgsz})
+    report(1, 10)
+    int8 = export_model(model_path, {'format': 'onnx', 'imgsz': imgsz, 'quantize': 'int8'})
+    report(2, 10)
+
+    backend_options = backend_options or {}
+    reference_model = load_model(fp32['path'], BACKEND_ONNXRUNTIME, backend_options)
+    candidate_model = load_model(int8['path'], BACKEND_ONNXRUNTIME, backend_options)
+    comparison = compare_models(
+        reference_model, candidate_model, images, imgsz, conf, iou,
+        progress_callback=lambda done, total: report(2 + int(8 * done / total), 10)
+    )
+    comparison.update({
+        'image_dir': image_dir,
+        'reference': {'path': fp32['path'], 'size_mb': fp32['size_mb'], 'variant': fp32['variant']},
+        'candidate': {'path': int8['path'], 'size_mb': int8['size_mb'], 'variant': int8['variant']},
+        'size_ratio': round(int8['size_mb'] / fp32['size_mb'], 3) if fp32['size_mb'] else None,
+        'created': time.time()
+    })
+
+    # 报告写入INT8变体的清单
+    manifest_path = os.path.join(artifacts_dir(model_path), int8['key'] + '.json')
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['quantization_report'] = comparison
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"📐 INT8量化对比完成: {model_path} (加速 {comparison['speedup']}x, "
+          f"框匹配F1 {comparison['box_match']['f1']}, mAP50 {comparison['map']})")
+    return {**manifest, 'cached': int8['cached']}
@@ -0,0 +1,321 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .inference_backends import BACKEND_TORCH, load_model, resolve_backend
+from .model_warmup import warmup_model
+
+
+class SharedModel:
+    """注册表中共享模型的串行调用包装
+
+    ultralytics 的 predictor 不是线程安全的（每次调用都会修改 predictor 状态和
+    imgsz 设置），同一个模型对象被Flask请求线程、后台任务和RTSP共享推理线程
+    同时使用时，推理调用（__call__ / predict / track）按模型串行执行；其他属性
+    （names、ckpt_path、model 等）直接访问原模型。
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.contended_calls = 0
+        self.wait_time = 0.0
+
+    @property
+    def unwrapped(self):
+        return self._model
+
+    def _run(self, method, *args, **kwargs):
+        start_time = time.perf_counter()
+        contended = not self._lock.acquire(blocking=False)
+        if contended:
+            self._lock.acquire()
+        try:
+            waited = time.perf_counter() - start_time
+            with self._stats_lock:
+                self.calls += 1
+                self.contended_calls += int(contended)
+                self.wait_time += waited
+            return method(*args, **kwargs)
+        finally:
+            self._lock.release()
+
+    def __call__(self, *args, **kwargs):
+        return self._run(self._model, *args, **kwargs)
+
+    def predict(self, *args, **kwargs):
+        return self._run(self._model.predict, *args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        return self._run(self._model.track, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'calls': self.calls,
+                'contended_calls': self.contended_calls,
+                'lock_wait_ms_avg': round(self.wait_time * 1000 / self.calls, 2) if self.calls else 0
+            }
+
+
+class _ModelEntry:
+    """注册表中的一个常驻模型"""
+
+    __slots__ = ('key', 'path', 'model', 'owners', 'size_bytes', 'load_time', 'loaded_at', 'last_used', 'warmup')
+
+    def __init__(self, key, path, model, size_bytes, load_time, warmup=None):
+        self.key = key
+        self.path = path
+        self.model = SharedModel(model)
+        self.owners: Counter = Counter()
+        self.size_bytes = size_bytes
+        self.load_time = load_time
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.warmup = warmup  # 预热耗时记录（未预热时为 None）
+
+    @property
+    def refcount(self) -> int:
+        return sum(self.owners.values())
+
+
+def _estimate_model_bytes(model, model_path: str) -> int:
+    """估算模型常驻内存：PyTorch 模型按参数和缓冲区统计，其他情况退化为文件大小"""
+    torch_model = getattr(model, 'model', None)
+    try:
+        tensors = list(torch_model.parameters()) + list(torch_model.buffers())
+        return int(sum(t.numel() * t.element_size() for t in tensors))
+    except Exception:
+        pass
+    try:
+        return os.path.getsize(model_path)
+    except OSError:
+        return 0
+
+
+class ModelRegistry:
+    """进程级模型注册表
+
+    同一个模型文件（按绝对路径 + 修改时间 + 推理后端去重）在进程内只加载一次，
+    全局模型、各RTSP流和模型轮询器通过 acquire/release 共享同一实例并
+    记录引用者。引用数降为0的模型仍保留在缓存中以便复用，常驻总内存
+    超过预算时按最近最少使用顺序淘汰空闲模型；仍被引用的模型不会被淘汰。
+    文件被覆盖（修改时间变化）后再次 acquire 会加载新版本，旧版本在所有
+    引用释放后按同样规则淘汰。
+
+    新加载的模型先按 warmup_sizes 预热，预热完成后才对 acquire 的调用方
+    可见，第一个真实请求不再承担初始化开销。acquire 返回 SharedModel 包装，
+    所有使用者对同一模型的推理调用串行执行。
+    """
+
+    def __init__(self, max_memory_mb: float = 2048, loader: Callable[..., Any] = load_model,
+                 warmup_sizes=(640,), warmup_runs: int = 2):
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.loader = loader  # loader(model_path, backend, backend_options)
+        self.default_backend = BACKEND_TORCH
+        self.backend_options: Dict[str, Any] = {}
+        self.warmup_sizes = list(warmup_sizes)  # 为空时不预热
+        self.warmup_runs = warmup_runs
+
+        self._entries: Dict[Tuple, _ModelEntry] = {}
+        self._owner_keys: Dict[Hashable, List[Tuple]] = {}  # 引用者 -> 持有的模型键（按获取顺序）
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.RLock()
+
+        self.load_count = 0
+        self.hit_count = 0
+        self.evicted_count = 0
+
+    def init_app(self, app):
+        """从Flask配置读取内存预算和预热参数"""
+        self.max_memory_bytes = int(app.config.get('MODEL_CACHE_MAX_MEMORY_MB', self.max_memory_bytes / 1024 / 1024) * 1024 * 1024)
+        self.warmup_sizes = list(app.config.get('MODEL_WARMUP_SIZES', self.warmup_sizes))
+        self.warmup_runs = app.config.get('MODEL_WARMUP_RUNS', self.warmup_runs)
+        self.default_backend = app.config.get('INFERENCE_BACKEND', self.default_backend)
+        self.backend_options = {
+            'ort_intra_op_threads': app.config.get('ORT_INTRA_OP_THREADS', 0),
+            'ort_inter_op_threads': app.config.get('ORT_INTER_OP_THREADS', 0),
+            'openvino_num_threads': app.config.get('OPENVINO_NUM_THREADS', 0)
+        }
+
+    def resolve_backend(self, model_path: str, backend: Optional[str] = None) -> str:
+        """确定实际使用的后端（未指定时使用配置的默认后端，'auto' 按文件类型选择）"""
+        return resolve_backend(model_path, backend or self.default_backend)
+
+    def model_key(self, model_path: str, backend: Optional[str] = None) -> Tuple:
+        """模型去重键：本地文件为 (绝对路径, 修改时间, 后端)，其他（如自动下载的官方模型名）为 (名称, None, 后端)"""
+        backend = self.resolve_backend(model_path, backend)
+        if os.path.exists(model_path):
+            path = os.path.abspath(model_path)
+            return path, os.stat(path).st_mtime_ns, backend
+        return model_path, None, backend
+
+    def acquire(self, model_path: str, owner: Hashable, backend: Optional[str] = None):
+        """
+        获取模型并登记引用，未加载时加载（同一模型的并发加载只执行一次）
+
+        Args:
+            model_path: 模型文件路径
+            owner: 引用者标识，如 'global'、'stream:3'、'polling:3'
+            backend: 推理后端 torch / onnxruntime / openvino / auto，为空时使用默认后端
+
+        Returns:
+            SharedModel 包装的模型实例（加载失败时抛出异常）
+        """
+        key = self.model_key(model_path, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                load_lock = self._load_locks.setdefault(key, threading.Lock())
+            else:
+                self.hit_count += 1
+
+        if entry is None:
+            # 加载在注册表锁之外进行，不阻塞其他模型的获取和释放
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None:
+                    try:
+                        start_time = time.perf_counter()
+                        model = self.loader(model_path, key[2], self.backend_options)
+                        load_time = time.perf_counter() - start_time
+                        warmup = self._warmup(model, model_path)
+                        entry = _ModelEntry(key, model_path, model, _estimate_model_bytes(model, model_path), load_time, warmup)
+                        with self._lock:
+                            self._entries[key] = entry
+                            self.load_count += 1
+                    finally:
+                        # 加载失败时同样移除加载锁，避免失败的模型路径残留
+                        with self._lock:
+                            if self._load_locks.get(key) is load_lock:
+                                del self._load_locks[key]
+                    print(f"✅ 模型已加载到注册表: {model_path} ({entry.size_bytes / 1024 / 1024:.1f}MB, {load_time * 1000:.0f}ms)")
+                else:
+                    with self._lock:
+                        self.hit_count += 1
+
+        with self._lock:
+            entry.owners[owner] += 1
+            entry.last_used = time.time()
+            self._owner_keys.setdefault(owner, []).append(key)
+            self._evict_idle()
+            return entry.model
+
+    def _warmup(self, model, model_path: str) -> Optional[Dict[str, Any]]:
+        """预热新加载的模型（失败只记录错误，不影响模型可用）"""
+        if not self.warmup_sizes:
+            return None
+        try:
+            warmup = warmup_model(model, self.warmup_sizes, self.warmup_runs)
+            print(f"🔥 模型预热完成: {model_path} (尺寸 {self.warmup_sizes}, {warmup['total_ms']:.0f}ms)")
+            return warmup
+        except Exception as e:
+            print(f"⚠️ 模型预热失败: {model_path}, {e}")
+            return {'error': str(e)}
+
+    def get_warmup(self, model_path: str, backend: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """获取常驻模型的预热记录"""
+        with self._lock:
+            entry = self._entries.get(self.model_key(model_path, backend))
+            return entry.warmup if entry is not None else None
+
+    def release(self, model_path: str, owner: Hashable, backend: Optional[str] = None):
+        """释放引用者对某个模型的一次引用（未指定后端时匹配该路径最早获取的引用）"""
+        with self._lock:
+            keys = self._owner_keys.get(owner, [])
+            # 模型文件被删除或移动后仍按绝对路径匹配（非本地文件的键为原始名称）
+            paths = (os.path.abspath(model_path), model_path)
+            for i, key in enumerate(keys):
+                if key[0] in paths and (backend is None or key[2] == self.resolve_backend(model_path, backend)):
+                    del keys[i]
+                    self._drop_reference(key, owner)
+                    break
+            if not keys:
+                self._owner_keys.pop(owner, None)
+            self._evict_idle()
+
+    def release_owner(self, owner: Hashable):
+        """释放引用者持有的全部模型引用"""
+        with self._lock:
+            for key in self._owner_keys.pop(owner, []):
+                self._drop_reference(key, owner)
+            self._evict_idle()
+
+    def _drop_reference(self, key: Tuple, owner: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.owners[owner] -= 1
+        if entry.owners[owner] <= 0:
+            del entry.owners[owner]
+        entry.last_used = time.time()
+
+    def _evict_idle(self):
+        """内存超出预算时按LRU淘汰空闲模型（调用方需持有 self._lock）"""
+        total = sum(entry.size_bytes for entry in self._entries.values())
+        if total <= self.max_memory_bytes:
+            return
+        idle = sorted((entry for entry in self._entries.values() if entry.refcount == 0),
+                      key=lambda entry: entry.last_used)
+        for entry in idle:
+            if total <= self.max_memory_bytes:
+                break
+            del self._entries[entry.key]
+            total -= entry.size_bytes
+            self.evicted_count += 1
+            print(f"🗑️ 淘汰空闲模型: {entry.path} ({entry.size_bytes / 1024 / 1024:.1f}MB)")
+
+    def evict_idle(self, all_idle: bool = False) -> int:
+        """手动淘汰空闲模型，all_idle 为 True 时忽略预算淘汰全部空闲模型，返回淘汰数量"""
+        with self._lock:
+            before = self.evicted_count
+            if all_idle:
+                for key in [key for key, entry in self._entries.items() if entry.refcount == 0]:
+                    del self._entries[key]
+                    self.evicted_count += 1
+            else:
+                self._evict_idle()
+            return self.evicted_count - before
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计和每个模型的常驻大小"""
+        with self._lock:
+            models = [
+                {
+                    'path': entry.path,
+                    'resolved_path': entry.key[0],
+                    'mtime_ns': entry.key[1],
+                    'backend': entry.key[2],
+                    'refcount': entry.refcount,
+                    'owners': {str(owner): count for owner, count in entry.owners.items()},
+                    'size_mb': round(entry.size_bytes / 1024 / 1024, 2),
+                    'load_ms': round(entry.load_time * 1000, 1),
+                    'warmup': entry.warmup,
+                    'inference': entry.model.get_stats(),
+                    'loaded_at': entry.loaded_at,
+                    'idle_seconds': round(time.time() - entry.last_used, 1) if entry.refcount == 0 else 0
+                }
+                for entry in sorted(self._entries.values(), key=lambda entry: entry.loaded_at)
+            ]
+            return {
+                'models': models,
+                'resident_count': len(models),
+                'resident_mb': round(sum(entry.size_bytes for entry in self._entries.values()) / 1024 / 1024, 2),
+                'max_memory_mb': round(self.max_memory_bytes / 1024 / 1024, 2),
+                'default_backend': self.default_backend,
+                'loads': self.load_count,
+                'hits': self.hit_count,
+                'evicted': self.evicted_count
+            }
+
+
+# 全局模型注册表实例
+model_registry = ModelRegistry()
@@ -0,0 +1,142 @@
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+class ModelHandle(NamedTuple):
+    """不可变的模型句柄
+
+    每次切换模型都生成一个新句柄。请求在开始时取一次句柄并全程使用，
+    切换过程中不会看到模型、分割处理器和模型类型不一致的中间状态。
+    """
+    path: str
+    model_type: str  # 'detection' 或 'segmentation'
+    model: Any
+    seg_handler: Any
+    version: int
+    loaded_at: float
+    backend: str = 'torch'
+
+    @property
+    def names(self):
+        return self.model.names
+
+
+class ModelSwitcher:
+    """双缓冲模型切换器
+
+    新模型在后台线程中加载（及预热），完成后一次性替换当前句柄；切换
+    期间请求继续使用旧句柄，正在执行的请求也在旧模型上完成。旧句柄替换
+    后交给 release 回调释放注册表引用，其模型对象在最后一个请求结束、
+    不再被引用时由Python回收。
+
+    加载过程中再次请求切换时只保留最新的目标，中间目标直接跳过。
+    """
+
+    def __init__(self, build: Callable[..., ModelHandle],
+                 release: Optional[Callable[[ModelHandle], None]] = None):
+        self.build = build
+        self.release = release
+
+        self._handle: Optional[ModelHandle] = None
+        self._target: Optional[Tuple[str, Dict[str, Any]]] = None  # (模型路径, 加载参数)
+        self._loading_path: Optional[str] = None
+        self._loader: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+        self._generation = 0  # 每次请求切换 +1
+        self._finished_generation = 0  # 最近一次完成（成功或失败）的请求
+
+        self.last_error: Optional[str] = None
+        self.last_error_path: Optional[str] = None
+        self.last_switch_time = 0.0
+        self.swap_count = 0
+
+    @property
+    def current(self) -> Optional[ModelHandle]:
+        """当前模型句柄（原子读取）"""
+        return self._handle
+
+    def switch(self, model_path: str, wait: bool = False, timeout: Optional[float] = None, **options) -> bool:
+        """
+        请求切换到指定模型
+
+        Args:
+            model_path: 模型路径
+            wait: 是否等待本次切换完成
+            timeout: 等待超时时间（秒）
+            **options: 传给 build 的加载参数（如 backend）
+
+        Returns:
+            wait 为 False 时总是返回 True；否则返回切换是否成功
+        """
+        with self._condition:
+            self._generation += 1
+            generation = self._generation
+            self._target = (model_path, options)
+            if self._loader is None:
+                self._loader = threading.Thread(target=self._load_loop, name='model-switcher', daemon=True)
+                self._loader.start()
+
+            if not wait:
+                return True
+            if not self._condition.wait_for(lambda: self._finished_generation >= generation, timeout):
+                return False
+            handle = self._handle
+            return handle is not None and handle.path == model_path and self.last_error_path != model_path
+
+    def _load_loop(self):
+        """后台加载线程：依次处理最新的切换目标，没有目标时退出"""
+        while True:
+            with self._condition:
+                if self._target is None:
+                    self._loader = None
+                    self._loading_path = None
+                    return
+                model_path, options = self._target
+                self._target = None
+                self._loading_path = model_path
+                generation = self._generation
+                version = (self._handle.version if self._handle else 0) + 1
+
+            start_time = time.perf_counter()
+            try:
+                handle = self.build(model_path, version, **options)
+                error = None
+            except Exception as e:
+                handle = None
+                error = str(e)
+                print(f"❌ 模型切换失败: {model_path}, {e}")
+
+            old_handle = None
+            with self._condition:
+                if handle is not None:
+                    old_handle, self._handle = self._handle, handle
+                    self.swap_count += 1
+                    self.last_switch_time = time.perf_counter() - start_time
+                    self.last_error = self.last_error_path = None
+                else:
+                    self.last_error, self.last_error_path = error, model_path
+                self._finished_generation = generation
+                self._condition.notify_all()
+
+            if handle is not None:
+                print(f"🔁 模型已切换: {model_path} (版本 {handle.version}, {self.last_switch_time * 1000:.0f}ms)")
+            if old_handle is not None and self.release is not None:
+                try:
+                    self.release(old_handle)
+                except Exception as e:
+                    print(f"⚠️ 释放旧模型失败: {old_handle.path}, {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取切换状态"""
+        with self._condition:
+            handle = self._handle
+            return {
+                'loading': self._loader is not None,
+                'loading_path': self._loading_path or (self._target[0] if self._target else None),
+                'version': handle.version if handle else 0,
+                'swap_count': self.swap_count,
+                'last_switch_ms': round(self.last_switch_time * 1000, 1),
+                'last_error': self.last_error,
+                'last_error_path': self.last_error_path
+            }
@@ -0,0 +1,35 @@
+import time
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+
+def warmup_model(model, sizes: Sequence[int] = (640,), runs: int = 2) -> Dict[str, Any]:
+    """
+    用空白图像预热模型，触发首次推理时的图初始化和显存/内存分配
+
+    Args:
+        model: YOLO模型
+        sizes: 预热的输入尺寸列表（与实际推理的 imgsz 一致）
+        runs: 每个尺寸的推理次数
+
+    Returns:
+        dict: 每个尺寸每次推理的耗时（毫秒）和总耗时
+    """
+    timings = {}
+    start_time = time.perf_counter()
+    for size in sizes:
+        dummy = np.zeros((size, size, 3), dtype=np.uint8)
+        size_timings = []
+        for _ in range(max(1, runs)):
+            run_start = time.perf_counter()
+            model(dummy, imgsz=size, verbose=False)
+            size_timings.append(round((time.perf_counter() - run_start) * 1000, 1))
+        timings[str(size)] = size_timings
+
+    return {
+        'sizes': list(sizes),
+        'runs': max(1, runs),
+        'timings_ms': timings,
+        'total_ms': round((time.perf_counter() - start_time) * 1000, 1)
+    }
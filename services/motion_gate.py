@@ -0,0 +1,129 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+MOTION_METHODS = ('diff', 'mog2')
+
+
+class MotionGate:
+    """推理前的运动预过滤
+
+    把帧缩小到 scale_width 宽的灰度图（代价远小于一次模型推理），判断画面
+    相对上一次推理时是否有变化：
+
+    - diff：与上一次推理时的参考帧做帧差，变化像素占比超过 min_area 视为有运动
+      （与参考帧而不是上一帧比较，缓慢移动的目标也能累积出差异）
+    - mog2：背景减除，前景像素占比超过 min_area 视为有运动
+
+    画面无变化时跳过推理，调用方保留上一次的检测和跟踪结果（跟踪器不更新，
+    轨迹不会因为没有检测而被判定消失）；距上一次推理超过 refresh_interval
+    秒时强制推理一次，避免静止目标的结果长期不刷新。
+    """
+
+    def __init__(self, method: str = 'diff', scale_width: int = 160, pixel_threshold: int = 25,
+                 min_area: float = 0.002, refresh_interval: float = 5.0):
+        if method not in MOTION_METHODS:
+            raise ValueError(f'不支持的运动检测方法: {method}')
+        self.method = method
+        self.scale_width = scale_width
+        self.pixel_threshold = pixel_threshold  # 帧差方法中视为变化的灰度差
+        self.min_area = min_area  # 变化像素占比阈值
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._reference: Optional[np.ndarray] = None
+        self._subtractor = None
+        self._last_inference_time = 0.0
+        self.last_motion_ratio = 0.0
+
+        self.checks = 0
+        self.skipped = 0
+        self.forced_refreshes = 0
+        self.gate_time = 0.0  # 运动检测本身的累计耗时（秒）
+        self.saved_inference_time = 0.0  # 跳过的推理按平均耗时估算的累计耗时（秒）
+        self.spent_inference_time = 0.0  # 实际执行推理的累计耗时（秒）
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        scale = self.scale_width / width
+        small = cv2.resize(frame, (self.scale_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _motion_ratio(self, gray: np.ndarray) -> float:
+        if self.method == 'mog2':
+            if self._subtractor is None or self._reference is None or self._reference.shape != gray.shape:
+                self._reference = gray  # mog2 只用参考帧记录尺寸，尺寸变化（如ROI调整）时重建背景模型
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+            mask = self._subtractor.apply(gray)
+            return float(np.count_nonzero(mask)) / mask.size
+
+        if self._reference is None or self._reference.shape != gray.shape:
+            return 1.0
+        diff = cv2.absdiff(gray, self._reference)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """判断该帧是否需要推理；返回 True 时以该帧作为新的参考帧"""
+        now = time.perf_counter() if now is None else now
+        start_time = time.perf_counter()
+        with self._lock:
+            gray = self._prepare(frame)
+            ratio = self._motion_ratio(gray)
+            self.last_motion_ratio = ratio
+            self.checks += 1
+
+            refresh = now - self._last_inference_time >= self.refresh_interval
+            infer = ratio >= self.min_area or refresh
+            if infer:
+                if refresh and ratio < self.min_area:
+                    self.forced_refreshes += 1
+                self._reference = gray
+                self._last_inference_time = now
+            else:
+                self.skipped += 1
+            self.gate_time += time.perf_counter() - start_time
+            return infer
+
+    def record_inference_time(self, inference_ms: Optional[float], skipped: bool):
+        """
+        累计推理耗时：实际推理计入已用时间，跳过的推理按当前平均推理耗时计入节省时间
+
+        Args:
+            inference_ms: 实际推理耗时，或跳过时的平均推理耗时估计
+            skipped: 本次是否被运动检测跳过
+        """
+        if not inference_ms:
+            return
+        with self._lock:
+            if skipped:
+                self.saved_inference_time += inference_ms / 1000
+            else:
+                self.spent_inference_time += inference_ms / 1000
+
+    def reset(self):
+        """清空参考帧和背景模型（如重连或切换画面后）"""
+        with self._lock:
+            self._reference = None
+            self._subtractor = None
+            self._last_inference_time = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved_ms = (self.saved_inference_time - self.gate_time) * 1000
+            total_ms = (self.saved_inference_time + self.spent_inference_time) * 1000
+            return {
+                'method': self.method,
+                'checks': self.checks,
+                'skipped': self.skipped,
+                'skip_ratio': round(self.skipped / self.checks, 3) if self.checks else 0,
+                'forced_refreshes': self.forced_refreshes,
+                'last_motion_ratio': round(self.last_motion_ratio, 4),
+                'gate_ms_avg': round(self.gate_time * 1000 / self.checks, 3) if self.checks else 0,
+                # 跳过的推理按平均推理耗时估算，扣除运动检测本身的开销
+                'cpu_saved_ms': round(saved_ms, 1),
+                'cpu_saved_ratio': round(saved_ms / total_ms, 3) if total_ms > 0 else 0
+            }
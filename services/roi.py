@@ -0,0 +1,134 @@
+import json
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .letterbox import LETTERBOX_STRIDE
+
+
+def parse_roi_polygons(value) -> List[List[List[float]]]:
+    """
+    解析并校验ROI多边形配置
+
+    坐标为相对画面宽高的比例（0~1），与摄像头分辨率无关：
+    [[[x, y], [x, y], [x, y], ...], ...]，每个多边形至少3个点。
+
+    Args:
+        value: JSON字符串或列表，为空表示不设置ROI
+
+    Returns:
+        List: 规范化后的多边形列表（坐标裁剪到 0~1），不设置ROI时为空列表
+
+    Raises:
+        ValueError: 格式不正确
+    """
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'ROI配置不是合法的JSON: {e}')
+    if not isinstance(value, list):
+        raise ValueError('ROI配置必须是多边形列表')
+
+    polygons = []
+    for polygon in value:
+        try:
+            points = np.asarray(polygon, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError('ROI多边形的点必须是 [x, y] 数值')
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError('每个ROI多边形至少需要3个 [x, y] 点')
+        if not np.isfinite(points).all():
+            raise ValueError('ROI坐标必须是有限数值')
+        polygons.append(np.clip(points, 0.0, 1.0).round(5).tolist())
+    return polygons
+
+
+class ROICrop:
+    """按ROI多边形裁剪推理区域
+
+    推理只在所有ROI多边形的外接矩形上进行（边界按 stride 对齐），裁剪区域
+    比整帧小，同样的 imgsz 下目标的有效分辨率更高；检测框先加上裁剪偏移
+    映射回整帧坐标，再只保留中心点落在ROI多边形内的框，ROI外的误检不会
+    进入跟踪和预警。
+
+    同一路流的分辨率不变，像素多边形、裁剪矩形和ROI掩码只计算一次。
+    """
+
+    def __init__(self, polygons: List[List[List[float]]], frame_shape: Tuple[int, int],
+                 stride: int = LETTERBOX_STRIDE):
+        height, width = frame_shape[:2]
+        self.frame_shape = (height, width)
+        self.polygons = polygons
+        self.pixel_polygons = [
+            np.round(np.asarray(polygon, dtype=np.float64) * [width - 1, height - 1]).astype(np.int32)
+            for polygon in polygons
+        ]
+
+        points = np.concatenate(self.pixel_polygons)
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0) + 1
+        # 外扩到 stride 的整数倍，避免letterbox产生多余填充
+        x0, x1 = self._align(x0, x1, width, stride)
+        y0, y1 = self._align(y0, y1, height, stride)
+        self.x0, self.y0, self.x1, self.y1 = int(x0), int(y0), int(x1), int(y1)
+        self.crop_shape = (self.y1 - self.y0, self.x1 - self.x0)
+        self._offset = np.array([self.x0, self.y0, self.x0, self.y0], dtype=np.float32)
+
+        # 整帧ROI掩码，用于向量化判断检测框中心是否落在ROI内
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(self.mask, self.pixel_polygons, 1)
+
+    @staticmethod
+    def _align(start: int, end: int, limit: int, stride: int) -> Tuple[int, int]:
+        size = min(int(np.ceil((end - start) / stride) * stride), limit)
+        start = min(max(0, start - (size - (end - start)) // 2), limit - size)
+        return start, start + size
+
+    @property
+    def area_ratio(self) -> float:
+        """裁剪区域占整帧的像素比例"""
+        return (self.crop_shape[0] * self.crop_shape[1]) / (self.frame_shape[0] * self.frame_shape[1])
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """裁剪推理区域（返回视图，不复制）"""
+        return frame[self.y0:self.y1, self.x0:self.x1]
+
+    def map_boxes(self, xyxy: np.ndarray) -> np.ndarray:
+        """把裁剪区域内的 (N,4) xyxy 框映射回整帧坐标"""
+        if len(xyxy) == 0:
+            return xyxy
+        return xyxy + self._offset
+
+    def inside(self, xyxy: np.ndarray) -> np.ndarray:
+        """整帧坐标下的检测框中心是否落在任一ROI多边形内，返回 (N,) bool"""
+        if len(xyxy) == 0:
+            return np.zeros(0, dtype=bool)
+        height, width = self.frame_shape
+        cx = np.clip(((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(np.int64), 0, width - 1)
+        cy = np.clip(((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(np.int64), 0, height - 1)
+        return self.mask[cy, cx].astype(bool)
+
+    def matches(self, polygons: List[List[List[float]]], frame_shape: Tuple[int, int]) -> bool:
+        return self.frame_shape == tuple(frame_shape[:2]) and self.polygons == polygons
+
+    def draw(self, frame: np.ndarray, color=(255, 200, 0), scale: float = 1.0) -> np.ndarray:
+        """在帧上绘制ROI多边形（scale 为帧相对原始分辨率的缩放比例）"""
+        polygons = self.pixel_polygons
+        if scale != 1.0:
+            polygons = [np.round(polygon * scale).astype(np.int32) for polygon in polygons]
+        cv2.polylines(frame, polygons, True, color, 2)
+        return frame
+
+
+def roi_for_frame(cached: Optional[ROICrop], polygons: List[List[List[float]]],
+                  frame_shape) -> Optional[ROICrop]:
+    """复用或重新计算ROI裁剪参数；没有ROI时返回 None"""
+    if not polygons:
+        return None
+    if cached is not None and cached.matches(polygons, frame_shape):
+        return cached
+    return ROICrop(polygons, frame_shape)
@@ -4,9 +4,7 @@ import time
 import queue
 import json
 import numpy as np
-from ultralytics import YOLO
 from datetime import datetime
-from collections import defaultdict, deque
 import base64
 import io
 from PIL import Image
@@ -14,20 +12,129 @@ import os
 
 # 导入模型轮询管理器
 from .model_polling import polling_manager
+from .model_registry import model_registry
+from .detection_results import boxes_to_arrays, build_detections
+from .frame_scheduler import AdaptiveFrameScheduler
+from .motion_gate import MotionGate
+from .alert_filter import alert_filter
+from .roi import parse_roi_polygons, roi_for_frame
+from .letterbox import DEFAULT_IMGSZ, LetterboxTransform, normalize_imgsz, supports_rect_input
+from .track_matching import associate
+from .track_store import TrackStore
+from .inference_server import InferenceServer
+from .frame_ring import CaptureProcess
+from .mjpeg_streamer import MJPEGBroadcaster
+
+# 可按流覆盖的运行参数（存于 RTSPStream.stream_options，未设置的使用全局默认值）
+STREAM_OPTION_TYPES = {
+    'capture_mode': str,
+    'capture_slots': int,
+    'capture_max_width': int,
+    'capture_max_height': int,
+    'match_method': str,
+    'match_metric': str,
+    'motion_gate': bool,
+    'motion_method': str,
+    'motion_pixel_threshold': int,
+    'motion_min_area': float,
+    'motion_refresh_seconds': float,
+    'mjpeg_fps': float,
+    'mjpeg_quality': int,
+    'preview_max_width': int,
+    'target_latency_ms': float,
+    'max_detection_stride': int
+}
+STREAM_OPTION_CHOICES = {
+    'capture_mode': ('thread', 'process'),
+    'match_method': ('hungarian', 'greedy'),
+    'match_metric': ('centroid', 'iou'),
+    'motion_method': ('diff', 'mog2')
+}
+# 修改后需要重启处理线程才能生效的参数
+RESTART_OPTIONS = {'capture_mode', 'capture_slots', 'capture_max_width', 'capture_max_height'}
+
+
+def parse_stream_options(value):
+    """
+    解析并校验按流覆盖的运行参数
+
+    Args:
+        value: JSON字符串或字典，为空表示全部使用全局默认值
+
+    Returns:
+        dict: 规范化后的参数（只包含已设置的字段）
+
+    Raises:
+        ValueError: 字段未知、类型或取值不正确
+    """
+    if value is None or value == '':
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'流运行参数不是合法的JSON: {e}')
+    if not isinstance(value, dict):
+        raise ValueError('流运行参数必须是对象')
+
+    options = {}
+    for key, raw in value.items():
+        if key not in STREAM_OPTION_TYPES:
+            raise ValueError(f'未知的流运行参数: {key}')
+        if raw is None:
+            continue
+        option_type = STREAM_OPTION_TYPES[key]
+        if option_type is bool:
+            if not isinstance(raw, bool):
+                raise ValueError(f'{key} 必须是布尔值')
+            options[key] = raw
+            continue
+        try:
+            parsed = option_type(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f'{key} 的取值不正确: {raw}')
+        if key in STREAM_OPTION_CHOICES and parsed not in STREAM_OPTION_CHOICES[key]:
+            raise ValueError(f'{key} 必须是 {" / ".join(STREAM_OPTION_CHOICES[key])} 之一')
+        if option_type is not str and parsed <= 0:
+            raise ValueError(f'{key} 必须大于0')
+        options[key] = parsed
+    return options
+
+
+def _scale_items(items, scale, keys):
+    """按缩放比例复制检测/跟踪结果中的坐标字段（用于在缩小的预览帧上绘制）"""
+    if scale == 1.0:
+        return items
+    return [dict(item, **{key: [v * scale for v in item[key]] for key in keys}) for item in items]
+
+
+def _scale_segmentation(results, scale):
+    """按缩放比例复制分割结果的检测框（掩码在可视化时按图像尺寸缩放）"""
+    if scale == 1.0:
+        return results
+    return dict(results, boxes=[[v * scale for v in box] for box in results.get('boxes', [])])
+
 
 class ObjectTracker:
-    """目标跟踪器（每个RTSP流独立的跟踪器）"""
-    def __init__(self):
-        self.tracks = {}
-        self.next_id = 1
+    """目标跟踪器（每个RTSP流独立的跟踪器）
+
+    像素阈值（匹配距离、最小面积和边长）按 640 宽的参考画面设定，
+    更新时按实际帧宽等比缩放，与采集分辨率无关。
+    """
+    REFERENCE_WIDTH = 640
+
+    def __init__(self, match_method='hungarian', match_metric='centroid'):
+        self.store = TrackStore(history_size=20)
         self.max_disappeared = 10
         self.max_distance = 100
+        self.min_area = 800
+        self.min_side = 15
+        self.min_iou = 0.3
+        self.scale = 1.0  # 当前帧宽相对参考画面的比例
+        self.match_method = match_method  # 'hungarian' 或 'greedy'
+        self.match_metric = match_metric  # 'centroid' 或 'iou'
         self.detection_history = []
         
-        # 累积计数功能
-        self.cumulative_ids = set()
-        self.cumulative_counts_by_class = defaultdict(set)
-        
         # 预警功能
         self.alert_enabled = False
         self.new_targets_this_frame = []
@@ -43,6 +150,10 @@ class ObjectTracker:
     def clear_new_targets(self):
         """清空新目标记录"""
         self.new_targets_this_frame = []
+    
+    def get_live_track_ids(self):
+        """获取仍在跟踪中的轨迹ID（预警去重只与已丢失的轨迹比较）"""
+        return self.store.live_ids().tolist()
         
     def calculate_centroid(self, bbox):
         """计算边界框的中心点"""
@@ -53,9 +164,10 @@ class ObjectTracker:
         """计算两点之间的欧几里得距离"""
         return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
     
-    def update(self, detections, frame_height):
-        """更新跟踪器"""
+    def update(self, detections, frame_height, frame_width=None):
+        """更新跟踪器（传入 frame_width 时像素阈值按帧宽缩放）"""
         self.new_targets_this_frame = []
+        self.scale = frame_width / self.REFERENCE_WIDTH if frame_width else 1.0
         
         # 清理消失太久的轨迹
         self._cleanup_disappeared_tracks()
@@ -64,24 +176,15 @@ class ObjectTracker:
         stable_detections = self._filter_stable_detections(detections)
         
         if not stable_detections:
-            for track_id in self.tracks:
-                self.tracks[track_id]['disappeared'] += 1
+            self.store.age()
             return self.get_current_tracks()
         
-        # 计算中心点
-        detection_centroids = []
-        for detection in stable_detections:
-            centroid = self.calculate_centroid(detection['bbox'])
-            detection_centroids.append({
-                'centroid': centroid,
-                'detection': detection
-            })
-        
-        if not self.tracks:
-            for detection_info in detection_centroids:
-                self._create_new_track(detection_info)
+        detection_boxes = np.array([detection['bbox'] for detection in stable_detections], dtype=np.float64)
+        
+        if len(self.store) == 0:
+            self._create_new_tracks(stable_detections, detection_boxes)
         else:
-            self._match_detections_to_tracks(detection_centroids, frame_height)
+            self._match_detections_to_tracks(stable_detections, detection_boxes, frame_height)
         
         return self.get_current_tracks()
     
@@ -89,7 +192,9 @@ class ObjectTracker:
         """过滤稳定的检测结果"""
         if not detections:
             return detections
-            
+        
+        min_area = self.min_area * self.scale ** 2
+        min_side = self.min_side * self.scale
         filtered_detections = []
         for detection in detections:
             bbox = detection['bbox']
@@ -98,148 +203,86 @@ class ObjectTracker:
             area = width * height
             
             if (detection['confidence'] >= 0.4 and 
-                area >= 800 and
-                width >= 15 and height >= 15):
+                area >= min_area and
+                width >= min_side and height >= min_side):
                 filtered_detections.append(detection)
                 
         return filtered_detections
     
     def _cleanup_disappeared_tracks(self):
         """清理消失太久的轨迹"""
-        disappeared_ids = []
-        for track_id in self.tracks:
-            if self.tracks[track_id]['disappeared'] > self.max_disappeared:
-                disappeared_ids.append(track_id)
-        
-        for track_id in disappeared_ids:
-            del self.tracks[track_id]
+        self.store.remove_stale(self.max_disappeared)
     
-    def _create_new_track(self, detection_info):
-        """创建新轨迹"""
-        detection = detection_info['detection']
-        centroid = detection_info['centroid']
-        
-        if len(self.tracks) >= 100:
-            return
-        
-        track_id = self.next_id
-        self.tracks[track_id] = {
-            'centroid': centroid,
-            'disappeared': 0,
-            'bbox': detection['bbox'],
-            'class': detection['class'],
-            'confidence': detection['confidence'],
-            'history': deque([centroid], maxlen=20)
-        }
-        
-        self.cumulative_ids.add(track_id)
-        self.cumulative_counts_by_class[detection['class']].add(track_id)
+    def _create_new_tracks(self, detections, detection_boxes):
+        """批量创建新轨迹"""
+        rows = self.store.add(
+            detection_boxes,
+            [detection['class'] for detection in detections],
+            np.array([detection['confidence'] for detection in detections], dtype=np.float64)
+        )
         
         if self.alert_enabled:
-            new_target = {
-                'id': track_id,
-                'class': detection['class'],
-                'confidence': detection['confidence'],
-                'bbox': detection['bbox'],
-                'centroid': centroid
-            }
-            self.new_targets_this_frame.append(new_target)
-        
-        self.next_id += 1
+            for track_id, detection, centroid in zip(
+                self.store.ids[rows].tolist(), detections, self.store.centroids[rows].tolist()
+            ):
+                new_target = {
+                    'id': track_id,
+                    'class': detection['class'],
+                    'confidence': detection['confidence'],
+                    'bbox': detection['bbox'],
+                    'centroid': tuple(centroid)
+                }
+                self.new_targets_this_frame.append(new_target)
     
-    def _match_detections_to_tracks(self, detection_centroids, frame_height):
+    def _match_detections_to_tracks(self, detections, detection_boxes, frame_height):
         """匹配检测结果到现有轨迹"""
-        if not detection_centroids:
+        if not detections:
             return
         
-        track_centroids = []
-        track_ids = []
-        
-        for track_id, track in self.tracks.items():
-            track_centroids.append(track['centroid'])
-            track_ids.append(track_id)
-        
-        distance_matrix = np.zeros((len(track_centroids), len(detection_centroids)))
-        
-        for i, track_centroid in enumerate(track_centroids):
-            for j, detection_info in enumerate(detection_centroids):
-                distance = self.calculate_distance(track_centroid, detection_info['centroid'])
-                distance_matrix[i][j] = distance
+        matches, unmatched_tracks, unmatched_detections = associate(
+            self.store.live_bboxes(), detection_boxes,
+            metric=self.match_metric,
+            method=self.match_method,
+            max_distance=self.max_distance * self.scale,
+            min_iou=self.min_iou
+        )
         
-        used_detection_indices = set()
-        used_track_indices = set()
-        
-        matches = []
-        for i in range(len(track_centroids)):
-            for j in range(len(detection_centroids)):
-                if distance_matrix[i][j] < self.max_distance:
-                    matches.append((i, j, distance_matrix[i][j]))
-        
-        matches.sort(key=lambda x: x[2])
-        
-        for track_idx, detection_idx, distance in matches:
-            if track_idx not in used_track_indices and detection_idx not in used_detection_indices:
-                track_id = track_ids[track_idx]
-                detection_info = detection_centroids[detection_idx]
-                detection = detection_info['detection']
-                centroid = detection_info['centroid']
-                
-                self.tracks[track_id]['centroid'] = centroid
-                self.tracks[track_id]['disappeared'] = 0
-                self.tracks[track_id]['bbox'] = detection['bbox']
-                self.tracks[track_id]['class'] = detection['class']
-                self.tracks[track_id]['confidence'] = detection['confidence']
-                self.tracks[track_id]['history'].append(centroid)
-                
-                self.cumulative_ids.add(track_id)
-                self.cumulative_counts_by_class[detection['class']].add(track_id)
-                
-                used_track_indices.add(track_idx)
-                used_detection_indices.add(detection_idx)
+        if matches:
+            track_rows, detection_indices = map(np.array, zip(*matches))
+            self.store.update(
+                track_rows,
+                detection_boxes[detection_indices],
+                [detections[j]['class'] for j in detection_indices.tolist()],
+                np.array([detections[j]['confidence'] for j in detection_indices.tolist()], dtype=np.float64)
+            )
         
-        for j, detection_info in enumerate(detection_centroids):
-            if j not in used_detection_indices:
-                self._create_new_track(detection_info)
+        self.store.age(np.array(unmatched_tracks, dtype=np.int64))
         
-        for i, track_id in enumerate(track_ids):
-            if i not in used_track_indices:
-                self.tracks[track_id]['disappeared'] += 1
+        if unmatched_detections:
+            self._create_new_tracks(
+                [detections[j] for j in unmatched_detections],
+                detection_boxes[unmatched_detections]
+            )
+    
+    def get_track_history(self, track_id):
+        """获取轨迹的中心点历史"""
+        return self.store.get_history(track_id)
     
     def get_current_tracks(self):
         """获取当前活跃的轨迹"""
-        tracking_results = []
-        for track_id, track in self.tracks.items():
-            if track['disappeared'] == 0:
-                tracking_results.append({
-                    'id': track_id,
-                    'bbox': track['bbox'],
-                    'class': track['class'],
-                    'confidence': track['confidence'],
-                    'centroid': track['centroid']
-                })
-        return tracking_results
+        return self.store.rows_to_dicts(self.store.visible_rows())
     
     def get_current_counts(self):
         """获取当前屏幕内的目标数量统计"""
-        counts = defaultdict(int)
-        for track_id, track in self.tracks.items():
-            if track['disappeared'] == 0:
-                counts[track['class']] += 1
-        return dict(counts)
+        return self.store.current_counts()
     
     def get_cumulative_counts(self):
         """获取累积计数统计"""
-        counts = {}
-        for class_name, id_set in self.cumulative_counts_by_class.items():
-            counts[class_name] = len(id_set)
-        return counts
+        return self.store.cumulative_counts_by_class()
     
     def reset(self):
         """重置跟踪器"""
-        self.tracks = {}
-        self.next_id = 1
-        self.cumulative_ids = set()
-        self.cumulative_counts_by_class = defaultdict(set)
+        self.store.reset()
         self.new_targets_this_frame = []
 
 
@@ -251,20 +294,46 @@ class RTSPStreamHandler:
         self.is_running = False
         self.cap = None
         self.model = None
-        self.tracker = ObjectTracker()
+        self.model_path = None  # 单模型模式下当前模型路径（模型实例由模型注册表共享）
+        self.model_backend = None  # 当前模型使用的推理后端
+        self._seg_visualizer = None  # 分割结果可视化处理器（按需创建）
+        self._letterbox = None  # 按流分辨率和 imgsz 预先计算的letterbox参数
+        self._roi = None  # 按流分辨率预先计算的ROI裁剪参数
+        self._roi_source = None
+        self._roi_polygons = []
+        self.inference_server = None  # 共享推理服务（为空时直接调用模型）
+        self.tracker = ObjectTracker(
+            match_method=stream_config.get('match_method', 'hungarian'),
+            match_metric=stream_config.get('match_metric', 'centroid')
+        )
         self.thread = None
+        self._stop_event = threading.Event()  # 停止时唤醒重连等待，旧线程尽快退出
+        self._restart_pending = False  # 旧线程退出后再启动（重启时旧线程未在超时内退出）
         self.frame_queue = queue.Queue(maxsize=5)
         self.latest_frame = None
+        self.capture = None  # 采集进程模式下的 CaptureProcess
+        self.ring_overwrites = 0  # 拷贝最新帧时连续被采集进程覆盖、放弃该帧的次数
         self.latest_detections = []
         self.latest_tracking_results = []
         self.latest_counts = {}
         self.latest_alerts = []
         self.latest_segmentation_results = None  # 新增：保存分割结果
+        self.results_version = 0  # 检测/跟踪结果每更新一次加一
         self.frame_count = 0
         self.fps = 0
         self.last_fps_time = time.time()
         self.last_fps_count = 0
         
+        # 自适应检测间隔：按实测推理耗时和解码帧率选择每隔多少帧检测一次
+        self.scheduler = AdaptiveFrameScheduler(
+            target_latency_ms=stream_config.get('target_latency_ms', 500),
+            max_stride=stream_config.get('max_detection_stride', 30)
+        )
+        self.last_inference_ms = 0.0
+        
+        # 运动预过滤：画面相对上次推理无变化时跳过推理，保留上一次的检测和跟踪结果
+        self.motion_gate = self._build_motion_gate()
+        
         # 错误重连相关
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 5
@@ -275,6 +344,18 @@ class RTSPStreamHandler:
         self.stream_id = stream_config.get('id')
         self.current_model_info = {}
         
+        # 标注帧编码缓存：键为 (frame_count, results_version, quality)，帧或结果变化时失效
+        self._encoded_frame = None  # (key, jpeg_bytes)
+        self._encode_lock = threading.Lock()
+        self._preview_quality = stream_config.get('mjpeg_quality', 70)
+        self._last_preview_request = 0.0
+        self._last_producer_encode = 0.0
+        self.preview_idle_timeout = 5.0  # 超过该时间没有预览请求则生产者停止编码
+        self.preview_encode_interval = 1.0 / stream_config.get('mjpeg_fps', 15)
+        self.frame_cache_hits = 0
+        self.frame_cache_misses = 0
+        self.producer_encodes = 0
+        
         # 初始化模型轮询
         self._init_model_polling()
         
@@ -311,36 +392,112 @@ class RTSPStreamHandler:
             return True
             
         try:
-            self.model = YOLO(model_path)
-            print(f"✅ RTSP流 {self.stream_config['name']} 模型加载成功: {model_path}")
+            # 推理后端按流配置（为空时使用全局默认后端）
+            backend = model_registry.resolve_backend(model_path, self.stream_config.get('inference_backend'))
+            self.model = model_registry.acquire(model_path, owner=self._model_owner(), backend=backend)
+            previous = (self.model_path, self.model_backend)
+            self.model_path, self.model_backend = model_path, backend
+            if previous[0] is not None:
+                model_registry.release(previous[0], owner=self._model_owner(), backend=previous[1])
+            print(f"✅ RTSP流 {self.stream_config['name']} 模型加载成功: {model_path} (后端: {backend})")
             return True
         except Exception as e:
             print(f"❌ RTSP流 {self.stream_config['name']} 模型加载失败: {e}")
             return False
     
+    def _model_owner(self):
+        """该流在模型注册表中的引用者标识"""
+        return f"stream:{self.stream_config['id']}"
+    
+    def release_model(self):
+        """释放该流持有的模型引用"""
+        model_registry.release_owner(self._model_owner())
+        self.model = None
+        self.model_path = None
+        self.model_backend = None
+        self._seg_visualizer = None
+    
+    def _build_motion_gate(self):
+        """按流配置创建运动预过滤器（未启用时返回 None）"""
+        if not self.stream_config.get('motion_gate', True):
+            return None
+        return MotionGate(
+            method=self.stream_config.get('motion_method', 'diff'),
+            pixel_threshold=self.stream_config.get('motion_pixel_threshold', 25),
+            min_area=self.stream_config.get('motion_min_area', 0.002),
+            refresh_interval=self.stream_config.get('motion_refresh_seconds', 5.0)
+        )
+    
+    def apply_stream_options(self, changed):
+        """按流运行参数变化后更新相关组件（stream_config 已更新；采集参数由管理器重启生效）"""
+        if changed & {'match_method', 'match_metric'}:
+            self.tracker.match_method = self.stream_config.get('match_method', 'hungarian')
+            self.tracker.match_metric = self.stream_config.get('match_metric', 'centroid')
+        if any(key.startswith('motion_') for key in changed):
+            self.motion_gate = self._build_motion_gate()
+        if changed & {'mjpeg_fps', 'mjpeg_quality'}:
+            self.configure_preview(fps=self.stream_config.get('mjpeg_fps'),
+                                   quality=self.stream_config.get('mjpeg_quality'))
+    
     def start(self):
         """启动RTSP流处理"""
         if self.is_running:
             return False
         
+        # 上一次的处理线程还没退出时不能启动：两个线程会共用 cap、采集进程和跟踪器
+        if self.thread is not None and self.thread.is_alive():
+            print(f"⚠️ RTSP流 {self.stream_config['name']} 上一次的处理线程尚未退出，暂不启动")
+            return False
+        
         if not self.polling_enabled and not self.model:
             print(f"❌ RTSP流 {self.stream_config['name']} 未加载模型且未启用轮询")
             return False
         
         self.is_running = True
+        self._stop_event.clear()
+        if self.inference_server is not None:
+            self.inference_server.register_stream(self._inference_key())
         self.thread = threading.Thread(target=self._process_stream, daemon=True)
         self.thread.start()
         print(f"🚀 RTSP流 {self.stream_config['name']} 开始处理")
         return True
     
-    def stop(self):
-        """停止RTSP流处理"""
+    def stop(self, timeout=5):
+        """停止RTSP流处理，返回处理线程是否已在超时内退出"""
         self.is_running = False
+        self._restart_pending = False
+        self._stop_event.set()
+        if self.inference_server is not None:
+            self.inference_server.unregister_stream(self._inference_key())
         if self.cap:
             self.cap.release()
         if self.thread:
-            self.thread.join(timeout=5)
-        print(f"⏹️ RTSP流 {self.stream_config['name']} 已停止")
+            self.thread.join(timeout=timeout)
+        stopped = self.thread is None or not self.thread.is_alive()
+        if stopped:
+            print(f"⏹️ RTSP流 {self.stream_config['name']} 已停止")
+        else:
+            print(f"⚠️ RTSP流 {self.stream_config['name']} 处理线程未在 {timeout} 秒内退出")
+        return stopped
+    
+    def restart(self):
+        """
+        重启处理线程（采集参数变化后生效）
+        
+        旧线程未在超时内退出（例如阻塞在读帧上）时不立即启动，由后台线程
+        等它真正退出后再启动；期间调用 stop() 会取消这次重启。
+        """
+        if self.stop():
+            return self.start()
+        self._restart_pending = True
+        threading.Thread(target=self._start_after, args=(self.thread,), daemon=True).start()
+        return False
+    
+    def _start_after(self, old_thread):
+        old_thread.join()
+        if self._restart_pending:
+            self._restart_pending = False
+            self.start()
     
     def _is_local_file(self, url):
         """检查URL是否为本地文件路径"""
@@ -362,6 +519,16 @@ class RTSPStreamHandler:
         image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp']
         return any(url.lower().endswith(ext) for ext in image_extensions)
     
+    def _get_authenticated_url(self):
+        """获取带认证信息的RTSP地址"""
+        rtsp_url = self.stream_config['url']
+        if self.stream_config.get('username') and self.stream_config.get('password'):
+            if '://' in rtsp_url:
+                protocol, rest = rtsp_url.split('://', 1)
+                rtsp_url = f"{protocol}://{self.stream_config['username']}:{self.stream_config['password']}@{rest}"
+                print(f"🔐 添加认证信息到RTSP URL")
+        return rtsp_url
+    
     def _connect_rtsp(self):
         """连接RTSP流或本地视频文件"""
         try:
@@ -391,11 +558,7 @@ class RTSPStreamHandler:
                     print(f"🎬 使用本地视频文件作为流源")
             else:
                 # 处理RTSP URL
-                if self.stream_config.get('username') and self.stream_config.get('password'):
-                    if '://' in rtsp_url:
-                        protocol, rest = rtsp_url.split('://', 1)
-                        rtsp_url = f"{protocol}://{self.stream_config['username']}:{self.stream_config['password']}@{rest}"
-                        print(f"🔐 添加认证信息到RTSP URL")
+                rtsp_url = self._get_authenticated_url()
                 
                 print(f"📡 创建VideoCapture对象...")
                 self.cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
@@ -448,6 +611,11 @@ class RTSPStreamHandler:
                     self._process_image_file()
                     return
                 
+                # 采集进程模式
+                if self.stream_config.get('capture_mode') == 'process':
+                    self._process_stream_shared()
+                    return
+                
                 # 尝试连接RTSP流或视频文件
                 if not self._connect_rtsp():
                     self._handle_reconnect()
@@ -455,6 +623,9 @@ class RTSPStreamHandler:
                 
                 print(f"🎥 RTSP流 {self.stream_config['name']} 开始处理帧")
                 
+                # 本地视频文件按文件帧率播放；实时流的 read() 按帧到达速度阻塞，不需要额外等待
+                source_fps = self._file_fps() if self._is_local_file(self.stream_config['url']) else None
+                
                 while self.is_running and self.cap and self.cap.isOpened():
                     ret, frame = self.cap.read()
                     
@@ -470,21 +641,26 @@ class RTSPStreamHandler:
                             print(f"⚠️ RTSP流 {self.stream_config['name']} 读取帧失败")
                             break
                     
+                    read_time = time.perf_counter()
+                    self.scheduler.record_decoded(now=read_time)
+                    frame_index = self.scheduler.decoded_frames
+                    
                     # 更新帧计数和FPS
                     self.frame_count += 1
                     self._update_fps()
                     
-                    # 调整帧大小以提高处理速度
-                    frame = self._resize_frame(frame)
+                    # 更新最新帧（read 每次返回新数组，无需再拷贝）；缩放只在推理前做一次
+                    self.latest_frame = frame
                     
-                    # 更新最新帧
-                    self.latest_frame = frame.copy()
+                    # 检测间隔由调度器按实测推理耗时和解码帧率决定
+                    if self.stream_config.get('detection_enabled', True) and self.scheduler.should_detect(frame_index):
+                        self._run_scheduled_detection(frame, frame_index, read_time)
                     
-                    # 每5帧进行一次检测
-                    if self.frame_count % 5 == 0 and self.stream_config.get('detection_enabled', True):
-                        self._detect_frame(frame)
+                    # 有预览请求时在处理线程中提前编码标注帧
+                    self._produce_encoded_frame()
                     
-                    time.sleep(0.033)
+                    # 处理期间到达的旧帧直接丢弃，下一次读取拿到最新帧
+                    self._drop_stale_frames(time.perf_counter() - read_time, source_fps)
                 
                 # 如果退出循环，说明连接断开
                 if self.is_running:
@@ -503,6 +679,88 @@ class RTSPStreamHandler:
             self.cap.release()
         print(f"🔚 RTSP流 {self.stream_config['name']} 处理线程结束")
     
+    def _process_stream_shared(self):
+        """采集进程模式：独立进程解码并写入共享内存环，本线程只按槽位读取帧"""
+        url = self.stream_config['url']
+        is_local_file = self._is_local_file(url)
+        if is_local_file and not os.path.exists(url):
+            print(f"❌ RTSP流 {self.stream_config['name']} 本地文件不存在: {url}")
+            self.is_running = False
+            return
+        
+        self.capture = CaptureProcess(
+            url if is_local_file else self._get_authenticated_url(),
+            is_local_file=is_local_file,
+            slots=self.stream_config.get('capture_slots', 8),
+            max_height=self.stream_config.get('capture_max_height', 1080),
+            max_width=self.stream_config.get('capture_max_width', 1920),
+            options={
+                'max_reconnect_attempts': self.max_reconnect_attempts,
+                'reconnect_delay': self.reconnect_delay
+            }
+        )
+        self.capture.start()
+        ring = self.capture.ring
+        print(f"🎥 RTSP流 {self.stream_config['name']} 采集进程已启动 (共享内存: {ring.name}, 槽位: {ring.slots})")
+        
+        last_seq = 0
+        try:
+            while self.is_running:
+                latest = ring.latest()
+                if latest is None or latest[0] == last_seq:
+                    if not self.capture.is_alive():
+                        print(f"❌ RTSP流 {self.stream_config['name']} 采集进程已退出 ({self.capture.state_name})")
+                        self.is_running = False
+                        break
+                    time.sleep(0.005)
+                    continue
+                
+                # 拷贝最新帧并校验拷贝期间未被覆盖（推理和绘制期间采集进程会继续写入槽位）
+                snapshot = ring.snapshot()
+                if snapshot is None:
+                    self.ring_overwrites += 1
+                    continue
+                seq, frame = snapshot
+                read_time = time.perf_counter()
+                # 采集进程只保留最新帧，期间跳过的帧计为丢弃
+                if seq > last_seq + 1:
+                    self.scheduler.record_decoded(seq - last_seq - 1, dropped=True, now=read_time)
+                self.scheduler.record_decoded(now=read_time)
+                last_seq = seq
+                
+                self.frame_count = seq
+                self._update_fps()
+                self.latest_frame = frame
+                
+                if self.stream_config.get('detection_enabled', True) and self.scheduler.should_detect(seq):
+                    self._run_scheduled_detection(frame, seq, read_time)
+                
+                self._produce_encoded_frame()
+        finally:
+            self.capture.stop()
+            self.capture = None
+    
+    def _get_frame_for_drawing(self):
+        """
+        获取可在其上绘制的最新帧副本
+
+        帧宽超过 preview_max_width 时直接缩小得到副本（缩放本身即拷贝），
+        标注和JPEG编码都在缩小后的帧上进行。
+
+        Returns:
+            Tuple: (帧副本, 相对原始帧的缩放比例)，没有可用帧时返回 (None, 1.0)
+        """
+        frame = self.latest_frame
+        if frame is None:
+            return None, 1.0
+        max_width = self.stream_config.get('preview_max_width') or 0
+        width = frame.shape[1]
+        if max_width <= 0 or width <= max_width:
+            return frame.copy(), 1.0
+        scale = max_width / width
+        size = (max_width, max(1, int(round(frame.shape[0] * scale))))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+    
     def _process_image_file(self):
         """处理图片文件作为流源"""
         print(f"🖼️ 开始处理图片文件: {self.stream_config['url']}")
@@ -519,16 +777,15 @@ class RTSPStreamHandler:
                 self.frame_count += 1
                 self._update_fps()
                 
-                # 调整帧大小以提高处理速度
-                frame = self._resize_frame(frame)
-                
                 # 更新最新帧
-                self.latest_frame = frame.copy()
+                self.latest_frame = frame
                 
                 # 每次都进行检测（图片文件）
                 if self.stream_config.get('detection_enabled', True):
                     self._detect_frame(frame)
                 
+                self._produce_encoded_frame()
+                
                 # 模拟30FPS的更新频率
                 time.sleep(0.033)
                 
@@ -536,15 +793,68 @@ class RTSPStreamHandler:
                 print(f"❌ 图片文件处理异常: {e}")
                 break
     
-    def _resize_frame(self, frame, max_width=640):
-        """调整帧大小以提高处理速度"""
-        height, width = frame.shape[:2]
-        if width > max_width:
-            ratio = max_width / width
-            new_width = max_width
-            new_height = int(height * ratio)
-            frame = cv2.resize(frame, (new_width, new_height))
-        return frame
+    def _file_fps(self):
+        """本地视频文件的帧率（无效时按25帧）"""
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap is not None else 0
+        return fps if 0 < fps <= 120 else 25.0
+    
+    def _run_scheduled_detection(self, frame, frame_index, read_time):
+        """检测一帧，并把推理耗时和端到端延迟反馈给调度器（画面无变化时跳过推理）"""
+        roi = self._get_roi(frame.shape)
+        gate_input = roi.crop(frame) if roi is not None else frame  # 设置了ROI时只看ROI区域的运动
+        if self.motion_gate is not None and not self.motion_gate.should_infer(gate_input):
+            self.scheduler.record_skip(frame_index)
+            self.motion_gate.record_inference_time(self.scheduler.inference_ms, skipped=True)
+            return
+        self._detect_frame(frame)
+        latency_ms = (time.perf_counter() - read_time) * 1000
+        self.scheduler.record_detection(frame_index, self.last_inference_ms, latency_ms)
+        if self.motion_gate is not None:
+            self.motion_gate.record_inference_time(self.last_inference_ms, skipped=False)
+    
+    def _drop_stale_frames(self, elapsed, source_fps=None):
+        """
+        丢弃处理一帧期间积压的旧帧（grab 只解复用不解码成图像）
+        
+        Args:
+            elapsed: 本帧从读取到处理完成的秒数
+            source_fps: 本地视频文件的帧率；为空表示实时流
+        """
+        stale = self.scheduler.frames_to_drop(elapsed, source_fps)
+        for _ in range(stale):
+            if not self.cap.grab():
+                break
+            self.scheduler.record_decoded(dropped=True)
+        
+        if source_fps:
+            # 本地文件没有实时到达的节奏，按文件帧率等待下一帧
+            remaining = (stale + 1) / source_fps - elapsed
+            if remaining > 0:
+                time.sleep(remaining)
+    
+    def _inference_imgsz(self):
+        """该流的推理输入尺寸"""
+        return normalize_imgsz(self.stream_config.get('imgsz'), DEFAULT_IMGSZ)
+    
+    def _get_letterbox(self, model, frame_shape, imgsz):
+        """获取该流的letterbox参数（分辨率、尺寸和模型输入类型不变时复用）"""
+        auto = supports_rect_input(model)
+        if self._letterbox is None or not self._letterbox.matches(frame_shape, imgsz, auto):
+            self._letterbox = LetterboxTransform(frame_shape[:2], imgsz, auto)
+        return self._letterbox
+    
+    def _get_roi(self, frame_shape):
+        """获取该流的ROI裁剪参数（配置和分辨率不变时复用），未设置ROI时返回 None"""
+        source = self.stream_config.get('roi_polygons')
+        if source != self._roi_source:
+            try:
+                self._roi_polygons = parse_roi_polygons(source)
+            except ValueError as e:
+                print(f"⚠️ 流 {self.stream_config.get('name')} ROI配置无效，使用整帧检测: {e}")
+                self._roi_polygons = []
+            self._roi_source = source
+        self._roi = roi_for_frame(self._roi, self._roi_polygons, frame_shape)
+        return self._roi
     
     def _detect_frame(self, frame):
         """检测单帧"""
@@ -566,27 +876,33 @@ class RTSPStreamHandler:
             model_path = getattr(current_model, 'ckpt_path', '') or str(current_model)
             is_segmentation_model = 'seg' in model_path.lower()
             
+            # 检测模型在这里做唯一一次letterbox（参数按流分辨率缓存），模型内部不再缩放；
+            # 设置了ROI时只对ROI外接矩形推理。分割模型的掩码与输入图像对齐，仍按整帧由模型自行处理
+            imgsz = self._inference_imgsz()
+            roi = None if is_segmentation_model else self._get_roi(frame.shape)
+            region = roi.crop(frame) if roi is not None else frame
+            transform = None if is_segmentation_model else self._get_letterbox(current_model, region.shape, imgsz)
+            model_input = np.ascontiguousarray(transform.apply(region)) if transform is not None else frame
+            
             # YOLO检测/分割
-            results = current_model(frame)
+            inference_start = time.perf_counter()
+            results = self._run_model(current_model, model_input, imgsz)
+            self.last_inference_ms = (time.perf_counter() - inference_start) * 1000
             
             detections = []
             segmentation_result = None
             
             for r in results:
-                # 处理检测框
-                boxes = r.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = box.conf[0].cpu().numpy()
-                        cls = box.cls[0].cpu().numpy()
-                        
-                        if conf > 0.3:
-                            detections.append({
-                                'class': current_model.names[int(cls)],
-                                'confidence': float(conf),
-                                'bbox': [float(x1), float(y1), float(x2), float(y2)]
-                            })
+                # 处理检测框（每帧一次性转移到主机内存）
+                xyxy, conf, cls = boxes_to_arrays(r)
+                if transform is not None:
+                    xyxy = transform.unmap_boxes(xyxy)
+                if roi is not None:
+                    # 映射回整帧坐标，只保留中心点在ROI多边形内的框
+                    xyxy = roi.map_boxes(xyxy)
+                    keep = roi.inside(xyxy)
+                    xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+                detections.extend(build_detections(xyxy, conf, cls, current_model.names, min_confidence=0.3))
                 
                 # 如果是分割模型，处理掩码
                 if is_segmentation_model and hasattr(r, 'masks') and r.masks is not None:
@@ -602,11 +918,11 @@ class RTSPStreamHandler:
                         }
                         
                         # 提取分割数据
-                        if boxes is not None and len(boxes) > 0:
-                            segmentation_result['boxes'] = boxes.xyxy.cpu().numpy().tolist()
-                            segmentation_result['confidences'] = boxes.conf.cpu().numpy().tolist()
-                            segmentation_result['classes'] = boxes.cls.cpu().numpy().tolist()
-                            segmentation_result['class_names'] = [current_model.names[int(cls)] for cls in segmentation_result['classes']]
+                        if len(xyxy) > 0:
+                            segmentation_result['boxes'] = xyxy.tolist()
+                            segmentation_result['confidences'] = conf.tolist()
+                            segmentation_result['classes'] = cls.tolist()
+                            segmentation_result['class_names'] = [current_model.names[class_id] for class_id in segmentation_result['classes']]
                         
                         # 提取掩码数据
                         masks_data = masks.data.cpu().numpy()
@@ -622,24 +938,43 @@ class RTSPStreamHandler:
                 if self.stream_config.get('alert_enabled', False):
                     self.tracker.set_alert_enabled(True)
                 
-                tracking_results = self.tracker.update(detections, height)
+                tracking_results = self.tracker.update(detections, height, width)
                 self.latest_tracking_results = tracking_results
                 
                 if self.stream_config.get('counting_enabled', False):
                     self.latest_counts = self.tracker.get_current_counts()
                 
                 if self.stream_config.get('alert_enabled', False):
-                    new_targets = self.tracker.get_new_targets()
+                    # 闪烁目标以新ID重新出现时按位置和外观去重，并按流/类别限流
+                    new_targets = alert_filter.filter(self._alert_key(), frame, self.tracker.get_new_targets(),
+                                                      live_ids=self.tracker.get_live_track_ids())
                     if new_targets:
                         self.latest_alerts = new_targets
                         print(f"🚨 流 {self.stream_config['name']} 新目标预警: {len(new_targets)} 个")
                     else:
                         self.latest_alerts = []
             
+            self.results_version += 1
+            
         except Exception as e:
             print(f"❌ 检测帧失败: {e}")
             self.latest_detections = []
             self.latest_segmentation_results = None
+            self.results_version += 1
+    
+    def _alert_key(self):
+        """预警去重/限流中标识该流的键"""
+        return f'rtsp:{self._inference_key()}'
+    
+    def _inference_key(self):
+        """共享推理服务中标识该流的键"""
+        return self.stream_id if self.stream_id is not None else id(self)
+    
+    def _run_model(self, model, frame, imgsz=None):
+        """执行推理：优先提交到共享推理服务与其他流合批"""
+        if self.inference_server is None:
+            return model(frame, imgsz=imgsz, verbose=False)
+        return [self.inference_server.infer(self._inference_key(), model, frame, imgsz=imgsz)]
     
     def _save_alert_frames(self, frame, new_targets):
         """保存预警帧"""
@@ -685,46 +1020,142 @@ class RTSPStreamHandler:
         
         if self.reconnect_attempts <= self.max_reconnect_attempts:
             print(f"🔄 RTSP流 {self.stream_config['name']} 第 {self.reconnect_attempts} 次重连，等待 {self.reconnect_delay} 秒...")
-            time.sleep(self.reconnect_delay)
+            if self.motion_gate is not None:
+                self.motion_gate.reset()  # 重连后画面可能已变化，第一帧强制推理
+            self._stop_event.wait(self.reconnect_delay)
         else:
             print(f"❌ RTSP流 {self.stream_config['name']} 重连次数达到上限，停止处理")
             self.is_running = False
     
+    def render_annotated_frame(self):
+        """在最新帧的副本上绘制检测、跟踪、计数和轮询信息"""
+        if self.latest_frame is None:
+            return None
+        
+        # 复制（必要时缩小）原始帧用于绘制，检测和跟踪坐标按同一比例缩放
+        frame_with_detections, scale = self._get_frame_for_drawing()
+        if frame_with_detections is None:
+            return None
+        
+        # 绘制ROI区域
+        if self._roi is not None and self._roi.matches(self._roi_polygons, self.latest_frame.shape):
+            frame_with_detections = self._roi.draw(frame_with_detections, scale=scale)
+        
+        # 如果有分割结果，优先使用分割可视化
+        if (self.latest_segmentation_results and 
+            self.stream_config.get('detection_enabled', True)):
+            frame_with_detections = self._draw_segmentation_results(
+                frame_with_detections, _scale_segmentation(self.latest_segmentation_results, scale)
+            )
+        # 否则使用普通检测框
+        elif (self.latest_detections and 
+              self.stream_config.get('detection_enabled', True)):
+            frame_with_detections = self._draw_detections(
+                frame_with_detections, _scale_items(self.latest_detections, scale, ('bbox',))
+            )
+        
+        # 绘制跟踪结果
+        if self.latest_tracking_results and self.stream_config.get('tracking_enabled', False):
+            frame_with_detections = self._draw_tracking_results(
+                frame_with_detections, _scale_items(self.latest_tracking_results, scale, ('bbox', 'centroid'))
+            )
+        
+        # 绘制计数信息
+        if self.latest_counts and self.stream_config.get('counting_enabled', False):
+            frame_with_detections = self._draw_count_info(frame_with_detections, self.latest_counts)
+        
+        # 绘制模型轮询信息
+        if self.polling_enabled and self.current_model_info:
+            frame_with_detections = self._draw_polling_info(frame_with_detections, self.current_model_info)
+        
+        return frame_with_detections
+    
+    def encode_annotated_frame(self, quality=70):
+        """绘制并编码最新帧为JPEG字节"""
+        frame_with_detections = self.render_annotated_frame()
+        if frame_with_detections is None:
+            return None
+        success, buffer = cv2.imencode('.jpg', frame_with_detections, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if success else None
+    
+    def _frame_cache_key(self, quality):
+        return (self.frame_count, self.results_version, quality)
+    
+    def _encode_into_cache(self, key):
+        """编码标注帧并写入缓存（同一键只编码一次）"""
+        with self._encode_lock:
+            cached = self._encoded_frame
+            if cached is not None and cached[0] == key:
+                return cached
+            jpeg_bytes = self.encode_annotated_frame(quality=key[2])
+            if jpeg_bytes is None:
+                return None
+            self._encoded_frame = (key, jpeg_bytes)
+            return self._encoded_frame
+    
+    def configure_preview(self, fps=None, quality=None):
+        """更新预览帧率和JPEG质量（MJPEG推流、/frame 和处理线程预编码共用）"""
+        if fps:
+            self.stream_config['mjpeg_fps'] = fps
+            self.preview_encode_interval = 1.0 / fps
+        if quality:
+            self.stream_config['mjpeg_quality'] = quality
+            self._preview_quality = quality
+    
+    def get_encoded_frame(self, quality=None):
+        """
+        获取编码后的标注帧
+        
+        帧和检测结果都没有变化时直接返回缓存；缓存通常已由处理线程提前编码，
+        只有缓存过期时才在调用方线程编码。默认使用流的预览质量，所有预览
+        方式共用同一份缓存。
+        
+        Returns:
+            Tuple: (缓存键, JPEG字节)，没有可用帧时返回 None
+        """
+        if self.latest_frame is None:
+            return None
+        
+        self._last_preview_request = time.time()
+        key = self._frame_cache_key(quality or self._preview_quality)
+        cached = self._encoded_frame
+        if cached is not None and cached[0] == key:
+            self.frame_cache_hits += 1
+            return cached
+        
+        self.frame_cache_misses += 1
+        return self._encode_into_cache(key)
+    
+    def _produce_encoded_frame(self):
+        """生产者侧编码：最近有预览请求时，在处理线程中按预览帧率刷新编码缓存"""
+        now = time.time()
+        if now - self._last_preview_request > self.preview_idle_timeout:
+            return
+        if now - self._last_producer_encode < self.preview_encode_interval:
+            return
+        
+        key = self._frame_cache_key(self._preview_quality)
+        cached = self._encoded_frame
+        if cached is not None and cached[0] == key:
+            return
+        
+        self._last_producer_encode = now
+        try:
+            if self._encode_into_cache(key) is not None:
+                self.producer_encodes += 1
+        except Exception as e:
+            print(f"❌ 流 {self.stream_id} 预编码失败: {e}")
+    
     def get_latest_frame_base64(self):
         """获取最新帧的base64编码，包含检测结果"""
         if self.latest_frame is None:
             return None
         
         try:
-            # 复制原始帧用于绘制
-            frame_with_detections = self.latest_frame.copy()
-            
-            # 如果有分割结果，优先使用分割可视化
-            if (self.latest_segmentation_results and 
-                self.stream_config.get('detection_enabled', True)):
-                frame_with_detections = self._draw_segmentation_results(
-                    frame_with_detections, self.latest_segmentation_results
-                )
-            # 否则使用普通检测框
-            elif (self.latest_detections and 
-                  self.stream_config.get('detection_enabled', True)):
-                frame_with_detections = self._draw_detections(frame_with_detections, self.latest_detections)
-            
-            # 绘制跟踪结果
-            if self.latest_tracking_results and self.stream_config.get('tracking_enabled', False):
-                frame_with_detections = self._draw_tracking_results(frame_with_detections, self.latest_tracking_results)
-            
-            # 绘制计数信息
-            if self.latest_counts and self.stream_config.get('counting_enabled', False):
-                frame_with_detections = self._draw_count_info(frame_with_detections, self.latest_counts)
-            
-            # 绘制模型轮询信息
-            if self.polling_enabled and self.current_model_info:
-                frame_with_detections = self._draw_polling_info(frame_with_detections, self.current_model_info)
-            
-            # 编码为JPEG
-            _, buffer = cv2.imencode('.jpg', frame_with_detections, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
+            encoded = self.get_encoded_frame()
+            if encoded is None:
+                return None
+            frame_base64 = base64.b64encode(encoded[1]).decode('utf-8')
             return f"data:image/jpeg;base64,{frame_base64}"
         except Exception as e:
             print(f"❌ 编码帧失败: {e}")
@@ -847,11 +1278,13 @@ class RTSPStreamHandler:
             # 导入分割处理器用于可视化
             from yolo_seg_handler import YOLOSegmentationHandler
             
-            # 创建临时的分割处理器用于可视化
-            temp_handler = YOLOSegmentationHandler()
+            # 分割可视化处理器只创建一次，模型经由注册表共享（不再每帧重新加载）
+            if self._seg_visualizer is None:
+                seg_model = model_registry.acquire('yolov8n-seg.pt', owner=self._model_owner())
+                self._seg_visualizer = YOLOSegmentationHandler('yolov8n-seg.pt', model=seg_model)
             
             # 使用分割处理器的可视化方法
-            frame_with_seg = temp_handler.visualize_segmentation(
+            frame_with_seg = self._seg_visualizer.visualize_segmentation(
                 frame, segmentation_results,
                 show_boxes=True,
                 show_masks=True,
@@ -900,6 +1333,7 @@ class RTSPStreamHandler:
     
     def get_status(self):
         """获取流状态"""
+        scheduler_stats = self.scheduler.get_stats()
         status = {
             'is_running': self.is_running,
             'frame_count': self.frame_count,
@@ -907,9 +1341,45 @@ class RTSPStreamHandler:
             'reconnect_attempts': self.reconnect_attempts,
             'detection_count': len(self.latest_detections),
             'tracking_count': len(self.latest_tracking_results),
-            'alert_count': len(self.latest_alerts)
+            'alert_count': len(self.latest_alerts),
+            'inference_mode': 'shared' if self.inference_server is not None else 'direct',
+            'inference_backend': self.model_backend,
+            'imgsz': self._inference_imgsz(),
+            'detection_stride': scheduler_stats['stride'],
+            'end_to_end_latency_ms': scheduler_stats['end_to_end_latency_ms'],
+            'scheduler': scheduler_stats,
+            'roi': {
+                'polygons': len(self._roi.polygons),
+                'crop': [self._roi.x0, self._roi.y0, self._roi.x1, self._roi.y1],
+                'area_ratio': round(self._roi.area_ratio, 3)
+            } if self._roi is not None else None,
+            'alert_filter': alert_filter.get_stats(self._alert_key()),
+            'motion_gate': self.motion_gate.get_stats() if self.motion_gate is not None else {'enabled': False},
+            'capture_mode': self.stream_config.get('capture_mode', 'thread'),
+            'frame_cache': {
+                'hits': self.frame_cache_hits,
+                'misses': self.frame_cache_misses,
+                'producer_encodes': self.producer_encodes,
+                'hit_rate': round(self.frame_cache_hits / (self.frame_cache_hits + self.frame_cache_misses), 3)
+                            if self.frame_cache_hits + self.frame_cache_misses else 0
+            }
         }
         
+        letterbox = self._letterbox
+        if letterbox is not None:
+            status['letterbox'] = {
+                'source_shape': list(letterbox.src_shape),
+                'input_shape': list(letterbox.output_shape),
+                'ratio': round(letterbox.ratio, 4)
+            }
+        
+        capture = self.capture
+        if capture is not None:
+            status['capture_process_alive'] = capture.is_alive()
+            status['capture_state'] = capture.state_name
+            status['ring_slots'] = capture.ring.slots
+            status['ring_overwrites'] = self.ring_overwrites
+        
         # 添加轮询信息
         if self.polling_enabled:
             status['polling_enabled'] = True
@@ -937,9 +1407,11 @@ class RTSPStreamHandler:
     def reset_tracker(self):
         """重置跟踪器"""
         self.tracker.reset()
+        alert_filter.reset(self._alert_key())
         self.latest_tracking_results = []
         self.latest_counts = {}
         self.latest_alerts = []
+        self.results_version += 1
     
     def update_polling_config(self, polling_config):
         """更新模型轮询配置"""
@@ -974,9 +1446,52 @@ class RTSPStreamHandler:
 class RTSPManager:
     """RTSP流管理器"""
     
-    def __init__(self):
+    def __init__(self, use_inference_server=True):
         self.handlers = {}  # stream_id -> RTSPStreamHandler
-        self.models = {}    # model_path -> YOLO model (模型缓存)
+        # 所有流共用的推理服务（跨流合批）
+        self.inference_server = InferenceServer() if use_inference_server else None
+        self.capture_mode = 'thread'  # 默认采集方式：thread（处理线程内解码）/ process（独立采集进程）
+        self.capture_max_width = 1920  # 采集进程共享内存槽位的最大宽高，更大的帧等比缩小
+        self.capture_max_height = 1080
+        self.broadcasters = {}  # stream_id -> MJPEGBroadcaster
+        self.mjpeg_fps = 15
+        self.mjpeg_quality = 70
+        self.preview_max_width = 1280  # 预览帧（MJPEG、/frame）标注和编码前缩小到的最大宽度，0 表示不缩小
+        self.default_imgsz = DEFAULT_IMGSZ  # 未单独配置 imgsz 的流使用的推理尺寸
+        self.target_latency_ms = 500  # 自适应检测间隔的目标检测延迟
+        self.max_detection_stride = 30  # 自适应检测间隔上限（帧）
+        self.motion_defaults = {}  # 运动预过滤默认参数（motion_gate / motion_method / ...）
+    
+    def init_app(self, app):
+        """从Flask配置读取共享推理、采集和MJPEG参数"""
+        self.capture_mode = app.config.get('RTSP_CAPTURE_MODE', self.capture_mode)
+        self.capture_max_width = app.config.get('RTSP_CAPTURE_MAX_WIDTH', self.capture_max_width)
+        self.capture_max_height = app.config.get('RTSP_CAPTURE_MAX_HEIGHT', self.capture_max_height)
+        self.mjpeg_fps = app.config.get('RTSP_MJPEG_FPS', self.mjpeg_fps)
+        self.mjpeg_quality = app.config.get('RTSP_MJPEG_QUALITY', self.mjpeg_quality)
+        self.preview_max_width = app.config.get('RTSP_PREVIEW_MAX_WIDTH', self.preview_max_width)
+        self.default_imgsz = app.config.get('RTSP_DEFAULT_IMGSZ', self.default_imgsz)
+        self.target_latency_ms = app.config.get('RTSP_TARGET_LATENCY_MS', self.target_latency_ms)
+        self.max_detection_stride = app.config.get('RTSP_MAX_DETECTION_STRIDE', self.max_detection_stride)
+        self.motion_defaults = {
+            'motion_gate': app.config.get('RTSP_MOTION_GATE', True),
+            'motion_method': app.config.get('RTSP_MOTION_METHOD', 'diff'),
+            'motion_pixel_threshold': app.config.get('RTSP_MOTION_PIXEL_THRESHOLD', 25),
+            'motion_min_area': app.config.get('RTSP_MOTION_MIN_AREA', 0.002),
+            'motion_refresh_seconds': app.config.get('RTSP_MOTION_REFRESH_SECONDS', 5.0)
+        }
+        if not app.config.get('RTSP_SHARED_INFERENCE', True):
+            self.inference_server = None
+        elif self.inference_server is not None:
+            self.inference_server.init_app(app)
+    
+    def get_inference_stats(self):
+        """获取共享推理服务的批处理统计"""
+        if self.inference_server is None:
+            return {'enabled': False}
+        stats = self.inference_server.get_stats()
+        stats['enabled'] = True
+        return stats
     
     def add_stream(self, stream_config):
         """添加RTSP流"""
@@ -985,29 +1500,44 @@ class RTSPManager:
         if stream_id in self.handlers:
             self.remove_stream(stream_id)
         
+        self._apply_defaults(stream_config)
         handler = RTSPStreamHandler(stream_config)
+        handler.inference_server = self.inference_server
         
         # 如果没有启用轮询，使用传统的单模型加载方式
         if not stream_config.get('polling_enabled', False):
             model_path = stream_config.get('model_path', 'yolov8n.pt')
-            if model_path not in self.models:
-                try:
-                    self.models[model_path] = YOLO(model_path)
-                    print(f"✅ 加载模型: {model_path}")
-                except Exception as e:
-                    print(f"❌ 加载模型失败: {model_path}, {e}")
-                    return False
-            
-            handler.model = self.models[model_path]
+            # 模型由全局注册表按路径去重，多个流共享同一实例
+            if not handler.load_model(model_path):
+                return False
         
         self.handlers[stream_id] = handler
         return True
     
+    def _apply_defaults(self, stream_config):
+        """未按流设置的运行参数使用全局默认值"""
+        stream_config.setdefault('capture_mode', self.capture_mode)
+        stream_config.setdefault('capture_max_width', self.capture_max_width)
+        stream_config.setdefault('capture_max_height', self.capture_max_height)
+        stream_config.setdefault('mjpeg_fps', self.mjpeg_fps)
+        stream_config.setdefault('mjpeg_quality', self.mjpeg_quality)
+        stream_config.setdefault('preview_max_width', self.preview_max_width)
+        stream_config['imgsz'] = stream_config.get('imgsz') or self.default_imgsz
+        stream_config.setdefault('target_latency_ms', self.target_latency_ms)
+        stream_config.setdefault('max_detection_stride', self.max_detection_stride)
+        for key, value in self.motion_defaults.items():
+            stream_config.setdefault(key, value)
+        return stream_config
+    
     def remove_stream(self, stream_id):
         """移除RTSP流"""
         if stream_id in self.handlers:
             self.handlers[stream_id].stop()
+            self.handlers[stream_id].release_model()
             del self.handlers[stream_id]
+            broadcaster = self.broadcasters.pop(stream_id, None)
+            if broadcaster is not None:
+                broadcaster.stop()
             # 清理轮询器
             polling_manager.remove_polling(stream_id)
             print(f"🗑️ 移除RTSP流: {stream_id}")
@@ -1055,10 +1585,34 @@ class RTSPManager:
             print(f"❌ 流 {stream_id} 不存在，当前流: {list(self.handlers.keys())}")
             return None
     
+    def get_mjpeg_broadcaster(self, stream_id):
+        """获取（或创建）指定流的MJPEG广播器"""
+        handler = self.handlers.get(stream_id)
+        if handler is None:
+            return None
+        
+        broadcaster = self.broadcasters.get(stream_id)
+        if broadcaster is None:
+            broadcaster = MJPEGBroadcaster(
+                stream_id, handler,
+                fps=handler.stream_config['mjpeg_fps'],
+                quality=handler.stream_config['mjpeg_quality']
+            )
+            self.broadcasters[stream_id] = broadcaster
+        else:
+            # 流被重新添加后广播器指向新的处理器，并沿用已调整的帧率和质量
+            broadcaster.handler = handler
+            handler.configure_preview(fps=broadcaster.fps, quality=broadcaster.quality)
+        return broadcaster
+    
     def get_stream_status(self, stream_id):
         """获取指定流的状态"""
         if stream_id in self.handlers:
-            return self.handlers[stream_id].get_status()
+            status = self.handlers[stream_id].get_status()
+            broadcaster = self.broadcasters.get(stream_id)
+            if broadcaster is not None:
+                status['mjpeg'] = broadcaster.get_stats()
+            return status
         return None
     
     def get_all_streams_status(self):
@@ -1078,7 +1632,19 @@ class RTSPManager:
         """更新流配置"""
         if stream_id in self.handlers:
             handler = self.handlers[stream_id]
+            # 未设置（或被清除）的按流参数恢复全局默认值
+            new_config = self._apply_defaults(dict(new_config))
+            changed = {key for key in STREAM_OPTION_TYPES if handler.stream_config.get(key) != new_config.get(key)}
+            for key in changed - new_config.keys():
+                handler.stream_config.pop(key, None)
             handler.stream_config.update(new_config)
+            handler.scheduler.configure(new_config.get('target_latency_ms'), new_config.get('max_detection_stride'))
+            handler.apply_stream_options(changed)
+            broadcaster = self.broadcasters.get(stream_id)
+            if broadcaster is not None and changed & {'mjpeg_fps', 'mjpeg_quality'}:
+                broadcaster.configure(fps=new_config['mjpeg_fps'], quality=new_config['mjpeg_quality'])
+            if changed & RESTART_OPTIONS and handler.is_running:
+                handler.restart()
             
             # 更新轮询配置
             if 'polling_enabled' in new_config:
@@ -1094,14 +1660,12 @@ class RTSPManager:
             # 如果没有启用轮询且模型路径变了，需要重新加载模型
             if not new_config.get('polling_enabled', False):
                 model_path = new_config.get('model_path')
-                if model_path and model_path != handler.model:
-                    if model_path not in self.models:
-                        try:
-                            self.models[model_path] = YOLO(model_path)
-                        except Exception as e:
-                            print(f"❌ 更新模型失败: {model_path}, {e}")
+                if model_path:
+                    # 模型路径或推理后端变化时重新获取模型
+                    backend = model_registry.resolve_backend(model_path, handler.stream_config.get('inference_backend'))
+                    if model_path != handler.model_path or backend != handler.model_backend:
+                        if not handler.load_model(model_path):
                             return False
-                    handler.model = self.models[model_path]
             
             return True
         return False
@@ -1116,8 +1680,14 @@ class RTSPManager:
     def cleanup(self):
         """清理所有资源"""
         self.stop_all_streams()
+        for broadcaster in self.broadcasters.values():
+            broadcaster.stop()
+        self.broadcasters.clear()
+        for handler in self.handlers.values():
+            handler.release_model()
         self.handlers.clear()
-        self.models.clear()
+        if self.inference_server is not None:
+            self.inference_server.stop()
         polling_manager.cleanup()
 
 
@@ -0,0 +1,210 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .detection_results import boxes_to_arrays, box_iou
+
+MERGE_METRICS = ('iou', 'ios')
+MASK_MAX_SIDE = 1280  # 合并后掩码的最大边长（可视化时再放大到原图尺寸）
+
+
+def make_tiles(height: int, width: int, tile_size: int = 640, overlap: float = 0.2) -> np.ndarray:
+    """
+    生成覆盖整幅图像的重叠切片
+
+    相邻切片按 tile_size × overlap 重叠，最后一行/列贴齐图像边缘；
+    图像某一边不超过 tile_size 时该方向只有一片。
+
+    Returns:
+        (K,4) int 数组，每行为切片的 [x0, y0, x1, y1]
+    """
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+    return np.array([
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ], dtype=np.int64)
+
+
+def merge_detections(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray,
+                     threshold: float = 0.5, metric: str = 'ios', merge_boxes: bool = True):
+    """
+    跨切片合并检测结果（按类别的贪心NMS，重叠度矩阵一次性向量化计算）
+
+    同一目标在相邻切片的重叠区域会被检测多次，且切片边缘的框只覆盖目标的
+    一部分。按置信度从高到低保留框，与其同类别、重叠度超过阈值的低分框被
+    合并；merge_boxes 为 True 时保留框扩展为组内所有框的并集，被切断的目标
+    恢复为完整的框。循环只遍历确实压制了其他框的行，大部分框无需逐个处理。
+
+    Returns:
+        Tuple: (保留框的下标 (M,), 合并后的框 (M,4), 每个保留框合并的原始下标列表)
+    """
+    if len(xyxy) == 0:
+        return np.zeros(0, dtype=np.int64), xyxy, []
+
+    order = np.argsort(-conf, kind='stable')
+    boxes = xyxy[order]
+    overlap = box_iou(boxes, boxes, metric)
+    # 只有排在前面（置信度更高）的同类别框可以压制后面的框
+    suppress = np.triu((overlap > threshold) & (cls[order][:, None] == cls[order][None, :]), k=1)
+
+    keep = np.ones(len(order), dtype=bool)
+    merged = boxes.copy()
+    groups = {i: [i] for i in range(len(order))}
+    for i in np.flatnonzero(suppress.any(axis=1)):
+        if not keep[i]:
+            continue
+        members = np.flatnonzero(suppress[i] & keep)
+        if len(members) == 0:
+            continue
+        keep[members] = False
+        groups[i].extend(members.tolist())
+        if merge_boxes:
+            merged[i, :2] = np.minimum(merged[i, :2], boxes[members, :2].min(axis=0))
+            merged[i, 2:4] = np.maximum(merged[i, 2:4], boxes[members, 2:4].max(axis=0))
+
+    kept = np.flatnonzero(keep)
+    return order[kept], merged[kept], [order[groups[i]] for i in kept]
+
+
+def _rasterize_masks(segment_groups: List[List[np.ndarray]], image_shape) -> np.ndarray:
+    """把每个目标（可能来自多个切片）的多边形绘制为一张缩小后的掩码"""
+    height, width = image_shape[:2]
+    scale = min(1.0, MASK_MAX_SIDE / max(height, width))
+    mask_shape = (max(1, int(round(height * scale))), max(1, int(round(width * scale))))
+    masks = np.zeros((len(segment_groups), *mask_shape), dtype=np.uint8)
+    for mask, polygons in zip(masks, segment_groups):
+        polygons = [np.round(polygon * scale).astype(np.int32) for polygon in polygons if len(polygon) >= 3]
+        if polygons:
+            cv2.fillPoly(mask, polygons, 1)
+    return masks
+
+
+def tiled_predict(model, image: np.ndarray, tile_size: int = 640, overlap: float = 0.2,
+                  conf: float = 0.25, iou: float = 0.45, include_full: bool = True,
+                  merge_threshold: float = 0.5, merge_metric: str = 'ios',
+                  segmentation: bool = False, max_tiles: int = 64) -> Dict[str, Any]:
+    """
+    切片推理：把图像切成重叠的 tile_size 切片，所有切片作为一个批次推理后合并
+
+    每个切片以原始分辨率送入模型（imgsz=tile_size），小目标不会因为整图
+    缩放而消失；include_full 为 True 时整图缩放后也加入同一批次，用于检出
+    跨越多个切片的大目标。
+
+    Args:
+        model: 检测或分割模型（ultralytics YOLO 或推理后端模型）
+        image: BGR 图像
+        segmentation: 是否为分割模型（合并后的掩码由各切片的多边形重新绘制）
+        max_tiles: 切片数量上限，超出时抛出 ValueError
+
+    Returns:
+        dict: xyxy/conf/cls 数组、分割时的 masks/segments、切片数量和耗时统计
+    """
+    if merge_metric not in MERGE_METRICS:
+        raise ValueError(f'不支持的合并方式: {merge_metric}')
+
+    total_start = time.perf_counter()
+    height, width = image.shape[:2]
+    tiles = make_tiles(height, width, tile_size, overlap)
+    if len(tiles) > max_tiles:
+        raise ValueError(f'切片数量 {len(tiles)} 超过上限 {max_tiles}，请增大 tile_size 或减小 overlap')
+
+    inputs = [np.ascontiguousarray(image[y0:y1, x0:x1]) for x0, y0, x1, y1 in tiles]
+    offsets = [(x0, y0) for x0, y0, _, _ in tiles]
+    if include_full and len(tiles) > 1:
+        inputs.append(image)
+        offsets.append((0, 0))
+
+    inference_start = time.perf_counter()
+    results = model(inputs, imgsz=tile_size, conf=conf, iou=iou, verbose=False)
+    inference_ms = (time.perf_counter() - inference_start) * 1000
+
+    merge_start = time.perf_counter()
+    all_xyxy, all_conf, all_cls, all_segments = [], [], [], []
+    for result, (dx, dy) in zip(results, offsets):
+        xyxy, scores, classes = boxes_to_arrays(result)
+        all_xyxy.append(xyxy + np.array([dx, dy, dx, dy], dtype=np.float32))
+        all_conf.append(scores)
+        all_cls.append(classes)
+        if segmentation:
+            masks = getattr(result, 'masks', None)
+            polygons = list(masks.xy) if masks is not None and masks.xy is not None else []
+            polygons += [np.zeros((0, 2), dtype=np.float32)] * (len(xyxy) - len(polygons))
+            all_segments.extend(np.asarray(polygon, dtype=np.float32) + (dx, dy) for polygon in polygons)
+
+    xyxy, scores, classes = np.concatenate(all_xyxy), np.concatenate(all_conf), np.concatenate(all_cls)
+    raw_count = len(xyxy)
+    keep, merged, groups = merge_detections(xyxy, scores, classes, merge_threshold, merge_metric)
+    merged = np.clip(merged, 0, [width, height, width, height]).astype(np.float32)
+
+    output = {
+        'xyxy': merged,
+        'conf': scores[keep],
+        'cls': classes[keep],
+        'masks': None,
+        'segments': None
+    }
+    if segmentation:
+        segment_groups = [[all_segments[j] for j in group] for group in groups]
+        output['masks'] = _rasterize_masks(segment_groups, image.shape)
+        output['segments'] = [all_segments[i].tolist() for i in keep]
+    merge_ms = (time.perf_counter() - merge_start) * 1000
+
+    output['tiling'] = {
+        'tile_size': tile_size,
+        'overlap': overlap,
+        'tiles': len(tiles),
+        'batch_size': len(inputs),
+        'include_full': len(inputs) > len(tiles),
+        'raw_detections': raw_count,
+        'merged_detections': len(keep),
+        'merge_metric': merge_metric,
+        'merge_threshold': merge_threshold,
+        'timing': {
+            'inference_ms': round(inference_ms, 2),
+            'merge_ms': round(merge_ms, 2),
+            'total_ms': round((time.perf_counter() - total_start) * 1000, 2)
+        }
+    }
+    return output
+
+
+def single_shot_predict(model, image: np.ndarray, imgsz: Optional[int] = None,
+                        conf: float = 0.25, iou: float = 0.45) -> Dict[str, Any]:
+    """整图一次推理（模型内部缩放到 imgsz），用于与切片推理对比耗时和检出数量"""
+    start_time = time.perf_counter()
+    result = model(image, imgsz=imgsz, conf=conf, iou=iou, verbose=False)[0]
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    xyxy, _, _ = boxes_to_arrays(result)
+    return {'imgsz': imgsz, 'detections': len(xyxy), 'total_ms': round(elapsed_ms, 2)}
+
+
+def compare_timing(tiled: Dict[str, Any], single: Dict[str, Any]) -> Dict[str, Any]:
+    """汇总切片推理相对整图推理的耗时倍数和检出数量差异"""
+    tiled_ms = tiled['timing']['total_ms']
+    return {
+        'single_shot': single,
+        'tiled_total_ms': tiled_ms,
+        'slowdown': round(tiled_ms / single['total_ms'], 2) if single['total_ms'] > 0 else None,
+        'extra_detections': tiled['merged_detections'] - single['detections']
+    }
+
+
+def to_segmentation_result(output: Dict[str, Any], names) -> Dict[str, Any]:
+    """把切片分割结果转换为 YOLOSegmentationHandler 的结果格式（可直接用于可视化）"""
+    classes = output['cls'].tolist()
+    return {
+        'boxes': output['xyxy'].tolist(),
+        'masks': output['masks'] if output['masks'] is not None else [],
+        'segments': output['segments'] or [],
+        'confidences': output['conf'].tolist(),
+        'classes': classes,
+        'class_names': [names[class_id] for class_id in classes]
+    }
@@ -0,0 +1,133 @@
+import numpy as np
+from typing import List, Tuple
+
+try:
+    import lap
+except ImportError:  # lap 未安装时退回贪心匹配
+    lap = None
+
+# 支持的匹配方式和距离度量
+MATCH_METHODS = ('hungarian', 'greedy')
+MATCH_METRICS = ('centroid', 'iou')
+
+
+def box_centroids(boxes: np.ndarray) -> np.ndarray:
+    """计算边界框中心点 (N,4) -> (N,2)"""
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def centroid_distance_matrix(track_boxes: np.ndarray, detection_boxes: np.ndarray) -> np.ndarray:
+    """计算轨迹与检测框中心点之间的欧几里得距离矩阵 (T,D)"""
+    track_centroids = box_centroids(track_boxes)
+    detection_centroids = box_centroids(detection_boxes)
+    diff = track_centroids[:, None, :] - detection_centroids[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=2))
+
+
+def iou_matrix(track_boxes: np.ndarray, detection_boxes: np.ndarray) -> np.ndarray:
+    """计算轨迹与检测框之间的IoU矩阵 (T,D)"""
+    x1 = np.maximum(track_boxes[:, None, 0], detection_boxes[None, :, 0])
+    y1 = np.maximum(track_boxes[:, None, 1], detection_boxes[None, :, 1])
+    x2 = np.minimum(track_boxes[:, None, 2], detection_boxes[None, :, 2])
+    y2 = np.minimum(track_boxes[:, None, 3], detection_boxes[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    track_area = (track_boxes[:, 2] - track_boxes[:, 0]) * (track_boxes[:, 3] - track_boxes[:, 1])
+    detection_area = (detection_boxes[:, 2] - detection_boxes[:, 0]) * (detection_boxes[:, 3] - detection_boxes[:, 1])
+    union = track_area[:, None] + detection_area[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def build_cost_matrix(track_boxes: np.ndarray, detection_boxes: np.ndarray, metric: str = 'centroid',
+                      max_distance: float = 80, min_iou: float = 0.3) -> Tuple[np.ndarray, float]:
+    """
+    构建匹配代价矩阵
+
+    Args:
+        track_boxes: 轨迹边界框 (T,4)
+        detection_boxes: 检测边界框 (D,4)
+        metric: 'centroid'（中心点距离）或 'iou'（1 - IoU）
+        max_distance: 中心点距离阈值
+        min_iou: IoU阈值
+
+    Returns:
+        Tuple: (代价矩阵 (T,D), 代价上限，代价小于上限的配对才允许匹配)
+    """
+    if metric == 'iou':
+        return 1.0 - iou_matrix(track_boxes, detection_boxes), 1.0 - min_iou
+    if metric == 'centroid':
+        return centroid_distance_matrix(track_boxes, detection_boxes), float(max_distance)
+    raise ValueError(f"不支持的匹配度量: {metric}")
+
+
+def greedy_assignment(cost: np.ndarray, cost_limit: float) -> List[Tuple[int, int]]:
+    """贪心匹配：按代价从小到大依次匹配未使用的轨迹和检测"""
+    track_indices, detection_indices = np.nonzero(cost < cost_limit)
+    if len(track_indices) == 0:
+        return []
+
+    # 稳定排序，代价相同时保持行优先顺序
+    order = np.argsort(cost[track_indices, detection_indices], kind='stable')
+
+    matches = []
+    used_tracks = set()
+    used_detections = set()
+    for track_idx, detection_idx in zip(track_indices[order].tolist(), detection_indices[order].tolist()):
+        if track_idx not in used_tracks and detection_idx not in used_detections:
+            matches.append((track_idx, detection_idx))
+            used_tracks.add(track_idx)
+            used_detections.add(detection_idx)
+    return matches
+
+
+def hungarian_assignment(cost: np.ndarray, cost_limit: float) -> List[Tuple[int, int]]:
+    """最优匹配（lap.lapjv），代价不小于上限的配对不参与匹配"""
+    if lap is None:
+        return greedy_assignment(cost, cost_limit)
+
+    _, track_to_detection, _ = lap.lapjv(cost, extend_cost=True, cost_limit=cost_limit)
+    return [
+        (track_idx, int(detection_idx))
+        for track_idx, detection_idx in enumerate(track_to_detection)
+        if detection_idx >= 0 and cost[track_idx, detection_idx] < cost_limit
+    ]
+
+
+def associate(track_boxes, detection_boxes, metric: str = 'centroid', method: str = 'hungarian',
+              max_distance: float = 80, min_iou: float = 0.3):
+    """
+    将检测框关联到已有轨迹
+
+    Args:
+        track_boxes: 轨迹边界框 (T,4)
+        detection_boxes: 检测边界框 (D,4)
+        metric: 'centroid' 或 'iou'
+        method: 'hungarian'（最优匹配）或 'greedy'（贪心匹配）
+        max_distance: 中心点距离阈值
+        min_iou: IoU阈值
+
+    Returns:
+        Tuple: (matches [(track_idx, detection_idx)], 未匹配轨迹索引列表, 未匹配检测索引列表)
+    """
+    if method not in MATCH_METHODS:
+        raise ValueError(f"不支持的匹配方式: {method}")
+
+    track_boxes = np.asarray(track_boxes, dtype=np.float64).reshape(-1, 4)
+    detection_boxes = np.asarray(detection_boxes, dtype=np.float64).reshape(-1, 4)
+    num_tracks, num_detections = len(track_boxes), len(detection_boxes)
+
+    if num_tracks == 0 or num_detections == 0:
+        return [], list(range(num_tracks)), list(range(num_detections))
+
+    cost, cost_limit = build_cost_matrix(track_boxes, detection_boxes, metric, max_distance, min_iou)
+
+    if method == 'hungarian':
+        matches = hungarian_assignment(cost, cost_limit)
+    else:
+        matches = greedy_assignment(cost, cost_limit)
+
+    matched_tracks = {track_idx for track_idx, _ in matches}
+    matched_detections = {detection_idx for _, detection_idx in matches}
+    unmatched_tracks = [i for i in range(num_tracks) if i not in matched_tracks]
+    unmatched_detections = [j for j in range(num_detections) if j not in matched_detections]
+    return matches, unmatched_tracks, unmatched_detections
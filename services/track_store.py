@@ -0,0 +1,240 @@
+import numpy as np
+from typing import Any, Dict, List, Sequence
+
+
+class TrackStore:
+    """
+    列式（struct-of-arrays）轨迹存储
+
+    所有轨迹字段保存在预分配的NumPy列中，活跃轨迹始终紧凑排列在前 size 行，
+    行顺序即轨迹创建顺序。新增、更新、老化和清理都按批量行索引向量化执行，
+    当前屏幕计数和累积计数随这些操作增量维护，查询时无需遍历轨迹。
+    """
+
+    def __init__(self, history_size: int = 10, initial_capacity: int = 64):
+        self.history_size = history_size
+        self._capacity = 0
+        self._num_classes = 0
+        self._allocate(initial_capacity)
+        self.reset()
+
+    def _allocate(self, capacity: int):
+        """分配（或扩容）列存储，保留已有数据"""
+        size = getattr(self, 'size', 0)
+
+        def grow(old, shape, dtype):
+            new = np.zeros(shape, dtype=dtype)
+            if old is not None and size:
+                new[:size] = old[:size]
+            return new
+
+        self.ids = grow(getattr(self, 'ids', None), (capacity,), np.int64)
+        self.bboxes = grow(getattr(self, 'bboxes', None), (capacity, 4), np.float64)
+        self.centroids = grow(getattr(self, 'centroids', None), (capacity, 2), np.float64)
+        self.class_ids = grow(getattr(self, 'class_ids', None), (capacity,), np.int32)
+        self.confidences = grow(getattr(self, 'confidences', None), (capacity,), np.float64)
+        self.disappeared = grow(getattr(self, 'disappeared', None), (capacity,), np.int32)
+        self.history = grow(getattr(self, 'history', None), (capacity, self.history_size, 2), np.float64)
+        self.history_len = grow(getattr(self, 'history_len', None), (capacity,), np.int32)
+        self.history_head = grow(getattr(self, 'history_head', None), (capacity,), np.int32)
+        # 每条轨迹出现过的类别（用于按类别累积计数去重）
+        self.seen_classes = grow(getattr(self, 'seen_classes', None), (capacity, self._num_classes), bool)
+        self._capacity = capacity
+
+    def _ensure_capacity(self, required: int):
+        """容量不足时按倍数扩容"""
+        if required <= self._capacity:
+            return
+        capacity = max(self._capacity, 1)
+        while capacity < required:
+            capacity *= 2
+        self._allocate(capacity)
+
+    def reset(self):
+        """清空所有轨迹和计数"""
+        self.size = 0
+        self.next_id = 1
+        self.class_names: List[str] = []
+        self._class_index: Dict[str, int] = {}
+        self._num_classes = 0
+        self.seen_classes = np.zeros((self._capacity, 0), dtype=bool)
+        self.visible_counts = np.zeros(0, dtype=np.int64)  # 当前屏幕内（disappeared == 0）各类别数量
+        self.cumulative_counts = np.zeros(0, dtype=np.int64)  # 各类别累计出现过的不同ID数量
+        self.total_unique_ids = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """列存储占用的内存字节数"""
+        return sum(column.nbytes for column in (
+            self.ids, self.bboxes, self.centroids, self.class_ids, self.confidences, self.disappeared,
+            self.history, self.history_len, self.history_head, self.seen_classes
+        ))
+
+    def class_ids_for(self, class_names: Sequence[str]) -> np.ndarray:
+        """将类别名称映射为类别ID，新类别自动登记"""
+        ids = np.empty(len(class_names), dtype=np.int32)
+        for i, name in enumerate(class_names):
+            class_id = self._class_index.get(name)
+            if class_id is None:
+                class_id = self._register_class(name)
+            ids[i] = class_id
+        return ids
+
+    def _register_class(self, name: str) -> int:
+        class_id = self._num_classes
+        self._class_index[name] = class_id
+        self.class_names.append(name)
+        self._num_classes += 1
+        self.visible_counts = np.append(self.visible_counts, 0)
+        self.cumulative_counts = np.append(self.cumulative_counts, 0)
+        self.seen_classes = np.concatenate(
+            [self.seen_classes, np.zeros((self._capacity, 1), dtype=bool)], axis=1
+        )
+        return class_id
+
+    def _bincount(self, class_ids: np.ndarray) -> np.ndarray:
+        return np.bincount(class_ids, minlength=self._num_classes)
+
+    def live_bboxes(self) -> np.ndarray:
+        """活跃轨迹的边界框视图 (size,4)，行号即轨迹索引"""
+        return self.bboxes[:self.size]
+
+    def live_ids(self) -> np.ndarray:
+        """尚未移除的轨迹ID（包括暂时消失的轨迹）"""
+        return self.ids[:self.size]
+
+    def add(self, bboxes: np.ndarray, class_names: Sequence[str], confidences: np.ndarray) -> np.ndarray:
+        """批量新增轨迹，返回新轨迹所在行"""
+        count = len(bboxes)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        class_ids = self.class_ids_for(class_names)
+        self._ensure_capacity(self.size + count)
+        rows = np.arange(self.size, self.size + count)
+        centroids = (bboxes[:, :2] + bboxes[:, 2:]) / 2
+
+        self.ids[rows] = np.arange(self.next_id, self.next_id + count)
+        self.bboxes[rows] = bboxes
+        self.centroids[rows] = centroids
+        self.class_ids[rows] = class_ids
+        self.confidences[rows] = confidences
+        self.disappeared[rows] = 0
+        self.history[rows, 0] = centroids
+        self.history_len[rows] = 1
+        self.history_head[rows] = 1 % self.history_size
+        self.seen_classes[rows] = False
+        self.seen_classes[rows, class_ids] = True
+
+        new_counts = self._bincount(class_ids)
+        self.visible_counts += new_counts
+        self.cumulative_counts += new_counts
+        self.total_unique_ids += count
+        self.next_id += count
+        self.size += count
+        return rows
+
+    def update(self, rows: np.ndarray, bboxes: np.ndarray, class_names: Sequence[str], confidences: np.ndarray):
+        """批量更新匹配成功的轨迹（消失计数清零并追加轨迹历史）"""
+        if len(rows) == 0:
+            return
+
+        class_ids = self.class_ids_for(class_names)
+        was_visible = self.disappeared[rows] == 0
+        self.visible_counts -= self._bincount(self.class_ids[rows][was_visible])
+        self.visible_counts += self._bincount(class_ids)
+
+        # 类别发生变化时该ID计入新类别的累积计数
+        first_seen = ~self.seen_classes[rows, class_ids]
+        self.cumulative_counts += self._bincount(class_ids[first_seen])
+        self.seen_classes[rows, class_ids] = True
+
+        centroids = (bboxes[:, :2] + bboxes[:, 2:]) / 2
+        self.bboxes[rows] = bboxes
+        self.centroids[rows] = centroids
+        self.class_ids[rows] = class_ids
+        self.confidences[rows] = confidences
+        self.disappeared[rows] = 0
+
+        heads = self.history_head[rows]
+        self.history[rows, heads] = centroids
+        self.history_head[rows] = (heads + 1) % self.history_size
+        self.history_len[rows] = np.minimum(self.history_len[rows] + 1, self.history_size)
+
+    def age(self, rows=None):
+        """批量增加轨迹的消失计数（rows 为空时作用于全部轨迹）"""
+        if rows is None:
+            rows = slice(0, self.size)
+        elif len(rows) == 0:
+            return
+
+        disappeared = self.disappeared[rows]
+        self.visible_counts -= self._bincount(self.class_ids[rows][disappeared == 0])
+        self.disappeared[rows] = disappeared + 1
+
+    def remove_stale(self, max_disappeared: int) -> int:
+        """移除消失帧数超过阈值的轨迹并压缩存储，返回移除数量"""
+        keep = self.disappeared[:self.size] <= max_disappeared
+        if keep.all():
+            return 0
+
+        removed = ~keep
+        self.visible_counts -= self._bincount(self.class_ids[:self.size][removed & (self.disappeared[:self.size] == 0)])
+
+        kept_rows = np.nonzero(keep)[0]
+        new_size = len(kept_rows)
+        for column in (self.ids, self.bboxes, self.centroids, self.class_ids, self.confidences,
+                       self.disappeared, self.history, self.history_len, self.history_head, self.seen_classes):
+            column[:new_size] = column[kept_rows]
+
+        removed_count = self.size - new_size
+        self.size = new_size
+        return removed_count
+
+    def visible_rows(self) -> np.ndarray:
+        """当前帧可见（disappeared == 0）的轨迹行"""
+        return np.nonzero(self.disappeared[:self.size] == 0)[0]
+
+    def rows_to_dicts(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """将指定行转换为轨迹字典列表"""
+        class_names = self.class_names
+        return [
+            {
+                'id': track_id,
+                'bbox': bbox,
+                'class': class_names[class_id],
+                'confidence': confidence,
+                'centroid': tuple(centroid)
+            }
+            for track_id, bbox, class_id, confidence, centroid in zip(
+                self.ids[rows].tolist(), self.bboxes[rows].tolist(), self.class_ids[rows].tolist(),
+                self.confidences[rows].tolist(), self.centroids[rows].tolist()
+            )
+        ]
+
+    def get_history(self, track_id: int) -> List[tuple]:
+        """获取轨迹的中心点历史（按时间顺序）"""
+        rows = np.nonzero(self.ids[:self.size] == track_id)[0]
+        if len(rows) == 0:
+            return []
+        row = rows[0]
+        length = self.history_len[row]
+        order = (self.history_head[row] - length + np.arange(length)) % self.history_size
+        return [tuple(point) for point in self.history[row, order].tolist()]
+
+    def current_counts(self) -> Dict[str, int]:
+        """当前屏幕内各类别数量"""
+        return {
+            self.class_names[class_id]: count
+            for class_id, count in enumerate(self.visible_counts.tolist()) if count > 0
+        }
+
+    def cumulative_counts_by_class(self) -> Dict[str, int]:
+        """各类别累积出现过的不同ID数量"""
+        return {
+            self.class_names[class_id]: count
+            for class_id, count in enumerate(self.cumulative_counts.tolist()) if count > 0
+        }
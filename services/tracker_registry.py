@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable
+
+
+class _TrackerSession:
+    __slots__ = ('tracker', 'lock', 'created_at', 'last_access')
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.created_at = time.time()
+        self.last_access = self.created_at
+
+
+class TrackerRegistry:
+    """会话级跟踪器注册表
+
+    每个客户端会话拥有独立的 ObjectTracker，互不干扰。会话按最近使用
+    顺序保存，超过 TTL 未访问、会话数超过上限或跟踪器总内存超过上限时，
+    淘汰最久未使用的会话。同一会话的并发请求通过会话锁串行执行。
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_sessions: int = 256,
+                 ttl: float = 600, max_memory_mb: float = 256):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+
+        self._sessions: 'OrderedDict[Hashable, _TrackerSession]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.created_count = 0
+        self.evicted_count = 0
+        self.expired_count = 0
+
+    def init_app(self, app):
+        """从Flask配置读取会话上限"""
+        self.max_sessions = app.config.get('TRACKER_MAX_SESSIONS', self.max_sessions)
+        self.ttl = app.config.get('TRACKER_SESSION_TTL', self.ttl)
+        self.max_memory_bytes = int(app.config.get('TRACKER_MAX_MEMORY_MB', self.max_memory_bytes / 1024 / 1024) * 1024 * 1024)
+
+    @staticmethod
+    def _tracker_nbytes(tracker) -> int:
+        store = getattr(tracker, 'store', None)
+        return store.nbytes if store is not None else 0
+
+    def _get_or_create(self, session_id: Hashable) -> _TrackerSession:
+        """获取会话（不存在则创建）并标记为最近使用，调用方需持有 self._lock"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = _TrackerSession(self.factory())
+            self._sessions[session_id] = session
+            self.created_count += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_access = time.time()
+        self._evict(keep=session_id)
+        return session
+
+    def _evict(self, keep: Hashable = None):
+        """淘汰过期会话，以及超出数量/内存上限的最久未使用会话"""
+        now = time.time()
+        for session_id in list(self._sessions.keys()):
+            if session_id != keep and now - self._sessions[session_id].last_access > self.ttl:
+                del self._sessions[session_id]
+                self.expired_count += 1
+
+        memory = sum(self._tracker_nbytes(session.tracker) for session in self._sessions.values())
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or memory > self.max_memory_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                self._sessions.move_to_end(session_id)
+                session_id = next(iter(self._sessions))
+            session = self._sessions.pop(session_id)
+            memory -= self._tracker_nbytes(session.tracker)
+            self.evicted_count += 1
+
+    @contextmanager
+    def session(self, session_id: Hashable):
+        """获取会话跟踪器并持有会话锁：with registry.session(sid) as tracker: ..."""
+        with self._lock:
+            session = self._get_or_create(session_id)
+        with session.lock:
+            session.last_access = time.time()
+            yield session.tracker
+
+    def reset(self, session_id: Hashable):
+        """重置会话的跟踪器（替换为新实例）"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._get_or_create(session_id)
+                return
+        with session.lock:
+            session.tracker = self.factory()
+            session.last_access = time.time()
+
+    def remove(self, session_id: Hashable):
+        """移除会话"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计"""
+        with self._lock:
+            memory = sum(self._tracker_nbytes(session.tracker) for session in self._sessions.values())
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'ttl': self.ttl,
+                'memory_mb': round(memory / 1024 / 1024, 3),
+                'max_memory_mb': round(self.max_memory_bytes / 1024 / 1024, 3),
+                'created': self.created_count,
+                'evicted': self.evicted_count,
+                'expired': self.expired_count
+            }
@@ -0,0 +1,195 @@
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+# 队列结束标记
+_END_OF_STREAM = object()
+
+
+class VideoPipeline:
+    """视频离线处理流水线：解码 → 推理 → 编码
+
+    解码线程和编码/绘制线程通过有界队列与推理阶段相连，
+    使视频解码、结果绘制和写入与模型推理并行执行。
+    推理阶段运行在调用 run() 的线程上，帧顺序在各阶段之间保持不变。
+    """
+
+    def __init__(self, infer_fn: Callable[[int, List[Any]], List[Any]],
+                 render_fn: Callable[[int, Any, Any], Any],
+                 batch_size: int = 8, queue_size: int = 4,
+                 thread_context: Optional[Callable[[], Any]] = None):
+        """
+        初始化视频流水线
+
+        Args:
+            infer_fn: 推理函数 infer_fn(start_index, frames) -> 与frames等长的结果列表
+            render_fn: 绘制函数 render_fn(frame_index, frame, result) -> 要写入的帧
+            batch_size: 每次推理的帧数
+            queue_size: 阶段之间队列的最大批次数
+            thread_context: 阶段线程内需要进入的上下文（如Flask的app_context）
+        """
+        self.infer_fn = infer_fn
+        self.render_fn = render_fn
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self.thread_context = thread_context
+
+        self._stop_event = threading.Event()
+        self._errors = []
+        self._stage_time = {'decode': 0.0, 'inference': 0.0, 'encode': 0.0}
+        self._stage_frames = {'decode': 0, 'inference': 0, 'encode': 0}
+
+    def run(self, cap, writer) -> Dict[str, Any]:
+        """
+        处理整个视频
+
+        Args:
+            cap: 已打开的cv2.VideoCapture
+            writer: 已打开的cv2.VideoWriter
+
+        Returns:
+            Dict: 各阶段耗时统计
+        """
+        decode_queue = queue.Queue(maxsize=self.queue_size)
+        encode_queue = queue.Queue(maxsize=self.queue_size)
+
+        decoder = threading.Thread(target=self._decode_stage, args=(cap, decode_queue), daemon=True)
+        encoder = threading.Thread(target=self._encode_stage, args=(writer, encode_queue), daemon=True)
+
+        start_time = time.time()
+        decoder.start()
+        encoder.start()
+
+        try:
+            self._inference_stage(decode_queue, encode_queue)
+        except Exception as e:
+            self._fail('inference', e)
+        finally:
+            self._put(encode_queue, _END_OF_STREAM, force=True)
+            decoder.join()
+            encoder.join()
+
+        if self._errors:
+            stage, error = self._errors[0]
+            raise RuntimeError(f'视频流水线 {stage} 阶段失败: {error}') from error
+
+        return self._build_stats(time.time() - start_time)
+
+    def _decode_stage(self, cap, decode_queue):
+        """解码线程：按批次读取视频帧"""
+        try:
+            frame_index = 0
+            while not self._stop_event.is_set():
+                stage_start = time.time()
+                frames = []
+                while len(frames) < self.batch_size:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frames.append(frame)
+                self._stage_time['decode'] += time.time() - stage_start
+
+                if not frames:
+                    break
+
+                self._stage_frames['decode'] += len(frames)
+                if not self._put(decode_queue, (frame_index, frames)):
+                    return
+                frame_index += len(frames)
+        except Exception as e:
+            self._fail('decode', e)
+        finally:
+            self._put(decode_queue, _END_OF_STREAM, force=True)
+
+    def _inference_stage(self, decode_queue, encode_queue):
+        """推理阶段：对每个批次调用一次推理函数"""
+        with self._context():
+            while True:
+                item = decode_queue.get()
+                if item is _END_OF_STREAM or self._stop_event.is_set():
+                    break
+
+                start_index, frames = item
+                stage_start = time.time()
+                results = self.infer_fn(start_index, frames)
+                self._stage_time['inference'] += time.time() - stage_start
+                self._stage_frames['inference'] += len(frames)
+
+                if results is None or len(results) != len(frames):
+                    raise ValueError(f'推理结果数量({0 if results is None else len(results)})与帧数({len(frames)})不一致')
+
+                if not self._put(encode_queue, (start_index, frames, results)):
+                    break
+
+    def _encode_stage(self, writer, encode_queue):
+        """编码线程：按帧顺序绘制结果并写入视频"""
+        try:
+            with self._context():
+                while True:
+                    item = encode_queue.get()
+                    if item is _END_OF_STREAM:
+                        break
+                    if self._stop_event.is_set():
+                        continue
+
+                    start_index, frames, results = item
+                    stage_start = time.time()
+                    for offset, (frame, result) in enumerate(zip(frames, results)):
+                        output_frame = self.render_fn(start_index + offset, frame, result)
+                        writer.write(output_frame if output_frame is not None else frame)
+                    self._stage_time['encode'] += time.time() - stage_start
+                    self._stage_frames['encode'] += len(frames)
+        except Exception as e:
+            self._fail('encode', e)
+            # 继续清空队列，避免推理阶段阻塞
+            while encode_queue.get() is not _END_OF_STREAM:
+                pass
+
+    def _put(self, target_queue, item, force=False) -> bool:
+        """向有界队列放入数据，流水线停止时放弃（结束标记除外）"""
+        while True:
+            if self._stop_event.is_set() and not force:
+                return False
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if force and self._stop_event.is_set():
+                    # 停止时丢弃最旧的数据为结束标记腾出位置
+                    try:
+                        target_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _fail(self, stage, error):
+        """记录阶段错误并停止流水线"""
+        print(f"❌ 视频流水线 {stage} 阶段异常: {error}")
+        self._errors.append((stage, error))
+        self._stop_event.set()
+
+    def _context(self):
+        return self.thread_context() if self.thread_context else nullcontext()
+
+    def _build_stats(self, wall_time) -> Dict[str, Any]:
+        """生成各阶段耗时统计"""
+        stages = {}
+        for stage, busy_time in self._stage_time.items():
+            frames = self._stage_frames[stage]
+            stages[stage] = {
+                'time': round(busy_time, 3),
+                'frames': frames,
+                'ms_per_frame': round(busy_time * 1000 / frames, 2) if frames else 0,
+                'utilization': round(busy_time / wall_time, 3) if wall_time > 0 else 0
+            }
+
+        processed_frames = self._stage_frames['encode']
+        return {
+            'batch_size': self.batch_size,
+            'wall_time': round(wall_time, 3),
+            'processed_frames': processed_frames,
+            'fps': round(processed_frames / wall_time, 2) if wall_time > 0 else 0,
+            'stages': stages,
+            'bottleneck': max(self._stage_time, key=self._stage_time.get)
+        }
@@ -0,0 +1,51 @@
+import numpy as np
+
+from services.alert_filter import AlertFilter
+
+
+def _frame():
+    """左右两块颜色不同的画面，两个目标外观不同"""
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[:, :320] = (40, 160, 40)
+    frame[:, 320:] = (200, 60, 60)
+    return frame
+
+
+def _target(track_id, bbox, class_name='person'):
+    return {'id': track_id, 'class': class_name, 'confidence': 0.9, 'bbox': bbox}
+
+
+def test_same_frame_targets_are_not_deduplicated_against_each_other():
+    alert_filter = AlertFilter(distance=0.5, appearance_threshold=-1.0)
+    targets = [_target(1, [100, 100, 160, 220]), _target(2, [130, 100, 190, 220])]
+
+    passed = alert_filter.filter('cam', _frame(), targets, live_ids=[1, 2], now=0.0)
+
+    assert [target['id'] for target in passed] == [1, 2]
+    stats = alert_filter.get_stats('cam')
+    assert stats['passed'] == 2
+    assert stats['duplicates'] == 0
+
+
+def test_live_tracks_do_not_suppress_new_targets():
+    alert_filter = AlertFilter()
+    frame = _frame()
+    alert_filter.filter('cam', frame, [_target(1, [100, 100, 160, 220])], live_ids=[1], now=0.0)
+
+    # 轨迹1仍在跟踪，旁边出现的新目标不是它的闪烁
+    passed = alert_filter.filter('cam', frame, [_target(2, [105, 100, 165, 220])], live_ids=[1, 2], now=1.0)
+
+    assert [target['id'] for target in passed] == [2]
+
+
+def test_lost_track_reappearing_with_new_id_is_deduplicated_once():
+    alert_filter = AlertFilter()
+    frame = _frame()
+    alert_filter.filter('cam', frame, [_target(1, [100, 100, 160, 220])], live_ids=[1], now=0.0)
+
+    # 轨迹1丢失后同一位置出现两个新ID，只有一个能认领轨迹1
+    targets = [_target(2, [102, 100, 162, 220]), _target(3, [98, 100, 158, 220])]
+    passed = alert_filter.filter('cam', frame, targets, live_ids=[2, 3], now=1.0)
+
+    assert [target['id'] for target in passed] == [3]
+    assert alert_filter.get_stats('cam')['duplicates'] == 1
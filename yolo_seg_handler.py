@@ -5,21 +5,28 @@ import torch
 import json
 import colorsys
 from typing import List, Dict, Any, Tuple, Optional
+from services.video_pipeline import VideoPipeline
+from services.detection_results import boxes_to_arrays
 
 class YOLOSegmentationHandler:
     """YOLO分割算法处理器"""
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, model=None):
         """
         初始化YOLO分割处理器
         
         Args:
             model_path: 模型路径，如果为None则使用默认的YOLOv8n-seg模型
+            model: 已加载的模型实例（如来自模型注册表），提供时不再重复加载
         """
         self.model = None
         self.model_path = model_path or 'yolov8n-seg.pt'
         self.class_colors = {}  # 存储每个类别的颜色
-        self.load_model()
+        if model is not None:
+            self.model = model
+            self._generate_class_colors()
+        else:
+            self.load_model()
         
     def load_model(self) -> bool:
         """
@@ -106,14 +113,13 @@ class YOLOSegmentationHandler:
             'class_names': []
         }
         
-        # 处理检测框
-        if hasattr(result, 'boxes') and result.boxes is not None:
-            boxes = result.boxes
-            if len(boxes) > 0:
-                parsed['boxes'] = boxes.xyxy.cpu().numpy().tolist()
-                parsed['confidences'] = boxes.conf.cpu().numpy().tolist()
-                parsed['classes'] = boxes.cls.cpu().numpy().tolist()
-                parsed['class_names'] = [self.model.names[int(cls)] for cls in parsed['classes']]
+        # 处理检测框（一次性转移到主机内存）
+        xyxy, conf, cls = boxes_to_arrays(result)
+        if len(xyxy) > 0:
+            parsed['boxes'] = xyxy.tolist()
+            parsed['confidences'] = conf.tolist()
+            parsed['classes'] = cls.tolist()
+            parsed['class_names'] = [self.model.names[class_id] for class_id in parsed['classes']]
         
         # 处理分割掩码
         if hasattr(result, 'masks') and result.masks is not None:
@@ -239,7 +245,8 @@ class YOLOSegmentationHandler:
                                  conf: float = 0.25, iou: float = 0.45,
                                  show_boxes: bool = True, show_masks: bool = True,
                                  show_labels: bool = True, mask_alpha: float = 0.4,
-                                 progress_callback=None) -> Dict[str, Any]:
+                                 progress_callback=None, batch_size: int = 8,
+                                 queue_size: int = 4) -> Dict[str, Any]:
         """
         处理视频分割
         
@@ -253,6 +260,8 @@ class YOLOSegmentationHandler:
             show_labels: 是否显示标签
             mask_alpha: 掩码透明度
             progress_callback: 进度回调函数
+            batch_size: 每次推理的帧数
+            queue_size: 流水线阶段间队列长度
             
         Returns:
             Dict: 处理结果统计
@@ -275,52 +284,51 @@ class YOLOSegmentationHandler:
         out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
         
         all_results = []
-        frame_count = 0
         
-        try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # 执行分割
-                results = self.predict(frame, conf=conf, iou=iou)
-                
-                if results:
-                    result = results[0]  # 取第一个结果
-                    all_results.append({
-                        'frame': frame_count,
-                        'detections': len(result.get('boxes', [])),
-                        'masks': len(result.get('masks', [])),
-                        'result': result
-                    })
-                    
-                    # 可视化
-                    vis_frame = self.visualize_segmentation(
-                        frame, result, show_boxes, show_masks, show_labels, mask_alpha
-                    )
-                else:
-                    vis_frame = frame
-                    all_results.append({
-                        'frame': frame_count,
-                        'detections': 0,
-                        'masks': 0,
-                        'result': {}
-                    })
+        def infer_batch(start_index, frames):
+            # 批量分割，失败时返回空结果以保持帧对齐
+            results = self.predict(frames, conf=conf, iou=iou)
+            return results if len(results) == len(frames) else [None] * len(frames)
+        
+        def render_frame(frame_index, frame, result):
+            if result:
+                all_results.append({
+                    'frame': frame_index,
+                    'detections': len(result.get('boxes', [])),
+                    'masks': len(result.get('masks', [])),
+                    'result': result
+                })
                 
-                # 写入帧
-                out.write(vis_frame)
-                frame_count += 1
-                
-                # 回调进度
-                if progress_callback:
-                    progress = frame_count / total_frames * 100
-                    progress_callback(progress, frame_count, total_frames)
+                # 可视化
+                vis_frame = self.visualize_segmentation(
+                    frame, result, show_boxes, show_masks, show_labels, mask_alpha
+                )
+            else:
+                vis_frame = frame
+                all_results.append({
+                    'frame': frame_index,
+                    'detections': 0,
+                    'masks': 0,
+                    'result': {}
+                })
+            
+            # 回调进度
+            if progress_callback:
+                progress = (frame_index + 1) / total_frames * 100 if total_frames > 0 else 0
+                progress_callback(progress, frame_index + 1, total_frames)
+            
+            return vis_frame
         
+        pipeline = VideoPipeline(infer_batch, render_frame,
+                                 batch_size=batch_size, queue_size=queue_size)
+        try:
+            pipeline_stats = pipeline.run(cap, out)
         finally:
             cap.release()
             out.release()
         
+        frame_count = len(all_results)
+        
         # 统计结果
         total_detections = sum(r['detections'] for r in all_results)
         total_masks = sum(r['masks'] for r in all_results)
@@ -330,7 +338,8 @@ class YOLOSegmentationHandler:
             'total_detections': total_detections,
             'total_masks': total_masks,
             'results': all_results,
-            'average_detections_per_frame': total_detections / frame_count if frame_count > 0 else 0
+            'average_detections_per_frame': total_detections / frame_count if frame_count > 0 else 0,
+            'pipeline_stats': pipeline_stats
         }
     
     def get_supported_models(self) -> List[str]: